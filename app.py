@@ -1,9 +1,17 @@
-from flask import Flask, render_template, request, redirect, url_for, jsonify
+from flask import Flask, render_template, request, redirect, url_for, jsonify, stream_with_context
+from markupsafe import Markup
+import hashlib
+import io
 import os
+import time
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import pytz
-from sheets_api import SheetsAPI
+from fragment_cache import FragmentCache
+from live_events import EventBroker
+from metrics import get_metrics
+from todo_backend import SheetsUnavailableError, create_backend, month_range, week_range
+from todo_transfer import FORMATS, IMPORT_CHUNK_SIZE, ImportReader, detect_format, export_todos
 
 # 日本時間（JST）のタイムゾーン
 JST = pytz.timezone('Asia/Tokyo')
@@ -20,100 +28,367 @@ def get_jst_today():
 load_dotenv()
 
 app = Flask(__name__)
+# JSON APIのレスポンスを小さくする（日本語はエスケープしない）
+app.json.compact = True
+app.json.ensure_ascii = False
 
-# Google Sheets APIの初期化
+# 一覧ページの描画済みフラグメント（期日超過の通知・日付ごとの一覧）のキャッシュ
+# 書き込み（データのバージョンの変化）と日付の変わり目で破棄される
+fragment_cache = FragmentCache(int(os.environ.get('FRAGMENT_CACHE_SIZE', '256')))
+
+# 一覧ページのETagに含めるテンプレートの版（デプロイでテンプレートが変わったときに古いページを使わないように）
+TEMPLATE_TOKEN = format(int(max(
+    os.path.getmtime(os.path.join(app.root_path, 'templates', name))
+    for name in os.listdir(os.path.join(app.root_path, 'templates'))
+)), 'x')
+
+# ルートごとのリクエスト数・処理時間とGoogle Sheets APIの呼び出しの計測
+# （METRICS_ENABLEDで/metricsに公開、METRICS_PROFILEでX-Profileヘッダーを付けたリクエストにServer-Timingを返す）
+metrics = get_metrics()
+
+# 期間の一覧ページ（/range）で一度に表示する最大の日数
+RANGE_MAX_DAYS = int(os.environ.get('RANGE_MAX_DAYS', '62'))
+
+# 検索結果として表示する最大の件数
+SEARCH_RESULT_LIMIT = int(os.environ.get('SEARCH_RESULT_LIMIT', '100'))
+
+# 一覧ページへの変更の配信（/events、Server-Sent Events）。接続ごとにワーカーのスレッドを1つ使うため、
+# スレッドで動くワーカー（gunicorn -k gthread）で使う場合のみ有効にする
+LIVE_EVENTS = os.environ.get('LIVE_EVENTS', '0') == '1'
+live_events = EventBroker(max_clients=int(os.environ.get('LIVE_EVENTS_MAX_CLIENTS', '32')))
+app.jinja_env.globals['live_events_enabled'] = LIVE_EVENTS
+
+# Todoの保存先の初期化（TODO_BACKEND: sheets（既定）またはsqlite）
+# Google Sheetsは認証情報と設定の確認のみ行い、スプレッドシートへの接続は下でバックグラウンドに開始する
 try:
-    sheets_api = SheetsAPI()
+    backend = create_backend()
 except Exception as e:
-    print(f"エラー: Google Sheets APIの初期化に失敗しました: {e}")
+    print(f"エラー: Todoの保存先の初期化に失敗しました: {e}")
     print("以下を確認してください:")
     print("1. .envファイルにSPREADSHEET_IDが正しく設定されているか")
     print("2. credentials.jsonファイルがプロジェクトルートに存在するか")
     print("3. スプレッドシートの共有設定でサービスアカウントに編集権限が付与されているか")
-    sheets_api = None
+    print("（Google Sheetsを使わずに動かす場合は TODO_BACKEND=sqlite を設定してください）")
+    backend = None
+
+# 保存先への接続をバックグラウンドで開始し、起動直後からリクエストを受け付ける
+# （接続が終わる前のリクエストは接続完了を待つ）
+# バックグラウンドでのシート定期取得（SHEETS_POLL_INTERVALが設定されている場合のみ）
+if backend is not None:
+    backend.connect_in_background()
+    backend.start_poller()
+    if LIVE_EVENTS:
+        backend.add_change_listener(live_events.publish_changes)
+
+def start_request_metrics():
+    """リクエストの処理時間の計測を始める（X-Profileヘッダーがあればこのリクエストのプロファイルも）"""
+    request.environ['todo.started'] = time.perf_counter()
+    if metrics.profile and request.headers.get('X-Profile') == '1':
+        metrics.start_profile()
+
+def finish_request_metrics(response):
+    """ルートごとのリクエスト数・処理時間を記録し、プロファイルしていればServer-Timingヘッダーを付ける"""
+    elapsed = time.perf_counter() - request.environ.get('todo.started', time.perf_counter())
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    metrics.record_request(route, request.method, response.status_code, elapsed)
+    profile = metrics.finish_profile()
+    if profile is not None:
+        response.headers['Server-Timing'] = (
+            f'app;dur={elapsed * 1000:.1f}, '
+            f'sheets;dur={profile["seconds"] * 1000:.1f};desc="{profile["calls"]} calls, {profile["rows"]} rows"')
+    return response
+
+# 計測が無効な場合はフックを登録しない（リクエストごとの負担をなくすため）
+if metrics.active:
+    app.before_request(start_request_metrics)
+    app.after_request(finish_request_metrics)
+
+@app.before_request
+def run_daily_maintenance():
+    """日付が変わって最初のリクエストで、保存先の日次の整理をバックグラウンドで始める"""
+    if backend is not None:
+        backend.run_daily_maintenance()
+
+@app.errorhandler(SheetsUnavailableError)
+def sheets_unavailable(e):
+    """Google Sheetsに接続できない間の書き込みは503を返す（読み取りは最後に取得できた内容で表示される）"""
+    retry_after = max(1, int(e.retry_after + 0.5))
+    if request.path.startswith('/api/'):
+        response = jsonify({'error': str(e)})
+    else:
+        response = app.response_class(f"エラー: {e}。しばらくしてから再度お試しください。", mimetype='text/plain')
+    response.status_code = 503
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def redirect_to_view(view_type, selected_date):
+    """操作後に元の一覧ページへリダイレクト"""
+    # 期間の一覧ページから操作した場合はそのページへ戻る（このアプリ内のパスのみ）
+    return_to = request.form.get('return_to', '')
+    if return_to.startswith('/') and not return_to.startswith(('//', '/\\')):
+        return redirect(return_to)
+    if selected_date:
+        return redirect(url_for('date_view', date_str=selected_date))
+    elif view_type == 'yesterday':
+        return redirect(url_for('yesterday'))
+    elif view_type == 'tomorrow':
+        return redirect(url_for('tomorrow'))
+    return redirect(url_for('today'))
+
+def get_form_todo_ids():
+    """フォームのids（複数指定またはカンマ区切り）をIDのリストに変換"""
+    todo_ids = []
+    for value in request.form.getlist('ids'):
+        for part in value.split(','):
+            part = part.strip()
+            if part.isdigit():
+                todo_ids.append(int(part))
+    return todo_ids
+
+def wants_json():
+    """一覧ページのスクリプト（fetch）からの操作か（Accept: application/json）"""
+    return request.accept_mimetypes.best == 'application/json'
+
+def action_result(todo_ids, count, deleted=False):
+    """fetchからの操作への応答（リダイレクトして一覧を描画し直す代わりに、変更したTodoの状態だけを返す）
+    
+    todos: [{id, todo（削除された・見つからなければnull）, html（一覧のTodo1件）}]。
+    Todoは書き込み後のスナップショット（SQLiteは主キー）から取得し、一覧の取得・描画は行わない。
+    htmlはフォームのview_type・selected_date・return_toで、一覧と同じように描画する。
+    """
+    selected_date = request.form.get('selected_date', '')
+    try:
+        current_date = datetime.strptime(selected_date, '%Y-%m-%d').date() if selected_date else None
+    except ValueError:
+        current_date = None
+    context = {'view_type': request.form.get('view_type', 'custom'), 'current_date': current_date,
+               'return_to': request.form.get('return_to', '')}
+    todos = []
+    for todo_id in dict.fromkeys(todo_ids):
+        todo = None if deleted else backend.get_todo_by_id(todo_id)
+        todos.append({
+            'id': todo_id,
+            'todo': todo.to_dict() if todo else None,
+            'html': render_template('_todo_item.html', todo=todo, **context) if todo else None
+        })
+    return jsonify({'count': count, 'todos': todos})
 
 @app.route('/')
 def index():
     """今日のTodo一覧ページ"""
     return redirect(url_for('today'))
 
+def page_response(etag, render_section, **context):
+    """一覧ページのレスポンス（render_sectionは(期日超過の通知, 一覧)のHTMLを返す関数）
+    
+    If-None-Matchが一致すれば描画せずに304を返す。X-Fragment: sectionヘッダーがあれば、
+    ページ全体ではなく#todo-sectionの中身だけを返す（変更の配信を受けたページが一覧だけを取得し直すため）。
+    """
+    section_only = request.headers.get('X-Fragment') == 'section'
+    if section_only:
+        etag += '-section'
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        overdue_html, todos_html = render_section()
+        if section_only:
+            response = app.response_class(overdue_html + todos_html, mimetype='text/html')
+        else:
+            response = app.make_response(render_template('index.html', overdue_html=Markup(overdue_html),
+                                                         todos_html=Markup(todos_html), **context))
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('X-Fragment')
+    return response
+
+def render_todo_page(selected_date, view_type):
+    """一覧ページを返す（期日超過の通知と日付ごとの一覧はフラグメントキャッシュから組み立てる）
+    
+    データのバージョン・表示する日付・今日の日付からETagを作る。
+    """
+    today = get_jst_today()
+    version = backend.get_data_version()
+    date_str = selected_date.strftime('%Y-%m-%d')
+    etag = f"{TEMPLATE_TOKEN}-{version}-{view_type}-{selected_date.strftime('%Y%m%d')}-{today.strftime('%Y%m%d')}"
+    def render_section():
+        generation = (version, today)
+        overdue_html = fragment_cache.get_or_render(('overdue', view_type, date_str), generation, lambda: render_template(
+            '_overdue.html', overdue_todos=backend.get_overdue_todos(), current_date=selected_date, view_type=view_type))
+        todos_html = fragment_cache.get_or_render(('todos', view_type, date_str), generation, lambda: render_template(
+            '_todo_list.html', todos=backend.get_all_todos(due_date_filter=selected_date), current_date=selected_date, view_type=view_type))
+        return overdue_html, todos_html
+    return page_response(etag, render_section, current_date=selected_date, view_type=view_type, today=today)
+
 @app.route('/today')
 def today():
     """今日のTodo一覧ページ"""
-    if sheets_api is None:
-        return "エラー: Google Sheets APIが初期化されていません。ターミナルのエラーメッセージを確認してください。", 500
+    if backend is None:
+        return "エラー: Todoの保存先が初期化されていません。ターミナルのエラーメッセージを確認してください。", 500
     today = get_jst_today()
-    print(f"DEBUG: Today's date (JST): {today} (ISO format: {today.strftime('%Y-%m-%d')})")
-    # 今日を期日とするTodoを取得
-    todos = sheets_api.get_all_todos(due_date_filter=today)
-    print(f"DEBUG: Found {len(todos)} todos for today")
-    # 期日が過ぎている未完了のTodoを取得
-    overdue_todos = sheets_api.get_overdue_todos()
-    return render_template('index.html', todos=todos, current_date=today, view_type='today', overdue_todos=overdue_todos)
+    # 今日を期日とするTodoと、期日が過ぎている未完了のTodoを表示
+    return render_todo_page(today, 'today')
 
 @app.route('/yesterday')
 def yesterday():
     """昨日のTodo一覧ページ"""
-    if sheets_api is None:
-        return "エラー: Google Sheets APIが初期化されていません。", 500
+    if backend is None:
+        return "エラー: Todoの保存先が初期化されていません。", 500
     yesterday = (get_jst_today() - timedelta(days=1))
-    # 昨日を期日とするTodoを取得
-    todos = sheets_api.get_all_todos(due_date_filter=yesterday)
-    # 期日が過ぎている未完了のTodoを取得
-    overdue_todos = sheets_api.get_overdue_todos()
-    return render_template('index.html', todos=todos, current_date=yesterday, view_type='yesterday', overdue_todos=overdue_todos)
+    # 昨日を期日とするTodoと、期日が過ぎている未完了のTodoを表示
+    return render_todo_page(yesterday, 'yesterday')
 
 @app.route('/tomorrow')
 def tomorrow():
     """明日のTodo一覧ページ"""
-    if sheets_api is None:
-        return "エラー: Google Sheets APIが初期化されていません。", 500
+    if backend is None:
+        return "エラー: Todoの保存先が初期化されていません。", 500
     tomorrow_date = (get_jst_today() + timedelta(days=1))
-    # 明日を期日とするTodoを取得
-    todos = sheets_api.get_all_todos(due_date_filter=tomorrow_date)
-    # 期日が過ぎている未完了のTodoを取得
-    overdue_todos = sheets_api.get_overdue_todos()
-    return render_template('index.html', todos=todos, current_date=tomorrow_date, view_type='tomorrow', overdue_todos=overdue_todos)
+    # 明日を期日とするTodoと、期日が過ぎている未完了のTodoを表示
+    return render_todo_page(tomorrow_date, 'tomorrow')
 
 @app.route('/date/<date_str>')
 def date_view(date_str):
     """指定日付を期日とするTodo一覧ページ"""
-    if sheets_api is None:
-        return "エラー: Google Sheets APIが初期化されていません。", 500
+    if backend is None:
+        return "エラー: Todoの保存先が初期化されていません。", 500
     try:
         selected_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-        # 指定日付を期日とするTodoを取得
-        todos = sheets_api.get_all_todos(due_date_filter=selected_date)
-        
-        # 今日との比較でview_typeを決定
-        today = get_jst_today()
-        if selected_date == today:
-            view_type = 'today'
-        elif selected_date == today - timedelta(days=1):
-            view_type = 'yesterday'
-        elif selected_date == today + timedelta(days=1):
-            view_type = 'tomorrow'
-        else:
-            view_type = 'custom'
-        
-        # 期日が過ぎている未完了のTodoを取得
-        overdue_todos = sheets_api.get_overdue_todos()
-        return render_template('index.html', todos=todos, current_date=selected_date, view_type=view_type, overdue_todos=overdue_todos)
     except ValueError:
         return redirect(url_for('today'))
+    
+    # 今日との比較でview_typeを決定
+    today = get_jst_today()
+    if selected_date == today:
+        view_type = 'today'
+    elif selected_date == today - timedelta(days=1):
+        view_type = 'yesterday'
+    elif selected_date == today + timedelta(days=1):
+        view_type = 'tomorrow'
+    else:
+        view_type = 'custom'
+    
+    # 指定日付を期日とするTodoと、期日が過ぎている未完了のTodoを表示
+    return render_todo_page(selected_date, view_type)
+
+def render_range_page(start_date, end_date, view_type, title, return_to, prev_url, next_url):
+    """期間（週・月・指定した範囲）の一覧ページを返す
+    
+    日付ごとのTodoと期日超過の通知は、get_todos_in_rangeの1回の読み取りから描画し、
+    まとめて1つのフラグメントとしてキャッシュする。
+    """
+    today = get_jst_today()
+    version = backend.get_data_version()
+    etag = (f"{TEMPLATE_TOKEN}-{version}-{view_type}-{start_date.strftime('%Y%m%d')}-{end_date.strftime('%Y%m%d')}"
+            f"-{today.strftime('%Y%m%d')}")
+    def render():
+        days, overdue_todos = backend.get_todos_in_range(start_date, end_date)
+        return (render_template('_overdue.html', overdue_todos=overdue_todos, current_date=start_date,
+                                view_type='custom', return_to=return_to)
+                + render_template('_range.html', days=days, today=today, return_to=return_to))
+    def render_section():
+        return '', fragment_cache.get_or_render(
+            ('range', view_type, start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')), (version, today), render)
+    return page_response(etag, render_section, current_date=start_date, range_end=end_date, view_type=view_type,
+                         today=today, range_title=title, prev_url=prev_url, next_url=next_url)
+
+@app.route('/week')
+def this_week():
+    """今週のTodo一覧ページ"""
+    return redirect(url_for('week_view', date_str=week_range(get_jst_today())[0].strftime('%Y-%m-%d')))
+
+@app.route('/week/<date_str>')
+def week_view(date_str):
+    """指定日付を含む週（月曜〜日曜）のTodo一覧ページ"""
+    if backend is None:
+        return "エラー: Todoの保存先が初期化されていません。", 500
+    try:
+        selected_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+    except ValueError:
+        return redirect(url_for('this_week'))
+    start_date, end_date = week_range(selected_date)
+    return render_range_page(
+        start_date, end_date, 'week',
+        f"{start_date.strftime('%Y年%m月%d日')}〜{end_date.strftime('%m月%d日')}",
+        url_for('week_view', date_str=start_date.strftime('%Y-%m-%d')),
+        url_for('week_view', date_str=(start_date - timedelta(days=7)).strftime('%Y-%m-%d')),
+        url_for('week_view', date_str=(start_date + timedelta(days=7)).strftime('%Y-%m-%d'))
+    )
+
+@app.route('/month')
+def this_month():
+    """今月のTodo一覧ページ"""
+    return redirect(url_for('month_view', month_str=get_jst_today().strftime('%Y-%m')))
+
+@app.route('/month/<month_str>')
+def month_view(month_str):
+    """指定した月（YYYY-MM）のTodo一覧ページ"""
+    if backend is None:
+        return "エラー: Todoの保存先が初期化されていません。", 500
+    try:
+        selected_month = datetime.strptime(month_str, '%Y-%m').date()
+    except ValueError:
+        return redirect(url_for('this_month'))
+    start_date, end_date = month_range(selected_month.year, selected_month.month)
+    return render_range_page(
+        start_date, end_date, 'month', start_date.strftime('%Y年%m月'),
+        url_for('month_view', month_str=start_date.strftime('%Y-%m')),
+        url_for('month_view', month_str=(start_date - timedelta(days=1)).strftime('%Y-%m')),
+        url_for('month_view', month_str=(end_date + timedelta(days=1)).strftime('%Y-%m'))
+    )
+
+@app.route('/range')
+def range_view():
+    """指定した期間（from〜to、YYYY-MM-DD）のTodo一覧ページ（最大RANGE_MAX_DAYS日）"""
+    if backend is None:
+        return "エラー: Todoの保存先が初期化されていません。", 500
+    try:
+        start_date = datetime.strptime(request.args.get('from', ''), '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.args.get('to', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return redirect(url_for('this_week'))
+    if end_date < start_date:
+        start_date, end_date = end_date, start_date
+    end_date = min(end_date, start_date + timedelta(days=RANGE_MAX_DAYS - 1))
+    days = (end_date - start_date).days + 1
+    return render_range_page(
+        start_date, end_date, 'range',
+        f"{start_date.strftime('%Y年%m月%d日')}〜{end_date.strftime('%Y年%m月%d日')}",
+        url_for('range_view', **{'from': start_date.strftime('%Y-%m-%d'), 'to': end_date.strftime('%Y-%m-%d')}),
+        url_for('range_view', **{'from': (start_date - timedelta(days=days)).strftime('%Y-%m-%d'),
+                                 'to': (start_date - timedelta(days=1)).strftime('%Y-%m-%d')}),
+        url_for('range_view', **{'from': (end_date + timedelta(days=1)).strftime('%Y-%m-%d'),
+                                 'to': (end_date + timedelta(days=days)).strftime('%Y-%m-%d')})
+    )
+
+@app.route('/search')
+def search_view():
+    """タイトル・内容の検索結果ページ（?q=検索語、空白で区切るとすべてを含むTodo）"""
+    if backend is None:
+        return "エラー: Todoの保存先が初期化されていません。", 500
+    query = request.args.get('q', '').strip()
+    if not query:
+        return redirect(url_for('today'))
+    query_key = hashlib.sha1(query.encode('utf-8')).hexdigest()[:16]
+    today = get_jst_today()
+    etag = f"{TEMPLATE_TOKEN}-{backend.get_data_version()}-search-{query_key}-{today.strftime('%Y%m%d')}"
+    def render_section():
+        todos = backend.search(query)
+        return '', render_template('_search.html', todos=todos[:SEARCH_RESULT_LIMIT], total=len(todos), query=query,
+                                   current_date=None, view_type='custom', return_to=url_for('search_view', q=query))
+    return page_response(etag, render_section, current_date=today, view_type='search', today=today, query=query)
 
 @app.route('/add', methods=['GET', 'POST'])
 def add_todo():
     """Todo追加ページ"""
-    if sheets_api is None:
-        return "エラー: Google Sheets APIが初期化されていません。", 500
+    if backend is None:
+        return "エラー: Todoの保存先が初期化されていません。", 500
     if request.method == 'POST':
         title = request.form.get('title', '').strip()
         content = request.form.get('content', '').strip()
         due_date = request.form.get('due_date', '').strip()
         
         if title:
-            sheets_api.add_todo(title, content, due_date)
+            backend.add_todo(title, content, due_date)
             # 期日に応じてリダイレクト
             if due_date:
                 try:
@@ -146,10 +421,10 @@ def add_todo():
 @app.route('/edit/<int:todo_id>', methods=['GET', 'POST'])
 def edit_todo(todo_id):
     """Todo編集ページ"""
-    if sheets_api is None:
-        return "エラー: Google Sheets APIが初期化されていません。", 500
+    if backend is None:
+        return "エラー: Todoの保存先が初期化されていません。", 500
     
-    todo = sheets_api.get_todo_by_id(todo_id)
+    todo = backend.get_todo_by_id(todo_id)
     if not todo:
         return redirect(url_for('today'))
     
@@ -159,7 +434,7 @@ def edit_todo(todo_id):
         due_date = request.form.get('due_date', '').strip()
         
         if title:
-            sheets_api.update_todo(todo_id, title, content, due_date)
+            backend.update_todo(todo_id, title, content, due_date)
             # 期日に応じてリダイレクト
             if due_date:
                 try:
@@ -179,69 +454,284 @@ def edit_todo(todo_id):
     
     # view_typeを期日から決定
     view_type = 'today'
-    due_date_str = todo.get('due_date', '')
-    if due_date_str:
-        try:
-            due_date_obj = datetime.strptime(due_date_str, '%Y-%m-%d').date()
-            today = get_jst_today()
-            if due_date_obj == today - timedelta(days=1):
-                view_type = 'yesterday'
-            elif due_date_obj == today + timedelta(days=1):
-                view_type = 'tomorrow'
-        except:
-            pass
+    if todo.due is not None:
+        today = get_jst_today()
+        if todo.due == today - timedelta(days=1):
+            view_type = 'yesterday'
+        elif todo.due == today + timedelta(days=1):
+            view_type = 'tomorrow'
     
     return render_template('edit.html', todo=todo, view_type=view_type)
 
 @app.route('/delete/<int:todo_id>', methods=['POST'])
 def delete_todo(todo_id):
     """Todo削除"""
-    if sheets_api is None:
-        return "エラー: Google Sheets APIが初期化されていません。", 500
+    if backend is None:
+        return "エラー: Todoの保存先が初期化されていません。", 500
     # 削除前にview_typeを取得
     view_type = request.form.get('view_type', 'today')
     selected_date = request.form.get('selected_date', '')
-    sheets_api.delete_todo(todo_id)
+    deleted = backend.delete_todo(todo_id)
+    if wants_json():
+        return action_result([todo_id], int(deleted), deleted=True)
     
     # 削除後、同じページにリダイレクト
-    if selected_date:
-        return redirect(url_for('date_view', date_str=selected_date))
-    elif view_type == 'yesterday':
-        return redirect(url_for('yesterday'))
-    elif view_type == 'tomorrow':
-        return redirect(url_for('tomorrow'))
-    return redirect(url_for('today'))
+    return redirect_to_view(view_type, selected_date)
 
 @app.route('/complete/<int:todo_id>', methods=['POST'])
 def complete_todo(todo_id):
     """Todoを完了にする"""
-    if sheets_api is None:
-        return "エラー: Google Sheets APIが初期化されていません。", 500
+    if backend is None:
+        return "エラー: Todoの保存先が初期化されていません。", 500
     view_type = request.form.get('view_type', 'today')
     selected_date = request.form.get('selected_date', '')
-    sheets_api.complete_todo(todo_id)
+    completed = backend.complete_todo(todo_id)
+    if wants_json():
+        return action_result([todo_id], int(completed))
     
-    if selected_date:
-        return redirect(url_for('date_view', date_str=selected_date))
-    elif view_type == 'yesterday':
-        return redirect(url_for('yesterday'))
-    elif view_type == 'tomorrow':
-        return redirect(url_for('tomorrow'))
-    return redirect(url_for('today'))
+    return redirect_to_view(view_type, selected_date)
 
 @app.route('/carryover/<int:todo_id>', methods=['POST'])
 def carryover_todo(todo_id):
     """Todoを次の日に持越す（期日を明日に変更）"""
-    if sheets_api is None:
-        return "エラー: Google Sheets APIが初期化されていません。", 500
+    if backend is None:
+        return "エラー: Todoの保存先が初期化されていません。", 500
+    tomorrow_date_str = (get_jst_today() + timedelta(days=1)).strftime('%Y-%m-%d')
+    todo = backend.get_todo_by_id(todo_id)
+    carried = backend.carryover_todo(todo_id, tomorrow_date_str) if todo else False
+    if wants_json():
+        return action_result([todo_id], int(carried))
+    return redirect(url_for('tomorrow'))
+
+@app.route('/carryover/overdue', methods=['POST'])
+def carryover_overdue():
+    """期日が過ぎている未完了のTodoをすべて明日に持越す"""
+    if backend is None:
+        return "エラー: Todoの保存先が初期化されていません。", 500
     tomorrow_date_str = (get_jst_today() + timedelta(days=1)).strftime('%Y-%m-%d')
-    todo = sheets_api.get_todo_by_id(todo_id)
-    if todo:
-        sheets_api.carryover_todo(todo_id, tomorrow_date_str)
+    count = backend.carryover_overdue_todos(tomorrow_date_str)
+    if wants_json():
+        return jsonify({'count': count, 'todos': []})
     return redirect(url_for('tomorrow'))
 
+@app.route('/bulk/complete', methods=['POST'])
+def bulk_complete():
+    """複数のTodoをまとめて完了にする"""
+    if backend is None:
+        return "エラー: Todoの保存先が初期化されていません。", 500
+    todo_ids = get_form_todo_ids()
+    count = backend.complete_todos(todo_ids)
+    if wants_json():
+        return action_result(todo_ids, count)
+    return redirect_to_view(request.form.get('view_type', 'today'), request.form.get('selected_date', ''))
+
+@app.route('/bulk/carryover', methods=['POST'])
+def bulk_carryover():
+    """複数のTodoをまとめて次の日に持越す"""
+    if backend is None:
+        return "エラー: Todoの保存先が初期化されていません。", 500
+    tomorrow_date_str = (get_jst_today() + timedelta(days=1)).strftime('%Y-%m-%d')
+    todo_ids = get_form_todo_ids()
+    count = backend.carryover_todos(todo_ids, tomorrow_date_str)
+    if wants_json():
+        return action_result(todo_ids, count)
+    return redirect(url_for('tomorrow'))
+
+@app.route('/bulk/delete', methods=['POST'])
+def bulk_delete():
+    """複数のTodoをまとめて削除"""
+    if backend is None:
+        return "エラー: Todoの保存先が初期化されていません。", 500
+    todo_ids = get_form_todo_ids()
+    count = backend.delete_todos(todo_ids)
+    if wants_json():
+        return action_result(todo_ids, count, deleted=True)
+    return redirect_to_view(request.form.get('view_type', 'today'), request.form.get('selected_date', ''))
+
+def json_with_etag(etag, build_payload):
+    """ETag付きでJSONを返す（If-None-Matchが一致すれば中身を作らずに304を返す）"""
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = jsonify(build_payload())
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/todos')
+def api_todos():
+    """指定日付（?date=YYYY-MM-DD、省略時は今日）を期日とするTodo一覧（JSON）"""
+    if backend is None:
+        return jsonify({'error': 'Todoの保存先が初期化されていません'}), 500
+    date_str = request.args.get('date', '').strip()
+    if date_str:
+        try:
+            selected_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({'error': 'dateはYYYY-MM-DD形式で指定してください'}), 400
+    else:
+        selected_date = get_jst_today()
+    etag = f"{backend.get_data_version()}-{selected_date.strftime('%Y%m%d')}"
+    return json_with_etag(etag, lambda: {
+        'date': selected_date.strftime('%Y-%m-%d'),
+        'todos': [todo.to_dict() for todo in backend.get_all_todos(due_date_filter=selected_date)]
+    })
+
+@app.route('/api/todos/overdue')
+def api_overdue_todos():
+    """期日が過ぎている未完了のTodo一覧（JSON）"""
+    if backend is None:
+        return jsonify({'error': 'Todoの保存先が初期化されていません'}), 500
+    # 日付が変わると対象が変わるため、今日の日付もETagに含める
+    today = get_jst_today()
+    etag = f"{backend.get_data_version()}-overdue-{today.strftime('%Y%m%d')}"
+    return json_with_etag(etag, lambda: {
+        'date': today.strftime('%Y-%m-%d'),
+        'todos': [todo.to_dict() for todo in backend.get_overdue_todos()]
+    })
+
+@app.route('/api/todos/range')
+def api_range_todos():
+    """指定した期間（?from=YYYY-MM-DD&to=YYYY-MM-DD、最大RANGE_MAX_DAYS日）の日付ごとのTodoと期日超過のTodo（JSON）"""
+    if backend is None:
+        return jsonify({'error': 'Todoの保存先が初期化されていません'}), 500
+    try:
+        start_date = datetime.strptime(request.args.get('from', ''), '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.args.get('to', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'fromとtoはYYYY-MM-DD形式で指定してください'}), 400
+    if not start_date <= end_date < start_date + timedelta(days=RANGE_MAX_DAYS):
+        return jsonify({'error': f'期間はfrom〜toの順で{RANGE_MAX_DAYS}日以内で指定してください'}), 400
+    today = get_jst_today()
+    etag = f"{backend.get_data_version()}-range-{start_date.strftime('%Y%m%d')}-{end_date.strftime('%Y%m%d')}-{today.strftime('%Y%m%d')}"
+    def build_payload():
+        days, overdue_todos = backend.get_todos_in_range(start_date, end_date)
+        return {
+            'from': start_date.strftime('%Y-%m-%d'),
+            'to': end_date.strftime('%Y-%m-%d'),
+            'days': {day.strftime('%Y-%m-%d'): [todo.to_dict() for todo in todos] for day, todos in days},
+            'overdue': [todo.to_dict() for todo in overdue_todos]
+        }
+    return json_with_etag(etag, build_payload)
+
+@app.route('/api/todos/search')
+def api_search_todos():
+    """タイトル・内容の検索結果（?q=検索語、最大SEARCH_RESULT_LIMIT件、JSON）"""
+    if backend is None:
+        return jsonify({'error': 'Todoの保存先が初期化されていません'}), 500
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'qに検索語を指定してください'}), 400
+    etag = f"{backend.get_data_version()}-search-{hashlib.sha1(query.encode('utf-8')).hexdigest()[:16]}"
+    def build_payload():
+        todos = backend.search(query)
+        return {'query': query, 'total': len(todos), 'todos': [todo.to_dict() for todo in todos[:SEARCH_RESULT_LIMIT]]}
+    return json_with_etag(etag, build_payload)
+
+@app.route('/api/todos/<int:todo_id>')
+def api_todo(todo_id):
+    """IDで指定したTodo（JSON）"""
+    if backend is None:
+        return jsonify({'error': 'Todoの保存先が初期化されていません'}), 500
+    etag = f"{backend.get_data_version()}-{todo_id}"
+    todo = None
+    if not request.if_none_match.contains(etag):
+        todo = backend.get_todo_by_id(todo_id)
+        if not todo:
+            return jsonify({'error': 'Todoが見つかりません'}), 404
+    return json_with_etag(etag, lambda: todo.to_dict())
+
+@app.route('/export')
+def export():
+    """すべてのTodoをファイルとしてダウンロード（?format=csv（既定）またはndjson、読み進めながら送る）"""
+    if backend is None:
+        return jsonify({'error': 'Todoの保存先が初期化されていません'}), 500
+    fmt = request.args.get('format', 'csv')
+    if fmt not in FORMATS:
+        return jsonify({'error': 'formatはcsvまたはndjsonを指定してください'}), 400
+    # 保存先からの読み取りはここで始める（失敗した場合は送り始める前にエラーを返すため）
+    todos = backend.iter_todos()
+    response = app.response_class(stream_with_context(export_todos(todos, fmt)), content_type=FORMATS[fmt])
+    response.headers['Content-Disposition'] = f"attachment; filename=todos-{get_jst_today().strftime('%Y%m%d')}.{fmt}"
+    return response
+
+@app.route('/import', methods=['POST'])
+def import_todos():
+    """CSVまたはNDJSONのTodoを新しいIDで追加（JSONで件数を返す）
+    
+    multipart/form-dataのfile、またはリクエストの本文をそのまま読む。形式は?format=、ファイル名の拡張子、
+    Content-Typeの順に判定する。行は読み込みながらIMPORT_CHUNK_SIZE件ずつ書き込む。
+    """
+    if backend is None:
+        return jsonify({'error': 'Todoの保存先が初期化されていません'}), 500
+    upload = request.files.get('file')
+    content_types = {content_type.split(';')[0]: fmt for fmt, content_type in FORMATS.items()}
+    fmt = (request.values.get('format')
+           or detect_format(upload.filename if upload else None)
+           or content_types.get(upload.mimetype if upload else request.mimetype))
+    if fmt not in FORMATS:
+        return jsonify({'error': 'formatはcsvまたはndjsonを指定してください'}), 400
+    stream = io.TextIOWrapper(upload.stream if upload else request.stream, encoding='utf-8-sig', newline='')
+    reader = ImportReader(stream, fmt)
+    try:
+        imported = backend.import_todos(reader, chunk_size=IMPORT_CHUNK_SIZE)
+    except UnicodeDecodeError:
+        return jsonify({'error': 'ファイルはUTF-8で保存してください'}), 400
+    return jsonify({
+        'imported': imported,
+        'skipped': reader.skipped,
+        'errors': [{'line': line_number, 'reason': reason} for line_number, reason in reader.errors]
+    })
+
+@app.route('/events')
+def events():
+    """Todoの変更をServer-Sent Eventsで配信する（LIVE_EVENTS=1の場合のみ）
+    
+    このプロセスでの書き込みのほか、接続中は定期的にデータのバージョンを確認し、
+    シートの直接編集や他のプロセスの書き込みで取得し直した変更も配信する。
+    """
+    if not LIVE_EVENTS or backend is None:
+        return "変更の配信は無効です（LIVE_EVENTS=1で有効になります）", 404
+    if not live_events.connect():
+        response = app.response_class("接続数が上限に達しています", status=503, mimetype='text/plain')
+        response.headers['Retry-After'] = '30'
+        return response
+    response = app.response_class(
+        live_events.stream(request.headers.get('Last-Event-ID'), check=backend.get_data_version),
+        content_type='text/event-stream; charset=utf-8')
+    response.headers['Cache-Control'] = 'no-cache'
+    # リバースプロキシ（nginx）にバッファリングさせない
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.call_on_close(live_events.disconnect)
+    return response
+
+@app.route('/stats/cache')
+def cache_stats():
+    """スプレッドシート読み取りキャッシュの統計情報（JSON）"""
+    if backend is None:
+        return jsonify({'error': 'Todoの保存先が初期化されていません'}), 500
+    stats = backend.get_cache_stats()
+    stats['fragments'] = fragment_cache.get_stats()
+    if LIVE_EVENTS:
+        stats['live_events'] = live_events.get_stats()
+    return jsonify(stats)
+
+@app.route('/stats/api')
+def api_stats():
+    """Google Sheets API呼び出しの統計情報（JSON、SQLiteで書き出しを使わない場合は空）"""
+    if backend is None:
+        return jsonify({'error': 'Todoの保存先が初期化されていません'}), 500
+    return jsonify(backend.get_api_stats())
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """ルートごとのリクエストとGoogle Sheets API呼び出しの計測値（Prometheusのテキスト形式、ワーカープロセスごと）"""
+    if not metrics.enabled:
+        return "計測は無効です（METRICS_ENABLED=1で有効になります）", 404
+    return app.response_class(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 if __name__ == '__main__':
-    if sheets_api is None:
+    if backend is None:
         print("\nアプリを起動できません。上記のエラーを解決してください。\n")
         exit(1)
     
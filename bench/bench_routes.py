@@ -0,0 +1,235 @@
+"""Flaskのルートのベンチマーク（Googleには接続せず、bench/fake_gspread.pyのスプレッドシートを使う）
+
+行数ごとに別のプロセスで合成のシートを用意し、各ルートをREQUESTS回ずつ呼び出して
+ルートごとのAPI呼び出し回数（キャッシュが有効な状態の1回あたりと、キャッシュを破棄した直後の1回）、
+所要時間のp50・p99、1回分で確保したメモリのピーク、プロセスの最大RSSを表示する。
+
+    python bench/bench_routes.py                          # 100・1000・10000・100000行
+    python bench/bench_routes.py --sizes 100,1000 --latency 50 --quota-errors 0.05
+    python bench/bench_routes.py --save bench/baseline.json
+    python bench/bench_routes.py --baseline bench/baseline.json   # API呼び出しが増えていたら終了コード1
+                                                                   # （--requestsが基準と違えば比較せず終了コード2）
+
+SHEETS_COMPACT_READSなどの環境変数はそのまま使われる（省略時はレート制限・日次の整理を無効にし、
+TTLを長くして、キャッシュの再取得が計測に混ざらないようにする）。
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from datetime import timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+sys.path.insert(0, BENCH_DIR)
+
+DEFAULT_SIZES = '100,1000,10000,100000'
+
+def percentile(values, p):
+    """最近傍法のパーセンタイル"""
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(p / 100 * len(values))) - 1))]
+
+def seed_spreadsheet(spreadsheet, count, today):
+    """確認済みのシート構成に、期日を前後60日に散らしたcount件のTodoを用意する（3件に1件は完了）"""
+    from sheets_api import HEADERS, SCHEMA_METADATA_KEY, SCHEMA_VERSION
+    todos, future = [list(HEADERS)], [list(HEADERS)]
+    weekday_names = ['月', '火', '水', '木', '金', '土', '日']
+    for i in range(1, count + 1):
+        due = today + timedelta(days=i % 121 - 60)
+        completed = i % 3 == 0
+        row = [str(i), f'Todo {i}', f'内容 {i}' if i % 2 else '', weekday_names[due.weekday()],
+               due.strftime('%Y-%m-%d'), '2026-01-01 09:00:00', '2026-01-02 09:00:00' if completed else '',
+               '完了' if completed else '未完了', '']
+        (future if due > today + timedelta(days=1) else todos).append(row)
+    spreadsheet.sheets = []
+    spreadsheet.add_sheet('Todos', todos)
+    spreadsheet.add_sheet('Todos_Future', future)
+    spreadsheet.add_sheet('Todos_Meta', [['種別', '値1', '値2', '日時'],
+                                         ['id_base', str(count), '20', '2026-01-01 09:00:00']], col_count=4)
+    spreadsheet.developer_metadata = [{'metadataKey': SCHEMA_METADATA_KEY, 'metadataValue': SCHEMA_VERSION}]
+
+def run_worker(count, requests_per_route, latency, quota_error_rate, output):
+    """1つの行数についてルートを計測し、結果をoutputにJSONで書き出す（別プロセスで実行される）"""
+    for key, value in [('TODO_BACKEND', 'sheets'), ('SHEETS_RATE_LIMIT', '0'), ('SHEETS_ROLLOVER', '0'),
+                       ('SHEETS_CACHE_TTL', '3600'), ('SHEETS_RETRY_BASE_DELAY', '0.05'), ('SHEETS_POLL_INTERVAL', '0')]:
+        os.environ.setdefault(key, value)
+    import fake_gspread
+    from todo_backend import get_jst_today
+    today = get_jst_today()
+    spreadsheet = fake_gspread.FakeSpreadsheet(latency=latency / 1000, quota_error_rate=quota_error_rate)
+    seed_spreadsheet(spreadsheet, count, today)
+    fake_gspread.install(spreadsheet)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as app_module
+    backend = app_module.backend
+    client = app_module.app.test_client()
+    
+    # 更新系のルートは毎回別のTodoを対象にする（期日が今日以前の未完了のTodo）
+    target_ids = [i for i in range(1, count + 1) if i % 3 and today + timedelta(days=i % 121 - 60) <= today]
+    open_ids = iter(target_ids)
+    later = (today + timedelta(days=7)).strftime('%Y-%m-%d')
+    routes = [
+        ('GET /today', lambda: client.get('/today')),
+        ('GET /tomorrow', lambda: client.get('/tomorrow')),
+        ('GET /date/<+7>', lambda: client.get(f'/date/{later}')),
+        ('GET /week/<today>', lambda: client.get(f"/week/{today.strftime('%Y-%m-%d')}")),
+        ('GET /search?q=', lambda: client.get('/search?q=内容 12')),
+        ('GET /edit/<id>', lambda: client.get('/edit/1')),
+        ('GET /api/todos', lambda: client.get('/api/todos')),
+        ('GET /api/todos/overdue', lambda: client.get('/api/todos/overdue')),
+        ('GET /api/todos/<id>', lambda: client.get('/api/todos/1')),
+        ('GET /export', lambda: client.get('/export', buffered=True)),
+        ('POST /add', lambda: client.post('/add', data={'title': 'bench', 'content': '', 'due_date': today.strftime('%Y-%m-%d')})),
+        ('POST /complete/<id>', lambda: client.post(f'/complete/{next(open_ids)}')),
+        ('POST /carryover/<id>', lambda: client.post(f'/carryover/{next(open_ids)}')),
+        ('POST /delete/<id>', lambda: client.post(f'/delete/{next(open_ids)}', data={'view_type': 'today'})),
+    ]
+    
+    results = {'size': count, 'requests': requests_per_route, 'routes': {}}
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        client.get('/today')  # 接続（バックグラウンド）の完了を待つ
+        results['first_request_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        results['connect_calls'] = dict(spreadsheet.calls)
+        for name, request in routes:
+            if name.startswith('POST') and len(target_ids) < 3 * (requests_per_route + 2):
+                # 行数が少なく対象が足りない場合は、計測の前に今日が期日のTodoを追加しておく
+                while len(target_ids) < 3 * (requests_per_route + 2):
+                    target_ids.append(backend.add_todo('bench target', '', today.strftime('%Y-%m-%d')))
+            # キャッシュを破棄した直後の1回（シートから取得し直す分を含む）
+            backend.invalidate_cache()
+            before = Counter(spreadsheet.calls)
+            status = request().status_code
+            cold_calls = dict(spreadsheet.calls - before)
+            # キャッシュが有効な状態での呼び出し
+            before = Counter(spreadsheet.calls)
+            timings = []
+            for _ in range(requests_per_route):
+                started = time.perf_counter()
+                request()
+                timings.append((time.perf_counter() - started) * 1000)
+            warm_calls = spreadsheet.calls - before
+            tracemalloc.start()
+            request()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results['routes'][name] = {
+                'status': status,
+                'p50_ms': round(percentile(timings, 50), 2),
+                'p99_ms': round(percentile(timings, 99), 2),
+                'calls_per_request': {method: round(n / requests_per_route, 3) for method, n in sorted(warm_calls.items())},
+                'cold_calls': cold_calls,
+                'peak_mib': round(peak / 1024 / 1024, 2)
+            }
+    results['quota_errors'] = dict(spreadsheet.errors)
+    results['max_rss_mib'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False)
+
+def format_calls(calls):
+    return ' '.join(f'{method}={n:g}' for method, n in sorted(calls.items())) or '-'
+
+def print_results(results):
+    for result in results:
+        print(f"\n== {result['size']}行  最初のリクエスト {result['first_request_ms']} ms  "
+              f"接続 {format_calls(result['connect_calls'])}  最大RSS {result['max_rss_mib']} MiB"
+              + (f"  429 {format_calls(result['quota_errors'])}" if result['quota_errors'] else ''))
+        print(f"{'route':<24}{'p50 ms':>9}{'p99 ms':>9}{'peak MiB':>10}  calls/request | cold calls")
+        for name, route in result['routes'].items():
+            print(f"{name:<24}{route['p50_ms']:>9.2f}{route['p99_ms']:>9.2f}{route['peak_mib']:>10.2f}  "
+                  f"{format_calls(route['calls_per_request'])} | {format_calls(route['cold_calls'])}")
+
+def find_mismatches(results, baseline):
+    """基準の結果とルートごとの呼び出し回数が違う行数を探す（[メッセージ]）
+    
+    IDブロックの予約などは呼び出し回数によって起きる回数が変わるため、回数が違う結果とは比べられない。
+    """
+    baseline = {result['size']: result for result in baseline}
+    mismatches = []
+    for result in results:
+        base = baseline.get(result['size'])
+        if base is not None and base.get('requests') != result['requests']:
+            mismatches.append(f"{result['size']}行: 基準 --requests {base.get('requests', '不明')}、"
+                              f"今回 --requests {result['requests']}")
+    return mismatches
+
+def find_regressions(results, baseline):
+    """基準の結果よりAPI呼び出しが増えたルートを探す（[メッセージ]）"""
+    baseline = {result['size']: result for result in baseline}
+    regressions = []
+    for result in results:
+        base = baseline.get(result['size'])
+        if base is None:
+            continue
+        for name, route in result['routes'].items():
+            base_route = base['routes'].get(name)
+            if base_route is None:
+                continue
+            for key in ['calls_per_request', 'cold_calls']:
+                for method, n in route[key].items():
+                    if n > base_route[key].get(method, 0) + 1e-9:
+                        regressions.append(f"{result['size']}行 {name} {key} {method}: "
+                                           f"{base_route[key].get(method, 0):g} -> {n:g}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f'行数（カンマ区切り、省略時は{DEFAULT_SIZES}）')
+    parser.add_argument('--requests', type=int, default=20, help='ルートごとの呼び出し回数')
+    parser.add_argument('--latency', type=float, default=0.0, help='API呼び出し1回の待ち時間（ミリ秒）')
+    parser.add_argument('--quota-errors', type=float, default=0.0, help='429を返す割合（0〜1）')
+    parser.add_argument('--save', help='結果をJSONで保存するファイル')
+    parser.add_argument('--baseline', help='比べる基準の結果（--saveで保存したJSON）')
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--output', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker is not None:
+        run_worker(args.worker, args.requests, args.latency, args.quota_errors, args.output)
+        return 0
+    
+    results = []
+    for size in [int(size) for size in args.sizes.split(',') if size.strip()]:
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            output = f.name
+        try:
+            # 行数ごとに別のプロセスで計測する（メモリとキャッシュの状態を持ち越さない）
+            subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', str(size), '--output', output,
+                            '--requests', str(args.requests), '--latency', str(args.latency),
+                            '--quota-errors', str(args.quota_errors)], check=True)
+            with open(output, encoding='utf-8') as f:
+                results.append(json.load(f))
+        finally:
+            os.remove(output)
+    print_results(results)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        mismatches = find_mismatches(results, baseline)
+        if mismatches:
+            print('\nルートごとの呼び出し回数が基準と違うため比較できません（基準と同じ --requests で実行してください）:')
+            for message in mismatches:
+                print(f'  {message}')
+            return 2
+        regressions = find_regressions(results, baseline)
+        if regressions:
+            print('\nAPI呼び出しが増えています:')
+            for message in regressions:
+                print(f'  {message}')
+            return 1
+        print('\nAPI呼び出しは基準から増えていません')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
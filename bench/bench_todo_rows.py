@@ -0,0 +1,108 @@
+"""Todoの変換（行 → Todo）のベンチマーク
+
+以前の方法（リクエストごとに行ごとのdictを作る）と、Todo（__slots__）への変換、
+スナップショットごとに一度だけ変換する方法（bench/fake_gspread.pyのスプレッドシートを読むSheetsAPIの
+get_all_todos）を比べる。
+
+    python bench/bench_todo_rows.py [行数（省略時は50000）]
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+sys.path.insert(0, BENCH_DIR)
+
+import fake_gspread
+from bench_routes import seed_spreadsheet
+from todo_backend import Todo, get_jst_today
+
+REQUESTS = 20
+
+def make_spreadsheet(count):
+    """count件のTodoを用意したメモリ上のスプレッドシートと、両ワークシートのTodoの行（ヘッダーなし）"""
+    spreadsheet = fake_gspread.FakeSpreadsheet()
+    seed_spreadsheet(spreadsheet, count, get_jst_today())
+    rows = spreadsheet.sheet('Todos').rows[1:] + spreadsheet.sheet('Todos_Future').rows[1:]
+    return spreadsheet, rows
+
+def legacy_todos(rows):
+    """以前のget_all_todos：リクエストごとに行ごとのdictを作り、期日の文字列で並べる"""
+    todos = []
+    for row in rows:
+        if row and row[0].isdigit():
+            todos.append({
+                'id': int(row[0]),
+                'title': row[1] if len(row) > 1 else '',
+                'content': row[2] if len(row) > 2 else '',
+                'day_of_week': row[3] if len(row) > 3 else '',
+                'due_date': row[4] if len(row) > 4 else '',
+                'created_at': row[5] if len(row) > 5 else '',
+                'completed_at': row[6] if len(row) > 6 else '',
+                'status': row[7] if len(row) > 7 else '未完了',
+                'target_date': row[8] if len(row) > 8 else ''
+            })
+    todos.sort(key=lambda todo: todo.get('due_date', '').strip() or '9999-12-31')
+    return todos
+
+def slots_todos(rows):
+    """リクエストごとにTodo（__slots__）へ変換する"""
+    todos = [Todo.from_row(row) for row in rows if row and row[0].isdigit()]
+    todos.sort(key=lambda todo: todo.due_date or '9999-12-31')
+    return todos
+
+def make_api(spreadsheet):
+    """spreadsheetを読むSheetsAPI（レート制限・日次の整理を無効にし、TTLを長くしてスナップショットを使い回す）"""
+    for key, value in [('SHEETS_RATE_LIMIT', '0'), ('SHEETS_ROLLOVER', '0'), ('SHEETS_CACHE_TTL', '3600'),
+                       ('SHEETS_POLL_INTERVAL', '0'), ('SHEETS_WRITE_BEHIND', '0'), ('METRICS_ENABLED', '0')]:
+        os.environ.setdefault(key, value)
+    fake_gspread.install(spreadsheet)
+    from sheets_api import SheetsAPI
+    with contextlib.redirect_stdout(io.StringIO()):
+        api = SheetsAPI()
+        api.get_all_todos()  # 接続（計測から除く）
+    return api
+
+def measure(name, build):
+    """REQUESTS回の所要時間と、1回分で確保したメモリ（ピーク）を計測"""
+    build()  # 初回の変換（キャッシュ）は計測から除く
+    timings = []
+    for _ in range(REQUESTS):
+        started = time.perf_counter()
+        build()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    tracemalloc.start()
+    result = build()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<28} p50 {timings[len(timings) // 2]:8.1f} ms   max {timings[-1]:8.1f} ms   "
+          f"peak {peak / 1024 / 1024:7.1f} MiB   ({len(result)} todos)")
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    spreadsheet, rows = make_spreadsheet(count)
+    print(f"{count}行、{REQUESTS}回ずつ")
+    measure('dict per row (legacy)', lambda: legacy_todos(rows))
+    measure('Todo per request', lambda: slots_todos(rows))
+    # スナップショットの行ごとに一度だけ変換したTodoを使い回す
+    measure('Todo once per snapshot', make_api(spreadsheet).get_all_todos)
+    # 変換済みのTodoを保持するためのメモリ（以前は毎回作り直していた分）
+    tracemalloc.start()
+    kept = legacy_todos(rows)
+    legacy_size = tracemalloc.get_traced_memory()[0]
+    del kept
+    tracemalloc.stop()
+    tracemalloc.start()
+    kept = slots_todos(rows)
+    slots_size = tracemalloc.get_traced_memory()[0]
+    del kept
+    tracemalloc.stop()
+    print(f"retained: dict {legacy_size / 1024 / 1024:.1f} MiB / Todo {slots_size / 1024 / 1024:.1f} MiB")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,292 @@
+"""ベンチマーク用のgspreadの代わり（メモリ上のスプレッドシート）
+
+sheets_api.pyが使うClient・Spreadsheet・Worksheetのメソッドだけを実装する。
+呼び出しごとの待ち時間（latency）と、一定の割合で429（クォータ超過）を返す設定（quota_error_rate）を持つ。
+呼び出し回数はメソッドごとにFakeSpreadsheet.callsに数える。
+"""
+import json
+import os
+import random
+import re
+import tempfile
+import time
+from collections import Counter
+
+import gspread
+import requests
+
+def _column_number(letters):
+    """列名（A, B, ..., AA）を列番号（1始まり）に変換"""
+    number = 0
+    for ch in letters:
+        number = number * 26 + ord(ch) - 64
+    return number
+
+def _parse_range(a1):
+    """A1形式の範囲を(開始行, 開始列, 終了行（Noneなら最終行まで）, 終了列)に変換"""
+    a1 = a1.split('!')[-1]
+    match = re.match(r'^([A-Z]+):([A-Z]+)$', a1)
+    if match:
+        return 1, _column_number(match.group(1)), None, _column_number(match.group(2))
+    match = re.match(r'^([A-Z]+)(\d+)(?::([A-Z]+)(\d+)?)?$', a1)
+    if not match:
+        raise ValueError(f"対応していない範囲です: {a1}")
+    start_row, start_col = int(match.group(2)), _column_number(match.group(1))
+    if not match.group(3):
+        return start_row, start_col, start_row, start_col
+    end_row = int(match.group(4)) if match.group(4) else None
+    return start_row, start_col, end_row, _column_number(match.group(3))
+
+def _cell_value(cell):
+    """batch_updateのセル（userEnteredValue）を文字列に変換"""
+    value = cell.get('userEnteredValue', {})
+    return str(value.get('stringValue', value.get('numberValue', '')))
+
+def api_error(code, message, status):
+    """APIErrorを作る"""
+    response = requests.Response()
+    response.status_code = code
+    response._content = json.dumps({'error': {'code': code, 'message': message, 'status': status}}).encode()
+    return gspread.exceptions.APIError(response)
+
+def quota_error():
+    """429（クォータ超過）のAPIErrorを作る"""
+    return api_error(429, 'Quota exceeded (fake)', 'RESOURCE_EXHAUSTED')
+
+class FakeWorksheet:
+    """メモリ上のワークシート（行は文字列のリスト）"""
+    def __init__(self, spreadsheet, title, sheet_id, col_count=10):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.id = sheet_id
+        self.col_count = col_count
+        self.rows = []
+    
+    @property
+    def row_count(self):
+        return max(len(self.rows), 1000)
+    
+    def _trim(self):
+        """末尾の空行を取り除く（Google Sheetsの値の取得と同じく、空行は返さない）"""
+        while self.rows and not any(self.rows[-1]):
+            self.rows.pop()
+    
+    def _set(self, row_index, col_index, value):
+        while len(self.rows) < row_index:
+            self.rows.append([])
+        row = self.rows[row_index - 1]
+        while len(row) < col_index:
+            row.append('')
+        row[col_index - 1] = '' if value is None else str(value)
+    
+    def _write(self, a1, values):
+        start_row, start_col, _, _ = _parse_range(a1)
+        for i, row in enumerate(values):
+            for j, value in enumerate(row):
+                self._set(start_row + i, start_col + j, value)
+    
+    def _read(self, a1=None):
+        self._trim()
+        if not a1:
+            return [list(row) for row in self.rows]
+        start_row, start_col, end_row, end_col = _parse_range(a1)
+        values = []
+        for i in range(start_row, (end_row or len(self.rows)) + 1):
+            row = self.rows[i - 1][start_col - 1:end_col] if i <= len(self.rows) else []
+            while row and row[-1] == '':
+                row.pop()
+            values.append(row)
+        while values and not values[-1]:
+            values.pop()
+        return values
+    
+    def _append(self, rows):
+        self._trim()
+        start = len(self.rows) + 1
+        for row in rows:
+            self.rows.append(['' if value is None else str(value) for value in row])
+        return {'updates': {'updatedRange': f"'{self.title}'!A{start}:I{len(self.rows)}"}}
+    
+    def get_all_values(self):
+        self.spreadsheet._api('get_all_values')
+        self._trim()
+        width = max((len(row) for row in self.rows), default=0)
+        return [list(row) + [''] * (width - len(row)) for row in self.rows]
+    
+    def get_values(self, a1=None, **kwargs):
+        self.spreadsheet._api('get_values')
+        return self._read(a1)
+    
+    def row_values(self, row_index):
+        self.spreadsheet._api('row_values')
+        return list(self.rows[row_index - 1]) if row_index <= len(self.rows) else []
+    
+    def update(self, a1, values=None, **kwargs):
+        self.spreadsheet._api('update')
+        if values is None:
+            a1, values = 'A1', a1
+        self._write(a1, values)
+        return {}
+    
+    def append_row(self, values, **kwargs):
+        self.spreadsheet._api('append_row')
+        return self._append([values])
+    
+    def append_rows(self, values, **kwargs):
+        self.spreadsheet._api('append_rows')
+        return self._append(values)
+    
+    def delete_rows(self, start, end=None):
+        self.spreadsheet._api('delete_rows')
+        del self.rows[start - 1:end or start]
+
+class FakeSpreadsheet:
+    """メモリ上のスプレッドシート
+    
+    latency: 1回の呼び出しにかかる秒数（jitterの割合だけばらつかせる）
+    quota_error_rate: 429（クォータ超過）を返す割合（0〜1、seedで再現可能）
+    """
+    def __init__(self, latency=0.0, jitter=0.2, quota_error_rate=0.0, seed=0):
+        self.id = 'fake-spreadsheet'
+        self.latency = latency
+        self.jitter = jitter
+        self.quota_error_rate = quota_error_rate
+        self._random = random.Random(seed)
+        self.calls = Counter()  # {メソッド名: 呼び出し回数}
+        self.errors = Counter()  # {メソッド名: 429を返した回数}
+        self.developer_metadata = []
+        self.sheets = [FakeWorksheet(self, 'Sheet1', 0)]
+        self._next_sheet_id = 1
+    
+    def _api(self, name):
+        """API呼び出し1回分（回数を数え、待ち時間を入れ、設定した割合で429を返す）"""
+        self.calls[name] += 1
+        if self.latency > 0:
+            time.sleep(self.latency * (1 + self._random.uniform(-self.jitter, self.jitter)))
+        if self.quota_error_rate > 0 and self._random.random() < self.quota_error_rate:
+            self.errors[name] += 1
+            raise quota_error()
+    
+    def add_sheet(self, title, rows=(), col_count=10):
+        """ワークシートを追加する（APIの呼び出しとしては数えない。データの準備用）"""
+        worksheet = FakeWorksheet(self, title, self._next_sheet_id, col_count)
+        self._next_sheet_id += 1
+        worksheet.rows = [list(row) for row in rows]
+        self.sheets.append(worksheet)
+        return worksheet
+    
+    def sheet(self, title):
+        """シート名でワークシートを取得（APIの呼び出しとしては数えない）"""
+        title = title.strip("'")
+        for worksheet in self.sheets:
+            if worksheet.title == title:
+                return worksheet
+        raise gspread.exceptions.WorksheetNotFound(title)
+    
+    def _sheet_by_id(self, sheet_id):
+        return next(worksheet for worksheet in self.sheets if worksheet.id == sheet_id)
+    
+    def _split_range(self, a1):
+        if '!' in a1:
+            title, a1 = a1.rsplit('!', 1)
+            return self.sheet(title), a1
+        return self.sheet(a1), None
+    
+    def worksheets(self):
+        self._api('worksheets')
+        return list(self.sheets)
+    
+    def worksheet(self, title):
+        self._api('worksheet')
+        return self.sheet(title)
+    
+    def add_worksheet(self, title, rows, cols, index=None):
+        self._api('add_worksheet')
+        if any(worksheet.title == title for worksheet in self.sheets):
+            # 同じ名前のシートは作成できない（別のワーカーが先に作成した場合など）
+            raise api_error(400, f'A sheet with the name "{title}" already exists (fake)', 'INVALID_ARGUMENT')
+        return self.add_sheet(title, col_count=cols)
+    
+    def del_worksheet(self, worksheet):
+        self._api('del_worksheet')
+        self.sheets.remove(worksheet)
+    
+    def fetch_sheet_metadata(self, params=None):
+        self._api('fetch_sheet_metadata')
+        return {
+            'sheets': [{'properties': {'title': worksheet.title, 'sheetId': worksheet.id,
+                                       'gridProperties': {'rowCount': worksheet.row_count,
+                                                          'columnCount': worksheet.col_count}}}
+                       for worksheet in self.sheets],
+            'developerMetadata': list(self.developer_metadata)
+        }
+    
+    def values_batch_get(self, ranges, params=None):
+        self._api('values_batch_get')
+        value_ranges = []
+        for a1 in ranges:
+            worksheet, cells = self._split_range(a1)
+            value_ranges.append({'range': a1, 'values': worksheet._read(cells)})
+        return {'valueRanges': value_ranges}
+    
+    def values_get(self, a1, params=None):
+        self._api('values_get')
+        worksheet, cells = self._split_range(a1)
+        return {'range': a1, 'values': worksheet._read(cells)}
+    
+    def batch_update(self, body):
+        self._api('batch_update')
+        for request in body['requests']:
+            if 'updateCells' in request:
+                update = request['updateCells']
+                worksheet = self._sheet_by_id(update['start']['sheetId'])
+                start_row = update['start']['rowIndex']
+                start_col = update['start'].get('columnIndex', 0)
+                for i, row in enumerate(update['rows']):
+                    for j, cell in enumerate(row['values']):
+                        worksheet._set(start_row + i + 1, start_col + j + 1, _cell_value(cell))
+            elif 'appendCells' in request:
+                append = request['appendCells']
+                worksheet = self._sheet_by_id(append['sheetId'])
+                worksheet._append([[_cell_value(cell) for cell in row['values']] for row in append['rows']])
+            elif 'deleteDimension' in request:
+                target = request['deleteDimension']['range']
+                del self._sheet_by_id(target['sheetId']).rows[target['startIndex']:target['endIndex']]
+            elif 'appendDimension' in request:
+                append = request['appendDimension']
+                self._sheet_by_id(append['sheetId']).col_count += append['length']
+            elif 'createDeveloperMetadata' in request:
+                self.developer_metadata.append(request['createDeveloperMetadata']['developerMetadata'])
+            elif 'updateSheetProperties' in request:
+                pass
+            else:
+                raise NotImplementedError(f"対応していないリクエストです: {list(request)}")
+        return {}
+
+class FakeClient:
+    """gspread.Clientの代わり（open_by_keyは常に同じスプレッドシートを返す）"""
+    def __init__(self, spreadsheet):
+        self.spreadsheet = spreadsheet
+    
+    def open_by_key(self, key):
+        self.spreadsheet._api('open_by_key')
+        return self.spreadsheet
+    
+    def get_file_drive_metadata(self, file_id):
+        self.spreadsheet._api('get_file_drive_metadata')
+        # 内容が変わるたびに変わる値を最終更新日時の代わりにする
+        return {'modifiedTime': str(hash(tuple(tuple(map(tuple, worksheet.rows)) for worksheet in self.spreadsheet.sheets)))}
+
+def install(spreadsheet):
+    """sheets_apiがGoogleの代わりにspreadsheetを使うようにする（sheets_apiのimport後、SheetsAPIの作成前に呼ぶ）"""
+    import sheets_api
+    sheets_api.gspread.authorize = lambda creds: FakeClient(spreadsheet)
+    sheets_api.gspread.Worksheet = lambda parent, properties: parent._sheet_by_id(properties['sheetId'])
+    sheets_api.Credentials.from_service_account_file = staticmethod(lambda *args, **kwargs: None)
+    credentials = tempfile.NamedTemporaryFile('w', suffix='.json', delete=False)
+    credentials.write('{}')
+    credentials.close()
+    os.environ['GOOGLE_CREDENTIALS_FILE'] = credentials.name
+    os.environ['SPREADSHEET_ID'] = spreadsheet.id
+    os.environ.pop('GOOGLE_CREDENTIALS_JSON', None)
+    return spreadsheet
@@ -0,0 +1,45 @@
+import threading
+from collections import OrderedDict
+
+class FragmentCache:
+    """描画済みのHTMLの一部（フラグメント）をキャッシュする
+    
+    キーには（表示する日付, データのバージョン, 今日の日付）を含めて呼び出す。
+    データのバージョンか今日の日付が変わったら（書き込み・日付の変わり目）、古いフラグメントはすべて破棄する。
+    """
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # {キー: HTML}（古く使われたものから順）
+        self._generation = None  # (データのバージョン, 今日の日付)
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+    
+    def get_or_render(self, key, generation, render):
+        """キャッシュ済みのフラグメントを返す（なければrender()で描画して保存）"""
+        with self._lock:
+            if generation != self._generation:
+                # 書き込みか日付の変わり目で内容が変わったため、以前のフラグメントは使わない
+                if self._entries:
+                    self.stats['invalidations'] += 1
+                self._entries.clear()
+                self._generation = generation
+            html = self._entries.get((key, generation))
+            if html is not None:
+                self._entries.move_to_end((key, generation))
+                self.stats['hits'] += 1
+                return html
+            self.stats['misses'] += 1
+        # 描画はロックの外で行う（同じフラグメントを同時に描画しても結果は同じ）
+        html = render()
+        with self._lock:
+            if generation == self._generation:
+                self._entries[(key, generation)] = html
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.stats['evictions'] += 1
+        return html
+    
+    def get_stats(self):
+        """キャッシュの統計情報"""
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries), max_entries=self.max_entries)
@@ -0,0 +1,141 @@
+import json
+import threading
+import time
+import uuid
+from collections import deque
+
+# 1回の書き込みでこれより多くのTodoが変わった場合は、個別のイベントの代わりにreloadを送る
+MAX_EVENTS_PER_CHANGE = 50
+
+def classify_change(before, after):
+    """変更の種類（added・deleted・completed・moved・updated）"""
+    if before is None:
+        return 'added'
+    if after is None:
+        return 'deleted'
+    if after.status == '完了' and before.status != '完了':
+        return 'completed'
+    if after.due_date != before.due_date:
+        return 'moved'
+    return 'updated'
+
+def change_event(before, after):
+    """変更1件分のイベントのデータ（削除の場合のtodoは削除前の内容）"""
+    todo = after if after is not None else before
+    return {
+        'type': classify_change(before, after),
+        'id': todo.id,
+        'todo': todo.to_dict(),
+        # 一覧のどの日付に影響するかをクライアントが判断できるように、変更前の期日と状態も送る
+        'previous': {'due_date': before.due_date, 'status': before.status} if before is not None else None
+    }
+
+class EventBroker:
+    """Todoの変更をServer-Sent Eventsで接続中のブラウザに配信する（プロセスごと）
+    
+    バックエンドのadd_change_listenerにpublish_changesを登録して使う。送ったイベントは直近history件を保持し、
+    再接続したブラウザにはLast-Event-ID以降のイベントを送り直す（保持していなければreloadを送る）。
+    イベントのIDにはプロセスごとのトークンを付け、別のプロセスや再起動前のIDで再接続された場合もreloadを送る。
+    """
+    def __init__(self, max_clients=32, history=256):
+        self.max_clients = max_clients
+        self._token = uuid.uuid4().hex[:8]
+        self._condition = threading.Condition()
+        self._events = deque(maxlen=history)  # [(連番, イベント名, JSON), ...]
+        self._next_seq = 1
+        self._clients = 0
+        self.stats = {'published': 0, 'reloads': 0, 'connections': 0, 'rejected': 0}
+    
+    def publish(self, name, data):
+        """イベントを1件追加して、待っている接続を起こす"""
+        payload = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+        with self._condition:
+            self._events.append((self._next_seq, name, payload))
+            self._next_seq += 1
+            self.stats['published'] += 1
+            self._condition.notify_all()
+    
+    def publish_changes(self, changes):
+        """バックエンドからの変更の通知（[(変更前のTodo, 変更後のTodo), ...]）をイベントにする"""
+        if len(changes) > MAX_EVENTS_PER_CHANGE:
+            # インポートなどで一度に多くのTodoが変わった場合は、一覧を取得し直してもらう
+            self.stats['reloads'] += 1
+            self.publish('reload', {'count': len(changes)})
+            return
+        for before, after in changes:
+            self.publish('todo', change_event(before, after))
+    
+    def connect(self):
+        """接続を1つ受け付ける（上限に達していればFalse）"""
+        with self._condition:
+            if self._clients >= self.max_clients:
+                self.stats['rejected'] += 1
+                return False
+            self._clients += 1
+            self.stats['connections'] += 1
+            return True
+    
+    def disconnect(self):
+        """connectで受け付けた接続を閉じる"""
+        with self._condition:
+            self._clients = max(0, self._clients - 1)
+    
+    def get_stats(self):
+        with self._condition:
+            return dict(self.stats, clients=self._clients, max_clients=self.max_clients, history=len(self._events))
+    
+    def _format(self, seq, name, payload):
+        return f"id: {self._token}-{seq}\nevent: {name}\ndata: {payload}\n\n"
+    
+    def _start_seq(self, last_event_id):
+        """Last-Event-IDの次の連番（別のプロセス・再起動前のIDなら0）"""
+        token, _, seq = last_event_id.partition('-')
+        if token != self._token or not seq.isdigit():
+            return 0
+        return int(seq) + 1
+    
+    def _take(self, seq):
+        """連番seq以降のイベントを送る文字列のリストにする（_conditionを保持して呼ぶ。(リスト, 次の連番)を返す）"""
+        oldest = self._events[0][0] if self._events else self._next_seq
+        if seq < oldest:
+            # 送り直せないイベントがある（切断中・送信が遅れている間に保持する件数を超えた）場合は、一覧を取得し直してもらう
+            self.stats['reloads'] += 1
+            return [self._format(self._next_seq - 1, 'reload', '{}')], self._next_seq
+        return [self._format(*event) for event in self._events if event[0] >= seq], self._next_seq
+    
+    def stream(self, last_event_id=None, check=None, check_interval=5.0, max_seconds=300.0, retry_ms=3000):
+        """接続1つ分のレスポンスの本文を返すジェネレーター
+        
+        イベントがない間はcheck_interval秒ごとにcheck（他のプロセス・シートの直接編集の検出に使う）を呼び、
+        コメントを送って接続が切れていないかを確かめる。max_seconds秒で終了し、ブラウザの再接続に任せる
+        （ワーカーのスレッドを占有し続けないため）。
+        """
+        yield f"retry: {retry_ms}\n\n"
+        with self._condition:
+            if last_event_id:
+                pending, seq = self._take(self._start_seq(last_event_id))
+            else:
+                pending, seq = [], self._next_seq
+        deadline = time.monotonic() + max_seconds
+        while True:
+            if pending:
+                yield ''.join(pending)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            with self._condition:
+                if self._next_seq <= seq:
+                    self._condition.wait(min(check_interval, remaining))
+                pending, seq = self._take(seq)
+            if pending:
+                continue
+            if check is not None:
+                try:
+                    check()
+                except Exception as e:
+                    print(f"変更の確認中にエラーが発生しました: {e}")
+                # checkで検出した変更はすぐに送る
+                with self._condition:
+                    pending, seq = self._take(seq)
+            if not pending:
+                pending = [": keepalive\n\n"]
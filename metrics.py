@@ -0,0 +1,164 @@
+import os
+import re
+import threading
+from bisect import bisect_left
+
+# ヒストグラムのバケット（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# {メトリクス名: (種類, 説明)}
+METRIC_HELP = {
+    'todo_http_requests_total': ('counter', 'ルートごとのリクエスト数'),
+    'todo_http_request_duration_seconds': ('histogram', 'ルートごとのリクエストの処理時間'),
+    'todo_sheets_calls_total': ('counter', 'Google Sheets APIの呼び出し回数（outcome: ok・error・rejected）'),
+    'todo_sheets_call_duration_seconds': ('histogram', 'Google Sheets APIの呼び出し1回の所要時間'),
+    'todo_sheets_rows_total': ('counter', 'Google Sheets APIから受け取った行数'),
+    'todo_sheets_response_bytes_total': ('counter', 'Google Sheets APIから受け取った値のバイト数（UTF-8）'),
+}
+
+# A1形式の範囲からシート名を取り出す（'Todos'!A2:I → Todos）
+SHEET_NAME_PATTERN = re.compile(r"^'?(.*?)'?(?:!.*)?$")
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+def _format_value(value):
+    return f'{value:.6g}' if isinstance(value, float) else str(value)
+
+def _result_rows(result):
+    """gspreadの呼び出し結果から値の行を取り出す（values_batch_get・values_get・get_values・row_valuesなど）"""
+    if isinstance(result, dict):
+        if 'valueRanges' in result:
+            return [row for value_range in result['valueRanges'] for row in value_range.get('values', [])]
+        return result.get('values', [])
+    if isinstance(result, list) and result:
+        return result if isinstance(result[0], list) else [result]
+    return []
+
+def call_target(func, args):
+    """API呼び出しの対象のワークシート名（ワークシートのメソッドならそのシート、範囲の指定ならその中のシート名）"""
+    owner = getattr(func, '__self__', None)
+    if owner is not None and hasattr(owner, 'col_count'):
+        return owner.title
+    if args and isinstance(args[0], list):
+        ranges = args[0]
+    elif args and isinstance(args[0], str) and '!' in args[0]:
+        ranges = [args[0]]
+    else:
+        return '-'
+    return ','.join(sorted({SHEET_NAME_PATTERN.match(a1).group(1) for a1 in ranges if isinstance(a1, str)})) or '-'
+
+class Metrics:
+    """Prometheus形式のカウンターとヒストグラム（プロセスごと）と、リクエストごとのプロファイル
+    
+    enabled: /metricsで公開するために集計する（METRICS_ENABLED）
+    profile: X-Profileヘッダーを付けたリクエストにServer-Timingヘッダーを返す（METRICS_PROFILE）
+    どちらも無効な場合はactiveがFalseになり、呼び出し側は計測そのものを行わない。
+    """
+    def __init__(self, enabled=False, profile=False, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.profile = profile
+        self.active = enabled or profile
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = {}  # {(メトリクス名, ラベル): 値}
+        self._histograms = {}  # {(メトリクス名, ラベル): [バケットごとの件数..., 合計, 件数]}
+        self._local = threading.local()  # 処理中のリクエストのプロファイル
+    
+    def inc(self, name, labels, value=1):
+        """カウンターを増やす（labelsは(ラベル名, 値)のタプル）"""
+        with self._lock:
+            key = (name, labels)
+            self._counters[key] = self._counters.get(key, 0) + value
+    
+    def observe(self, name, labels, seconds):
+        """ヒストグラムに1件追加する"""
+        with self._lock:
+            values = self._histograms.get((name, labels))
+            if values is None:
+                values = self._histograms[(name, labels)] = [0] * len(self.buckets) + [0.0, 0]
+            index = bisect_left(self.buckets, seconds)
+            if index < len(self.buckets):
+                values[index] += 1
+            values[-2] += seconds
+            values[-1] += 1
+    
+    def record_sheets_call(self, method, worksheet, elapsed=None, result=None, outcome='ok'):
+        """Google Sheets APIの呼び出し1回分（elapsedがNoneなら呼び出さずに拒否した分）"""
+        rows = _result_rows(result) if outcome == 'ok' else []
+        profile = getattr(self._local, 'profile', None)
+        if profile is not None:
+            profile['calls'] += 1
+            profile['rows'] += len(rows)
+            profile['seconds'] += elapsed or 0.0
+        if not self.enabled:
+            return
+        self.inc('todo_sheets_calls_total', (('method', method), ('worksheet', worksheet), ('outcome', outcome)))
+        if elapsed is not None:
+            self.observe('todo_sheets_call_duration_seconds', (('method', method),), elapsed)
+        if rows:
+            labels = (('method', method), ('worksheet', worksheet))
+            self.inc('todo_sheets_rows_total', labels, len(rows))
+            self.inc('todo_sheets_response_bytes_total', labels,
+                     sum(len(''.join(map(str, row)).encode('utf-8')) for row in rows))
+    
+    def start_profile(self):
+        """このスレッドで処理するリクエストのプロファイルを始める"""
+        self._local.profile = {'calls': 0, 'rows': 0, 'seconds': 0.0}
+    
+    def finish_profile(self):
+        """プロファイルを終えて結果を返す（始めていなければNone）"""
+        profile = getattr(self._local, 'profile', None)
+        self._local.profile = None
+        return profile
+    
+    def record_request(self, route, method, status, elapsed):
+        """Flaskのリクエスト1件分"""
+        if not self.enabled:
+            return
+        self.inc('todo_http_requests_total', (('route', route), ('method', method), ('status', str(status))))
+        self.observe('todo_http_request_duration_seconds', (('route', route), ('method', method)), elapsed)
+    
+    def render(self):
+        """Prometheusのテキスト形式で出力する"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, list(values)) for key, values in self._histograms.items())
+        lines = []
+        written = set()
+        def header(name):
+            if name not in written:
+                written.add(name)
+                kind, description = METRIC_HELP.get(name, ('untyped', ''))
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} {kind}')
+        for (name, labels), value in counters:
+            header(name)
+            lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        for (name, labels), values in histograms:
+            header(name)
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", _format_value(float(bound))),))} {cumulative}')
+            lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {values[-1]}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(values[-2])}')
+            lines.append(f'{name}_count{_format_labels(labels)} {values[-1]}')
+        return '\n'.join(lines) + '\n'
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+def get_metrics():
+    """プロセス全体で共有する計測（初回の呼び出しで環境変数から作る）"""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = Metrics(enabled=os.environ.get('METRICS_ENABLED', '0') == '1',
+                               profile=os.environ.get('METRICS_PROFILE', '0') == '1')
+        return _metrics
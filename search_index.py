@@ -0,0 +1,84 @@
+import unicodedata
+
+def normalize(text):
+    """検索用に正規化（全角英数字・半角カナをそろえ、英字は小文字にする）"""
+    return unicodedata.normalize('NFKC', text).lower()
+
+def bigrams(text):
+    """空白で区切った各部分の2文字ずつの組（日本語は単語に分けずに文字の並びで検索する）"""
+    grams = set()
+    for part in text.split():
+        grams.update(part[i:i + 2] for i in range(len(part) - 1))
+    return grams
+
+class SearchIndex:
+    """タイトル・内容の全文検索用の転置インデックス（文字bigram）
+    
+    キーごとに（タイトル, 内容）を登録し、bigramから候補を絞り込んだあと、
+    正規化した本文に検索語が含まれるかを確かめて結果を返す（bigramの組み合わせによる誤検出を除く）。
+    1文字の検索語はbigramで絞り込めないため、登録済みの本文を順に調べる。
+    """
+    def __init__(self):
+        self._postings = {}  # {bigram: {キー, ...}}
+        self._docs = {}  # {キー: ((タイトル, 内容), 正規化した本文)}
+    
+    def __len__(self):
+        return len(self._docs)
+    
+    def add(self, key, title, content):
+        """キーの（タイトル, 内容）を登録（登録済みなら置き換える）"""
+        if key in self._docs:
+            self.remove(key)
+        text = normalize(f'{title}\n{content}')
+        self._docs[key] = ((title, content), text)
+        postings = self._postings
+        for gram in bigrams(text):
+            keys = postings.get(gram)
+            if keys is None:
+                postings[gram] = {key}
+            else:
+                keys.add(key)
+    
+    def remove(self, key):
+        """キーの登録を削除"""
+        entry = self._docs.pop(key, None)
+        if entry is None:
+            return
+        for gram in bigrams(entry[1]):
+            keys = self._postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[gram]
+    
+    def sync(self, docs):
+        """{キー: (タイトル, 内容)}と同じ内容になるように、変わったキーだけを登録し直す。登録し直した件数を返す"""
+        changed = 0
+        for key in [key for key in self._docs if key not in docs]:
+            self.remove(key)
+            changed += 1
+        for key, fields in docs.items():
+            entry = self._docs.get(key)
+            if entry is None or entry[0] != fields:
+                self.add(key, *fields)
+                changed += 1
+        return changed
+    
+    def search(self, query):
+        """空白で区切ったすべての語を含むキーの集合"""
+        terms = normalize(query).split()
+        if not terms:
+            return set()
+        candidates = None
+        # 長い（絞り込みやすい）語から順に、件数の少ないbigramから候補を絞る
+        for term in sorted(terms, key=len, reverse=True):
+            if len(term) < 2:
+                continue
+            postings = sorted((self._postings.get(gram, ()) for gram in bigrams(term)), key=len)
+            for keys in postings:
+                candidates = set(keys) if candidates is None else candidates & keys
+                if not candidates:
+                    return set()
+        if candidates is None:
+            candidates = self._docs.keys()
+        return {key for key in candidates if all(term in self._docs[key][1] for term in terms)}
@@ -0,0 +1,116 @@
+import fcntl
+import json
+import mmap
+import os
+import struct
+import threading
+import uuid
+from contextlib import contextmanager
+
+# バージョンファイルの形式（バージョン番号8バイト + 共有キャッシュの識別子8バイト）
+VERSION_FORMAT = '<Q8s'
+
+class SharedSnapshot:
+    """同じマシンのワーカープロセス間で共有するスナップショット（ローカルファイル）
+    
+    path: スナップショット本体（JSON、置き換えで書き込む）
+    path + '.version': バージョン番号（公開するたびに1つ上げる。mmapで読むためシステムコールなしで確認できる）
+    path + '.lock': 書き込み・再取得用のロック（flock）
+    path + '.leader': 定期取得の担当（リーダー）のロック（担当のプロセスが終了すると他のプロセスが引き継ぐ）
+    """
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0  # このプロセスでロックを取得している深さ
+        self._lock_fd = os.open(path + '.lock', os.O_RDWR | os.O_CREAT, 0o644)
+        self._leader_fd = None
+        self._version_fd = os.open(path + '.version', os.O_RDWR | os.O_CREAT, 0o644)
+        size = struct.calcsize(VERSION_FORMAT)
+        with self.lock():
+            if os.fstat(self._version_fd).st_size < size:
+                os.ftruncate(self._version_fd, size)
+                os.pwrite(self._version_fd, struct.pack(VERSION_FORMAT, 0, uuid.uuid4().hex[:8].encode()), 0)
+        self._version_map = mmap.mmap(self._version_fd, size)
+    
+    def version(self):
+        """公開済みのバージョン番号（まだ公開されていなければ0）"""
+        return struct.unpack_from(VERSION_FORMAT, self._version_map)[0]
+    
+    def token(self):
+        """共有キャッシュの識別子（ファイルを作り直したときに以前のバージョン番号と区別するため）"""
+        return struct.unpack_from(VERSION_FORMAT, self._version_map)[1].decode()
+    
+    @contextmanager
+    def lock(self):
+        """プロセス間の排他ロック（同じスレッドからは入れ子にできる）"""
+        with self._thread_lock:
+            self._depth += 1
+            try:
+                if self._depth == 1:
+                    fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+    
+    @contextmanager
+    def try_lock(self):
+        """ロックを待たずに取得を試みる（取得できたかをyieldする）"""
+        if not self._thread_lock.acquire(blocking=False):
+            yield False
+            return
+        try:
+            if self._depth == 0:
+                try:
+                    fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    yield False
+                    return
+            self._depth += 1
+            try:
+                yield True
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+        finally:
+            self._thread_lock.release()
+    
+    def try_lead(self):
+        """定期取得の担当になれるか（一度なったらプロセスが終了するまで担当を続ける）"""
+        if self._leader_fd is not None:
+            return True
+        fd = os.open(self.path + '.leader', os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._leader_fd = fd
+        return True
+    
+    @property
+    def is_leader(self):
+        """このプロセスが定期取得の担当か"""
+        return self._leader_fd is not None
+    
+    def read(self):
+        """公開済みのスナップショットを読み込む（{'version', 'loaded_at', 'revision', 'snapshot'}、なければNone）"""
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+    
+    def publish(self, snapshot, loaded_at, revision=None):
+        """スナップショットを公開してバージョン番号を上げる（lock()の中で呼ぶ）。新しいバージョン番号を返す"""
+        version = self.version() + 1
+        temp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': version, 'loaded_at': loaded_at, 'revision': revision, 'snapshot': snapshot},
+                      f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(temp_path, self.path)
+        # 本体を置き換えてからバージョン番号を上げる（番号を見て読み込んだ側が古い本体を読まないように）
+        struct.pack_into('<Q', self._version_map, 0, version)
+        return version
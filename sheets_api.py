@@ -1,23 +1,160 @@
 import gspread
 from google.oauth2.service_account import Credentials
+import atexit
+import json
 import os
+import random
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-import pytz
+from itertools import islice
+from metrics import call_target, get_metrics
+from search_index import SearchIndex
+from todo_backend import (HEADERS, TODO_FIELDS, SheetsUnavailableError, Todo, TodoBackend, bucket_todos_by_date,
+                          chunked, get_jst_now, get_jst_today, parse_date)
 
-# 日本時間（JST）のタイムゾーン
-JST = pytz.timezone('Asia/Tokyo')
+# シート構成（ワークシート・ヘッダー）を確認済みであることを示す開発者メタデータ
+# 列構成などを変えたときはバージョンを上げ、次回起動時に確認し直す
+SCHEMA_METADATA_KEY = 'todo_app_schema_version'
+SCHEMA_VERSION = '1'
 
-def get_jst_now():
-    """現在の日本時間を取得"""
-    return datetime.now(JST)
+# 範囲を絞った読み取りでスナップショットに読み込む列（列番号（0始まり）: 列名）。ID・期日・状態
+COMPACT_COLUMNS = {0: 'A', 4: 'E', 7: 'H'}
 
-def get_jst_today():
-    """今日の日付を日本時間で取得"""
-    return get_jst_now().date()
+# 日次の整理の担当を決めるときに、Todos_Rolloverシートの末尾から一度に読む行数
+ROLLOVER_CLAIM_WINDOW = 20
 
-class SheetsAPI:
+def _cell_data(value):
+    """batch_update（updateCells/appendCells）用のセル値に変換"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {'userEnteredValue': {'numberValue': value}}
+    return {'userEnteredValue': {'stringValue': '' if value is None else str(value)}}
+
+def _is_transient_error(error):
+    """時間をおけば成功する可能性があるエラーか（429・5xx・通信エラー）"""
+    if isinstance(error, gspread.exceptions.APIError):
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+        return status == 429 or (status is not None and 500 <= status < 600)
+    # requestsの通信エラー（ConnectionError・Timeoutなど）はOSErrorのサブクラス
+    return isinstance(error, OSError)
+
+class TokenBucket:
+    """1分あたりの呼び出し回数を制限する（バケットにたまったトークンを1回につき1つ消費）"""
+    def __init__(self, rate_per_minute, burst):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1.0, float(burst))
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """トークンを1つ消費する（なければ補充されるまで待つ）。待った秒数を返す"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+class CircuitBreaker:
+    """連続して失敗したら一定時間呼び出しを止め、その後1回だけ試してから再開する"""
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False  # 停止明けの試行中
+        self.open_count = 0
+        self.lock = threading.Lock()
+    
+    def allow(self):
+        """呼び出してよいか"""
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.trial or time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            self.trial = True
+            return True
+    
+    def retry_after(self):
+        """呼び出しを再開するまでの秒数"""
+        with self.lock:
+            if self.opened_at is None:
+                return 0.0
+            return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+    
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+    
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial or (self.threshold > 0 and self.failures >= self.threshold):
+                if self.opened_at is None:
+                    self.open_count += 1
+                self.opened_at = time.monotonic()
+                self.trial = False
+    
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half_open' if self.trial else 'open'
+
+class WriteBatch:
+    """1つの操作で行うセル更新・行追加・行削除をまとめておく（行番号は変更前のもの）"""
     def __init__(self):
-        """Google Sheets APIの初期化"""
+        self.updates = []  # (ワークシート, 行番号, 開始列, 値のリスト)
+        self.appends = []  # (ワークシート, 値のリスト)
+        self.deletes = []  # (ワークシート, 行番号)
+    
+    def update_cells(self, worksheet, row_index, start_col, values):
+        """行番号row_indexのstart_col列目（1始まり）から値を書き込む"""
+        self.updates.append((worksheet, row_index, start_col, list(values)))
+    
+    def append_row(self, worksheet, values):
+        """ワークシートの末尾に行を追加"""
+        self.appends.append((worksheet, list(values)))
+    
+    def delete_row(self, worksheet, row_index):
+        """行を削除"""
+        self.deletes.append((worksheet, row_index))
+    
+    def is_empty(self):
+        return not (self.updates or self.appends or self.deletes)
+    
+    def sorted_deletes(self):
+        """行番号のずれを防ぐため、下の行から順に並べた削除対象"""
+        return sorted(self.deletes, key=lambda item: item[1], reverse=True)
+    
+    def grouped_appends(self):
+        """ワークシートごとにまとめた追加行（[(ワークシート, [値のリスト, ...])]、各ワークシート内の順序は保つ）"""
+        groups = {}
+        for worksheet, values in self.appends:
+            groups.setdefault(worksheet.id, (worksheet, []))[1].append(values)
+        return list(groups.values())
+
+class SheetsAPI(TodoBackend):
+    def __init__(self, write_behind=None):
+        """Google Sheets APIの初期化（スプレッドシートへの接続は最初に使うときに行う）
+        
+        write_behindを指定すると環境変数SHEETS_WRITE_BEHINDより優先する（他のバックエンドからの書き出し用）。
+        """
+        started = time.monotonic()
         # 環境変数から設定を取得
         scope = [
             'https://spreadsheets.google.com/feeds',
@@ -28,7 +165,6 @@ class SheetsAPI:
         creds_json = os.environ.get('GOOGLE_CREDENTIALS_JSON')
         if creds_json:
             # 環境変数からJSON文字列を取得して認証情報を作成（Render用）
-            import json
             try:
                 creds_dict = json.loads(creds_json)
                 creds = Credentials.from_service_account_info(creds_dict, scopes=scope)
@@ -48,95 +184,1094 @@ class SheetsAPI:
         if not spreadsheet_id:
             raise ValueError("SPREADSHEET_ID環境変数が設定されていません")
         
-        self.spreadsheet = self.client.open_by_key(spreadsheet_id)
-        self._cleanup_sheets()  # 空白の1枚目を削除
-        self.worksheet = self._get_or_create_worksheet()
-        self.future_worksheet = self._get_or_create_future_worksheet()
-        self._ensure_headers()
-        self._ensure_future_headers()
+        # 読み取りキャッシュ（両ワークシートのスナップショット）
+        # SHEETS_CACHE_TTL秒以内の読み取りはAPIを呼ばずにスナップショットから返す
+        # このプロセスからの書き込みは再取得せずにスナップショットへ直接反映する
+        self.cache_ttl = float(os.environ.get('SHEETS_CACHE_TTL', '30'))
+        self._cache_lock = threading.RLock()
+        self._snapshot = None
+        self._snapshot_loaded_at = 0.0
+        self.snapshot_version = 0
+        self._instance_token = uuid.uuid4().hex[:8]  # 別プロセスのバージョン番号と区別するため
+        self.cache_stats = {'hits': 0, 'misses': 0, 'unchanged': 0, 'invalidations': 0, 'patches': 0, 'index_rebuilds': 0,
+                            'polls': 0, 'probe_unchanged': 0, 'poll_discarded': 0, 'poll_errors': 0,
+                            'stale_served': 0, 'row_fetches': 0, 'rows_fetched': 0, 'row_mismatches': 0}
+        self._write_seq = 0  # このプロセスからの書き込み回数（取得中に書き込みがあったかの判定用）
+        
+        # バックグラウンドでの定期取得（SHEETS_POLL_INTERVAL秒ごと、0なら無効）
+        # 有効な間はリクエスト処理中にシートを読みに行かず、公開済みのスナップショットだけを使う
+        self.poll_interval = float(os.environ.get('SHEETS_POLL_INTERVAL', '0'))
+        self.poll_full_every = int(os.environ.get('SHEETS_POLL_FULL_EVERY', '10'))
+        self._poller_thread = None
+        self._poller_stop = threading.Event()
+        self._last_revision = None
+        self._polls_since_full = 0
+        self._snapshot_pins = 0  # 0より大きい間は再取得せず現在のスナップショットを使う
+        self._write_lock = threading.RLock()  # このプロセスの書き込みを1つずつ行う（共有スナップショットを使う場合はそのロックを使う）
+        
+        # ワーカープロセス間で共有するスナップショット（SHEETS_SHARED_CACHEにファイルのパスを指定した場合のみ）
+        # シートから取得するのは1つのワーカーだけで、他のワーカーは公開されたファイルを読み込む
+        # 書き込んだワーカーは反映後のスナップショットを公開し直してバージョン番号を上げる（全ワーカーが同時に切り替わる）
+        shared_path = os.environ.get('SHEETS_SHARED_CACHE', '')
+        self._shared = None
+        if shared_path:
+            from shared_snapshot import SharedSnapshot  # fcntlを使うため、有効な場合だけ読み込む
+            self._shared = SharedSnapshot(shared_path)
+        self._shared_version = 0  # 取り込んだ（または公開した）共有スナップショットのバージョン番号
+        self._shared_loaded_at = 0.0  # 共有スナップショットをシートから取得した時刻（time.time()）
+        self._shared_reload = True  # Trueなら共有スナップショットを使わずにシートから取得する（接続直後・破棄した後）
+        self.shared_stats = {'loads': 0, 'publishes': 0, 'waits': 0, 'follows': 0}
+        
+        # 範囲を絞った読み取り（SHEETS_COMPACT_READSが1の場合のみ）
+        # スナップショットにはID・期日・状態の列だけを読み込み（他の列はNone）、
+        # 表示に必要な行の全列はそのときに1回のbatch_getでまとめて取得する
+        self.compact_reads = os.environ.get('SHEETS_COMPACT_READS', '0') == '1'
+        
+        # 書き込みの遅延反映（SHEETS_WRITE_BEHINDが1の場合のみ）
+        # 変更はすぐにスナップショットへ反映し、シートへはバックグラウンドでまとめて書き込む
+        if write_behind is None:
+            write_behind = os.environ.get('SHEETS_WRITE_BEHIND', '0') == '1'
+        self.write_behind = write_behind
+        if self.write_behind and self.compact_reads:
+            # 未書き込みの行の追加・削除でシートとスナップショットの行番号がずれるため併用できない
+            print("SHEETS_WRITE_BEHINDが有効なため、範囲を絞った読み取り（SHEETS_COMPACT_READS）は使用しません")
+            self.compact_reads = False
+        self.write_behind_interval = float(os.environ.get('SHEETS_WRITE_BEHIND_INTERVAL', '2'))
+        self.write_behind_journal = os.environ.get('SHEETS_WRITE_BEHIND_JOURNAL', 'write_behind_journal.jsonl')
+        self.write_behind_stats = {'queued': 0, 'merged': 0, 'cancelled': 0, 'flushes': 0, 'flushed_ops': 0,
+                                   'flush_errors': 0}
+        self._pending_ops = OrderedDict()  # {ID文字列: 最終的な状態}（未書き込み）
+        self._inflight_ops = OrderedDict()  # 書き込み中の操作
+        self._flush_lock = threading.Lock()
+        self._flush_stop = threading.Event()
+        self._flush_thread = None
+        
+        # Google Sheets APIの呼び出し制御（すべての呼び出しは_callを通す）
+        # SHEETS_RATE_LIMIT回/分を超えないように待ち、429・5xxは指数バックオフで再試行し、
+        # 連続して失敗したらSHEETS_BREAKER_COOLDOWN秒間は呼び出さずに最後に取得できた内容を返す
+        rate_limit = float(os.environ.get('SHEETS_RATE_LIMIT', '60'))
+        self._rate_limiter = TokenBucket(rate_limit, float(os.environ.get('SHEETS_RATE_BURST', '10'))) if rate_limit > 0 else None
+        self.retry_attempts = max(1, int(os.environ.get('SHEETS_RETRY_ATTEMPTS', '4')))
+        self.retry_base_delay = float(os.environ.get('SHEETS_RETRY_BASE_DELAY', '1'))
+        self._breaker = CircuitBreaker(int(os.environ.get('SHEETS_BREAKER_THRESHOLD', '5')),
+                                       float(os.environ.get('SHEETS_BREAKER_COOLDOWN', '30')))
+        self._api_stats = {}  # {メソッド名: 呼び出し回数・エラー数・所要時間など}
+        self._api_stats_lock = threading.Lock()
+        self._throttle_stats = {'throttled': 0, 'wait_ms': 0.0}
+        self._stale_snapshot = None  # 破棄したスナップショット（Googleに接続できない間の読み取り用）
+        # 呼び出しごとの計測（METRICS_ENABLED・METRICS_PROFILEのどちらかが有効な場合のみ）
+        metrics = get_metrics()
+        self._metrics = metrics if metrics.active else None
+        
+        # スナップショットから作るインデックス（行を走査せずにIDと期日で検索するため）
+        self._id_index = {}  # {ワークシート名: {ID文字列: 行番号}}
+        self._date_index = {}  # {期日文字列: {(ワークシート名, ID文字列), ...}}
+        self._indexed_snapshot = None  # インデックスを作成した時点のスナップショット
+        self._todos_by_row = {}  # {id(行): (行, Todo)}（行のリストは変更時に置き換えるため、同じ行は一度だけ変換する）
+        
+        # タイトル・内容の全文検索用のインデックス（最初の検索で作り、書き込みはパッチと同時に反映する）
+        # スナップショットが入れ替わった後の検索では、タイトル・内容が変わった行だけを登録し直す
+        self._search_index = None
+        self._search_snapshot = None  # 検索インデックスを合わせた時点のスナップショット
+        self.search_stats = {'searches': 0, 'syncs': 0, 'synced_docs': 0}
+        
+        # スプレッドシートへの接続は最初に使うときまで遅らせる（ワーカーの起動を待たせない）
+        # 通常はopen_by_key・メタデータ取得・全行取得の3回のAPI呼び出しで接続が終わる
+        self.spreadsheet_id = spreadsheet_id
+        self._init_lock = threading.Lock()
+        self._ready = False
+        self._boot_snapshot = None  # 接続時に取得した全行（最初の読み取りで公開する）
+        self._spreadsheet = None
+        self._worksheet = None
+        self._future_worksheet = None
+        self._meta_worksheet = None
+        self.startup_stats = {'init_ms': None, 'connect_ms': None, 'connect_api_calls': None,
+                              'schema_checked': None, 'connected_at': None}
+        
+        # ID採番（接続時に基準値を読み込み、以降はブロック単位で予約したIDを払い出す）
+        self._id_lock = threading.Lock()
+        self._reserved_ids = iter(())
+        
+        # 日次の整理（日付が変わって最初のリクエストか定期取得で、1日1回バックグラウンドで行う）
+        # 期日が明日以前になった未来用シートの行を通常のシートへ戻し、
+        # SHEETS_ARCHIVE_AFTER_DAYSが1以上なら、それより前に完了した行をTodos_Archiveシートへ移す
+        self.rollover_enabled = os.environ.get('SHEETS_ROLLOVER', '1') == '1'
+        self.archive_after_days = int(os.environ.get('SHEETS_ARCHIVE_AFTER_DAYS', '0'))
+        self._archive_worksheet = None
+        self._rollover_worksheet = None  # 日次の整理の担当の記録（最初の整理で作成）
+        self._rollover_lock = threading.Lock()
+        self._rollover_date = None  # 日次の整理が済んだ日（日本時間）
+        self.rollover_stats = {'runs': 0, 'moved': 0, 'archived': 0, 'skipped': 0, 'errors': 0, 'last_run_at': None}
+        
+        # 書き込みの遅延反映（前回の未書き込み分を読み込み、バックグラウンドスレッドを開始）
+        if self.write_behind:
+            self._replay_journal()
+            self._flush_thread = threading.Thread(target=self._flush_loop, name='sheets-write-behind', daemon=True)
+            self._flush_thread.start()
+            atexit.register(self.shutdown)
+        
+        self.startup_stats['init_ms'] = round((time.monotonic() - started) * 1000, 1)
     
-    def _cleanup_sheets(self):
+    @property
+    def spreadsheet(self):
+        self._ensure_ready()
+        return self._spreadsheet
+    
+    @property
+    def worksheet(self):
+        """通常のワークシート（過去・今日・明日用）"""
+        self._ensure_ready()
+        return self._worksheet
+    
+    @property
+    def future_worksheet(self):
+        """未来のTodo用ワークシート"""
+        self._ensure_ready()
+        return self._future_worksheet
+    
+    @property
+    def meta_worksheet(self):
+        """アプリ管理用（ID採番など）の非表示ワークシート"""
+        self._ensure_ready()
+        return self._meta_worksheet
+    
+    def _ensure_ready(self):
+        """最初に使うときにスプレッドシートへ接続する（接続済みなら何もしない）"""
+        if self._ready:
+            return
+        with self._init_lock:
+            if self._ready:
+                return
+            started = time.monotonic()
+            calls_before = self._api_call_count()
+            self._boot_snapshot = self._connect()
+            self._ready = True
+            connect_ms = round((time.monotonic() - started) * 1000, 1)
+            self.startup_stats['connect_ms'] = connect_ms
+            self.startup_stats['connect_api_calls'] = self._api_call_count() - calls_before
+            self.startup_stats['connected_at'] = get_jst_now().strftime('%Y-%m-%d %H:%M:%S')
+            print(f"スプレッドシートに接続しました（{connect_ms / 1000:.2f}秒、API呼び出し{self.startup_stats['connect_api_calls']}回）")
+        # 接続時に取得した全行を公開する（最初の読み取りでAPIを呼ばないように）
+        self._get_snapshot()
+    
+    def connect_in_background(self):
+        """スプレッドシートへの接続をバックグラウンドで始める（失敗した場合は最初の利用時に再試行）"""
+        def run():
+            try:
+                self._ensure_ready()
+            except Exception as e:
+                print(f"スプレッドシートへの接続に失敗しました（次の利用時に再試行します）: {e}")
+        thread = threading.Thread(target=run, name='sheets-connect', daemon=True)
+        thread.start()
+        return thread
+    
+    def _connect(self):
+        """スプレッドシートに接続し、ワークシートとID採番の設定を読み込む（取得した全行を返す）
+        
+        シート構成を確認済みの印（開発者メタデータ）があれば、シートの作成やヘッダーの確認は省略する。
+        初期化中に呼ばれるため、ここではプロパティ（self.worksheetなど）を使わないこと。
+        """
+        spreadsheet = self._call(self.client.open_by_key, self.spreadsheet_id)
+        # ワークシートの一覧と確認済みの印を1回のメタデータ取得で読み込む
+        metadata = self._call(spreadsheet.fetch_sheet_metadata, {'fields': 'sheets.properties,developerMetadata'})
+        worksheets = {}
+        for sheet in metadata.get('sheets', []):
+            worksheets.setdefault(sheet['properties']['title'], gspread.Worksheet(spreadsheet, sheet['properties']))
+        verified = any(item.get('metadataKey') == SCHEMA_METADATA_KEY and item.get('metadataValue') == SCHEMA_VERSION
+                       for item in metadata.get('developerMetadata', []))
+        self.startup_stats['schema_checked'] = not verified
+        if not verified:
+            self._setup_sheets(spreadsheet, worksheets)
+        self._spreadsheet = spreadsheet
+        self._worksheet = worksheets['Todos']
+        self._future_worksheet = worksheets['Todos_Future']
+        self._meta_worksheet = worksheets['Todos_Meta']
+        self._archive_worksheet = worksheets.get('Todos_Archive')
+        self._rollover_worksheet = worksheets.get('Todos_Rollover')
+        
+        # 両ワークシートの全行（範囲を絞った読み取りではID・期日・状態の列）とID採番の設定を1回で取得
+        # シート構成の確認が必要な場合はヘッダーを確認するため全列を取得する
+        todo_worksheets = [self._worksheet, self._future_worksheet]
+        compact = self.compact_reads and verified
+        ranges = self._snapshot_ranges(todo_worksheets, compact)
+        response = self._call(spreadsheet.values_batch_get, ranges + ["'Todos_Meta'!A2:C2"])
+        value_ranges = response.get('valueRanges', [])
+        snapshot = self._parse_snapshot(todo_worksheets, value_ranges, compact)
+        if not verified:
+            for worksheet in todo_worksheets:
+                snapshot[worksheet.title] = self._ensure_headers(worksheet, snapshot[worksheet.title])
+        settings = value_ranges[len(ranges)].get('values', []) if len(ranges) < len(value_ranges) else []
+        self._init_id_allocator(settings[0] if settings else [], snapshot)
+        if not verified:
+            self._mark_schema_verified(spreadsheet)
+        return snapshot
+    
+    def _setup_sheets(self, spreadsheet, worksheets):
+        """不足しているワークシートを作成し、空白の1枚目を削除する（シート構成が未確認の場合のみ）"""
+        for title in ['Todos', 'Todos_Future']:
+            if title not in worksheets:
+                worksheets[title] = self._add_worksheet(spreadsheet, title, rows=1000, cols=10)
+        if 'Todos_Meta' not in worksheets:
+            worksheets['Todos_Meta'] = self._create_meta_worksheet(spreadsheet)
+        self._cleanup_sheets(spreadsheet, worksheets)
+    
+    def _cleanup_sheets(self, spreadsheet, worksheets):
         """空白の1枚目のシートを削除（必要に応じて）"""
         try:
-            worksheets = self.spreadsheet.worksheets()
-            if len(worksheets) > 0:
-                first_sheet = worksheets[0]
-                # 1枚目のシートが空かどうか確認
-                all_values = first_sheet.get_all_values()
-                if not all_values or (len(all_values) == 1 and not any(first_sheet.row_values(1))):
-                    # 空白のシートなので削除
-                    self.spreadsheet.del_worksheet(first_sheet)
-                    print(f"空白のシート '{first_sheet.title}' を削除しました")
+            first_sheet = next(iter(worksheets.values()), None)
+            # アプリのシートは確認しない（全行をダウンロードしないように）
+            if first_sheet is None or first_sheet.title in ('Todos', 'Todos_Future', 'Todos_Meta', 'Todos_Archive', 'Todos_Rollover'):
+                return
+            # 1枚目のシートが空かどうか確認
+            all_values = self._call(first_sheet.get_all_values)
+            if not all_values or (len(all_values) == 1 and not any(all_values[0])):
+                # 空白のシートなので削除
+                self._call(spreadsheet.del_worksheet, first_sheet)
+                worksheets.pop(first_sheet.title, None)
+                print(f"空白のシート '{first_sheet.title}' を削除しました")
         except Exception as e:
             print(f"シートのクリーンアップ中にエラーが発生しました: {e}")
     
-    def _get_or_create_worksheet(self):
-        """通常のワークシートを取得または作成（過去・今日・昨日用）"""
+    def _add_worksheet(self, spreadsheet, title, rows, cols):
+        """ワークシートを作成（別のワーカーが同時に作成した場合は既存のものを返す）"""
         try:
-            worksheet = self.spreadsheet.worksheet('Todos')
-        except gspread.exceptions.WorksheetNotFound:
-            worksheet = self.spreadsheet.add_worksheet(title='Todos', rows=1000, cols=10)
-        return worksheet
+            return self._call(spreadsheet.add_worksheet, title=title, rows=rows, cols=cols)
+        except gspread.exceptions.APIError:
+            return self._call(spreadsheet.worksheet, title)
     
-    def _get_or_create_future_worksheet(self):
-        """未来のTodo用ワークシートを取得または作成"""
+    def _create_meta_worksheet(self, spreadsheet):
+        """アプリ管理用（ID採番など）の非表示ワークシートを作成"""
+        return self._add_hidden_worksheet(spreadsheet, 'Todos_Meta', rows=100, cols=4)
+    
+    def _add_hidden_worksheet(self, spreadsheet, title, rows, cols):
+        """アプリ管理用の非表示ワークシートを作成"""
+        worksheet = self._add_worksheet(spreadsheet, title, rows=rows, cols=cols)
         try:
-            worksheet = self.spreadsheet.worksheet('Todos_Future')
-        except gspread.exceptions.WorksheetNotFound:
-            worksheet = self.spreadsheet.add_worksheet(title='Todos_Future', rows=1000, cols=10)
+            self._call(spreadsheet.batch_update, {'requests': [{
+                'updateSheetProperties': {
+                    'properties': {'sheetId': worksheet.id, 'hidden': True},
+                    'fields': 'hidden'
+                }
+            }]})
+        except Exception as e:
+            print(f"{title}シートの非表示設定に失敗しました: {e}")
         return worksheet
     
+    def _mark_schema_verified(self, spreadsheet):
+        """シート構成を確認済みの印を付ける（次回以降の起動ではシートの作成やヘッダーの確認を省略する）"""
+        try:
+            self._call(spreadsheet.batch_update, {'requests': [{
+                'createDeveloperMetadata': {
+                    'developerMetadata': {
+                        'metadataKey': SCHEMA_METADATA_KEY,
+                        'metadataValue': SCHEMA_VERSION,
+                        'location': {'spreadsheet': True},
+                        'visibility': 'DOCUMENT'
+                    }
+                }
+            }]})
+        except Exception as e:
+            print(f"シート構成の確認済みの印を付けられませんでした（次回起動時に再確認します）: {e}")
+    
     def _get_worksheet_by_due_date(self, due_date):
         """期日に応じて適切なワークシートを返す"""
+        if self._is_future_due_date(due_date):
+            return self.future_worksheet
+        return self.worksheet
+    
+    def _is_future_due_date(self, due_date):
+        """未来用シートに入れる期日か（明後日以降）"""
         if due_date:
             today = get_jst_today()
             if isinstance(due_date, str):
-                try:
-                    due_date = datetime.strptime(due_date, '%Y-%m-%d').date()
-                except:
-                    return self.worksheet
+                due_date = parse_date(due_date)
+                if due_date is None:
+                    return False
             
             # 明日以降（未来）の期日なら未来用シート
             if due_date > today + timedelta(days=1):
-                return self.future_worksheet
+                return True
         
         # それ以外は通常のシート
-        return self.worksheet
+        return False
+    
+    def _ensure_headers(self, worksheet, rows):
+        """ワークシートのヘッダー行を確認し、足りなければ書き込む（確認後の全行を返す）"""
+        headers = rows[0] if rows else []
+        if not headers or headers[0] != 'ID' or len(headers) < len(HEADERS):
+            # 既存のヘッダーを更新
+            self._call(worksheet.update, 'A1:I1', [HEADERS])
+            return [list(HEADERS)] + rows[1:]
+        return rows
+    
+    def _load_snapshot(self, compact=None):
+        """両ワークシートの全行を1回のAPI呼び出しでまとめて取得
+        
+        compactを省略すると、範囲を絞った読み取りが有効ならID・期日・状態の列だけを取得する。
+        """
+        if compact is None:
+            compact = self.compact_reads
+        worksheets = [self.worksheet, self.future_worksheet]
+        response = self._call(self.spreadsheet.values_batch_get, self._snapshot_ranges(worksheets, compact))
+        return self._parse_snapshot(worksheets, response.get('valueRanges', []), compact)
+    
+    def _snapshot_ranges(self, worksheets, compact):
+        """スナップショットの取得に使う範囲（compactならワークシートごとにID・期日・状態の列）"""
+        if not compact:
+            return [f"'{ws.title}'" for ws in worksheets]
+        return [f"'{ws.title}'!{column}:{column}" for ws in worksheets for column in COMPACT_COLUMNS.values()]
+    
+    def _parse_snapshot(self, worksheets, value_ranges, compact):
+        """values_batch_getの結果をスナップショット（{ワークシート名: 行のリスト}）に変換"""
+        per_sheet = len(COMPACT_COLUMNS) if compact else 1
+        snapshot = {}
+        for n, worksheet in enumerate(worksheets):
+            columns = []
+            for k in range(n * per_sheet, (n + 1) * per_sheet):
+                columns.append(value_ranges[k].get('values', []) if k < len(value_ranges) else [])
+            if not compact:
+                snapshot[worksheet.title] = columns[0]
+                continue
+            # 取得していない列はNoneにしておく（全列が必要になったときに_fetch_rowsで補う）
+            rows = []
+            for i in range(max(len(values) for values in columns)):
+                row = [None] * len(HEADERS)
+                for index, values in zip(COMPACT_COLUMNS, columns):
+                    row[index] = values[i][0] if i < len(values) and values[i] else ''
+                rows.append(row)
+            snapshot[worksheet.title] = rows
+        return snapshot
     
-    def _ensure_headers(self):
-        """通常のワークシートのヘッダー行が存在することを確認"""
+    def _get_snapshot(self):
+        """キャッシュ済みのスナップショットを返す（TTL切れなら再取得）"""
+        self._ensure_ready()
+        with self._cache_lock:
+            if self._shared is not None and self._snapshot_pins == 0 and not self._shared_reload:
+                # 他のワーカーが新しいスナップショットを公開していれば取り込む（バージョン番号の確認だけならファイルは読まない）
+                self._adopt_shared()
+            if self._snapshot is not None:
+                # 定期取得スレッドが動いている間や書き込み処理の途中はTTLに関係なく現在のものを使う
+                if (self._poller_thread is not None or self._snapshot_pins > 0
+                        or time.monotonic() - self._snapshot_loaded_at < self.cache_ttl):
+                    self.cache_stats['hits'] += 1
+                    return self._snapshot
+            self.cache_stats['misses'] += 1
+            if self._shared is not None:
+                return self._refresh_shared()
+            self._refresh_snapshot()
+            return self._snapshot
+    
+    def _refresh_snapshot(self):
+        """シートから取得し直して公開する（取得できたらTrue、Googleに接続できず最後の内容を使う場合はFalse）"""
         try:
-            headers = self.worksheet.row_values(1)
-            expected_headers = ['ID', 'タイトル', '内容', '曜日', '期日', '作成日時', '完了日時', '状態', '対象日']
-            if not headers or headers[0] != 'ID' or len(headers) < len(expected_headers):
-                # 既存のヘッダーを更新
-                self.worksheet.update('A1:I1', [expected_headers])
-        except:
-            self.worksheet.insert_row(['ID', 'タイトル', '内容', '曜日', '期日', '作成日時', '完了日時', '状態', '対象日'], 1)
-    
-    def _ensure_future_headers(self):
-        """未来用ワークシートのヘッダー行が存在することを確認"""
+            # 接続直後は接続時に取得した全行を使う
+            snapshot, self._boot_snapshot = self._boot_snapshot, None
+            if snapshot is None:
+                snapshot = self._load_snapshot()
+        except Exception as e:
+            # Googleに接続できない間は、最後に取得できた内容を返す（書き込みは失敗させる）
+            stale = self._snapshot if self._snapshot is not None else self._stale_snapshot
+            if stale is None or not (isinstance(e, SheetsUnavailableError) or _is_transient_error(e)):
+                raise
+            self.cache_stats['stale_served'] += 1
+            self._snapshot = stale
+            return False
+        self._publish_snapshot(snapshot)
+        return True
+    
+    def _refresh_shared(self):
+        """共有スナップショットを使う場合の再取得（シートから取得するのは同時に1つのワーカーだけ）"""
+        with self._shared.try_lock() as locked:
+            if not locked:
+                # 他のワーカー・スレッドが取得中（または書き込み中）なので、公開されるまでは現在の内容を使う
+                # （_cache_lockを保持したままロックを待つと、書き込み中のスレッドと待ち合ってしまう）
+                self.shared_stats['waits'] += 1
+                current = self._snapshot if self._snapshot is not None else self._stale_snapshot
+                if current is not None:
+                    return current
+                # まだ一度も取得していなければ、共有せずにシートから取得する
+                self._refresh_snapshot()
+                return self._snapshot
+            with self._shared.lock():
+                # ロックを待っている間に他のワーカーが取得し直していれば、それを使う
+                if (not self._shared_reload and self._adopt_shared()
+                        and time.time() - self._shared_loaded_at < self.cache_ttl):
+                    return self._snapshot
+                if self._refresh_snapshot():
+                    self._shared_reload = False
+                    self._share_snapshot(time.time())
+                return self._snapshot
+    
+    def _adopt_shared(self):
+        """他のワーカーが公開した共有スナップショットがあれば取り込む（取り込んだらTrue）"""
+        version = self._shared.version()
+        if version == 0 or version == self._shared_version:
+            return False
+        shared = self._shared.read()
+        if shared is None or shared['version'] == self._shared_version:
+            return False
+        self._publish_snapshot(shared['snapshot'])
+        self._shared_version = shared['version']
+        self._shared_loaded_at = shared['loaded_at']
+        self._last_revision = shared['revision']
+        # TTLは共有スナップショットをシートから取得した時刻から数える
+        self._snapshot_loaded_at = time.monotonic() - max(0.0, time.time() - shared['loaded_at'])
+        self.shared_stats['loads'] += 1
+        return True
+    
+    def _share_snapshot(self, loaded_at=None):
+        """現在のスナップショットを他のワーカーに公開する（self._shared.lock()の中で呼ぶ）
+        
+        loaded_atを省略すると、シートから取得した時刻は取り込んだ時点のままにする（書き込みを反映しただけの場合）。
+        """
+        if loaded_at is None:
+            loaded_at = self._shared_loaded_at
+        self._shared_version = self._shared.publish(self._snapshot, loaded_at, self._last_revision)
+        self._shared_loaded_at = loaded_at
+        self.shared_stats['publishes'] += 1
+    
+    def _writer_lock(self):
+        """書き込みのロック（このプロセスの他のスレッド、共有スナップショットを使う場合は他のワーカーの書き込みとも重ならないように）
+        
+        _cache_lockより先に取得する（_cache_lockを保持したまま取得しない）。
+        """
+        return self._shared.lock() if self._shared is not None else self._write_lock
+    
+    def _publish_snapshot(self, snapshot):
+        """取得したスナップショットを公開する（内容が変わっていればTrue）"""
+        with self._cache_lock:
+            self._snapshot_loaded_at = time.monotonic()
+            old_snapshot = self._snapshot if self._snapshot is not None else self._stale_snapshot
+            if self._inflight_ops or self._pending_ops:
+                # 未書き込みの変更はシートに含まれていないため、取得した内容に重ねてから公開する
+                self._snapshot = snapshot
+                self._indexed_snapshot = None
+                self.snapshot_version += 1
+                with self._pinned_snapshot():
+                    self._overlay_ops(self._inflight_ops)
+                    self._overlay_ops(self._pending_ops)
+            else:
+                # 範囲を絞った読み取りではタイトルなどの変更を比較できないため、取得した内容を常に公開する
+                if not self.compact_reads and snapshot == self._snapshot:
+                    # シート側に変更がなければ既存のスナップショット（とインデックス）をそのまま使う
+                    self.cache_stats['unchanged'] += 1
+                    return False
+                self._snapshot = snapshot
+                self.snapshot_version += 1
+            # 範囲を絞った読み取りでは行の内容を比較できないため、外部からの変更は通知しない
+            if self._change_listeners and old_snapshot is not None and not self.compact_reads:
+                self._notify_snapshot_changes(old_snapshot, self._snapshot)
+            return True
+    
+    def start_poller(self):
+        """シートを定期的に取得するバックグラウンドスレッドを開始（SHEETS_POLL_INTERVALが0なら何もしない）"""
+        if self.poll_interval <= 0 or self._poller_thread is not None:
+            return False
+        self._poller_stop.clear()
+        self._poller_thread = threading.Thread(target=self._poll_loop, name='sheets-poller', daemon=True)
+        self._poller_thread.start()
+        return True
+    
+    def stop_poller(self):
+        """バックグラウンドスレッドを停止"""
+        thread = self._poller_thread
+        if thread is None:
+            return
+        self._poller_stop.set()
+        thread.join(timeout=self.poll_interval + 5)
+        self._poller_thread = None
+    
+    def _poll_loop(self):
+        """バックグラウンドスレッドの本体"""
+        while True:
+            try:
+                self.poll_once()
+            except Exception as e:
+                self.cache_stats['poll_errors'] += 1
+                print(f"シートの定期取得中にエラーが発生しました: {e}")
+            # 日付が変わったら、リクエストを待たずに日次の整理を始める
+            self.run_daily_maintenance()
+            if self._poller_stop.wait(self.poll_interval):
+                break
+    
+    def _probe_revision(self):
+        """スプレッドシートの最終更新日時を取得（全行を取得するより軽い）"""
         try:
-            headers = self.future_worksheet.row_values(1)
-            expected_headers = ['ID', 'タイトル', '内容', '曜日', '期日', '作成日時', '完了日時', '状態', '対象日']
-            if not headers or headers[0] != 'ID' or len(headers) < len(expected_headers):
-                # 既存のヘッダーを更新
-                self.future_worksheet.update('A1:I1', [expected_headers])
-        except:
-            self.future_worksheet.insert_row(['ID', 'タイトル', '内容', '曜日', '期日', '作成日時', '完了日時', '状態', '対象日'], 1)
-    
-    def _get_next_id(self, worksheet):
-        """次のIDを取得（指定されたワークシートから）"""
-        all_values = worksheet.get_all_values()
-        if len(all_values) <= 1:
-            return 1
-        
-        ids = []
-        for row in all_values[1:]:  # ヘッダーをスキップ
-            if row and row[0].isdigit():
-                ids.append(int(row[0]))
-        
-        return max(ids) + 1 if ids else 1
+            return self._call(self.client.get_file_drive_metadata, self.spreadsheet.id).get('modifiedTime')
+        except Exception as e:
+            print(f"スプレッドシートの更新日時の取得に失敗しました: {e}")
+            return None
+    
+    def poll_once(self):
+        """更新日時が変わっていれば全行を取得し直して公開する（内容が変わっていればTrue）"""
+        shared_version = None
+        if self._shared is not None:
+            with self._cache_lock:
+                changed = self._adopt_shared()
+            if not self._shared.try_lead():
+                # シートの取得はリーダーのワーカーに任せ、公開されたものを取り込むだけにする
+                self.shared_stats['follows'] += 1
+                return changed
+            shared_version = self._shared.version()
+        self.cache_stats['polls'] += 1
+        self._polls_since_full += 1
+        revision = self._probe_revision()
+        # 更新日時の反映が遅れることがあるため、一定回数ごとに必ず全行を取得する
+        if (revision is not None and revision == self._last_revision and self._snapshot is not None
+                and self._polls_since_full < self.poll_full_every):
+            self.cache_stats['probe_unchanged'] += 1
+            return False
+        with self._cache_lock:
+            write_seq = self._write_seq
+        # 全行の取得はロックの外で行う（リクエスト処理を待たせない）
+        snapshot = self._load_snapshot()
+        with self._writer_lock(), self._cache_lock:
+            if write_seq != self._write_seq or (self._shared is not None and self._shared.version() != shared_version):
+                # 取得中に（他のワーカーを含めて）書き込みがあったため、古い内容で上書きしないよう次回に回す
+                self.cache_stats['poll_discarded'] += 1
+                return False
+            self._last_revision = revision
+            self._polls_since_full = 0
+            changed = self._publish_snapshot(snapshot)
+            if changed and self._shared is not None:
+                self._shared_reload = False
+                self._share_snapshot(time.time())
+            return changed
+    
+    def _get_values(self, worksheet):
+        """指定ワークシートの全行をスナップショットから取得"""
+        return self._get_snapshot().get(worksheet.title, [])
+    
+    def invalidate_cache(self):
+        """スナップショットを破棄（次の読み取りで再取得する）"""
+        with self._cache_lock:
+            if self._snapshot is not None:
+                self._stale_snapshot = self._snapshot
+            self._snapshot = None
+            self._snapshot_loaded_at = 0.0
+            self._indexed_snapshot = None
+            self._shared_reload = True  # 共有スナップショットも同じ内容のため、シートから取得し直す
+            self.cache_stats['invalidations'] += 1
+    
+    def get_data_version(self):
+        """データのバージョン文字列を取得（スナップショットの内容が変わるたびに変わる）"""
+        with self._cache_lock:
+            self._get_snapshot()
+            if self._shared is not None and self._shared_version:
+                # 共有スナップショットのバージョン番号を使う（どのワーカーが応答しても同じ値になる）
+                return f'{self._shared.token()}-{self._shared_version}'
+            return f'{self._instance_token}-{self.snapshot_version}'
+    
+    def get_cache_stats(self):
+        """キャッシュのヒット/ミス数を取得"""
+        with self._cache_lock:
+            stats = dict(self.cache_stats)
+            stats['ttl'] = self.cache_ttl
+            stats['version'] = self.snapshot_version
+            stats['poller'] = self._poller_thread is not None
+            stats['compact_reads'] = self.compact_reads
+            stats['write_behind'] = dict(self.write_behind_stats, enabled=self.write_behind,
+                                         pending=len(self._pending_ops), inflight=len(self._inflight_ops))
+            stats['rollover'] = dict(self.rollover_stats, enabled=self.rollover_enabled,
+                                     archive_after_days=self.archive_after_days,
+                                     date=self._rollover_date.strftime('%Y-%m-%d') if self._rollover_date else None)
+            stats['search'] = dict(self.search_stats, built=self._search_index is not None,
+                                   docs=len(self._search_index) if self._search_index is not None else 0)
+            stats['shared'] = dict(self.shared_stats, enabled=self._shared is not None, version=self._shared_version,
+                                   leader=self._shared is not None and self._shared.is_leader)
+            if self._snapshot is not None:
+                stats['age'] = round(time.monotonic() - self._snapshot_loaded_at, 3)
+            else:
+                stats['age'] = None
+            return stats
+    
+    def _call(self, func, *args, **kwargs):
+        """gspreadのAPIを呼び出す（レート制限・再試行・サーキットブレーカー・統計をまとめて扱う）"""
+        name = getattr(func, '__name__', 'call')
+        target = call_target(func, args) if self._metrics is not None else None
+        for attempt in range(self.retry_attempts):
+            if not self._breaker.allow():
+                self._record_api_call(name, rejected=True)
+                if self._metrics is not None:
+                    self._metrics.record_sheets_call(name, target, outcome='rejected')
+                raise SheetsUnavailableError(self._breaker.retry_after())
+            if self._rate_limiter is not None:
+                waited = self._rate_limiter.acquire()
+                if waited > 0:
+                    with self._api_stats_lock:
+                        self._throttle_stats['throttled'] += 1
+                        self._throttle_stats['wait_ms'] += waited * 1000
+            started = time.monotonic()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                elapsed = time.monotonic() - started
+                self._record_api_call(name, elapsed=elapsed, error=True)
+                if self._metrics is not None:
+                    self._metrics.record_sheets_call(name, target, elapsed, outcome='error')
+                if not _is_transient_error(e):
+                    # 400・404などは呼び出し側の問題なので、Googleには接続できているとみなす
+                    self._breaker.record_success()
+                    raise
+                self._breaker.record_failure()
+                if attempt == self.retry_attempts - 1:
+                    raise
+                self._record_api_call(name, retry=True)
+                time.sleep(self.retry_base_delay * (2 ** attempt) + random.uniform(0, self.retry_base_delay))
+                continue
+            elapsed = time.monotonic() - started
+            self._breaker.record_success()
+            self._record_api_call(name, elapsed=elapsed)
+            if self._metrics is not None:
+                self._metrics.record_sheets_call(name, target, elapsed, result)
+            return result
+    
+    def _record_api_call(self, name, elapsed=None, error=False, retry=False, rejected=False):
+        """API呼び出しの統計をメソッドごとに記録"""
+        with self._api_stats_lock:
+            stats = self._api_stats.setdefault(name, {'calls': 0, 'errors': 0, 'retries': 0, 'rejected': 0,
+                                                      'total_ms': 0.0, 'max_ms': 0.0})
+            if elapsed is not None:
+                elapsed_ms = elapsed * 1000
+                stats['calls'] += 1
+                stats['total_ms'] += elapsed_ms
+                stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            stats['errors'] += error
+            stats['retries'] += retry
+            stats['rejected'] += rejected
+    
+    def _api_call_count(self):
+        """これまでのAPI呼び出し回数の合計"""
+        with self._api_stats_lock:
+            return sum(stats['calls'] for stats in self._api_stats.values())
+    
+    def get_api_stats(self):
+        """Google Sheets API呼び出しの統計（起動時間、メソッドごとの回数・所要時間、レート制限、ブレーカーの状態）を取得"""
+        with self._api_stats_lock:
+            methods = {}
+            for name, stats in self._api_stats.items():
+                methods[name] = dict(stats, total_ms=round(stats['total_ms'], 1), max_ms=round(stats['max_ms'], 1),
+                                     avg_ms=round(stats['total_ms'] / stats['calls'], 1) if stats['calls'] else None)
+            throttle = dict(self._throttle_stats, wait_ms=round(self._throttle_stats['wait_ms'], 1))
+        return {
+            'startup': dict(self.startup_stats, connected=self._ready),
+            'methods': methods,
+            'rate_limiter': dict(throttle, enabled=self._rate_limiter is not None),
+            'breaker': {
+                'state': self._breaker.state,
+                'failures': self._breaker.failures,
+                'opened': self._breaker.open_count,
+                'retry_after': round(self._breaker.retry_after(), 1)
+            }
+        }
+    
+    @contextmanager
+    def _pinned_snapshot(self):
+        """この間はスナップショットを再取得しない（行番号が途中で変わらないように）"""
+        with self._cache_lock:
+            self._snapshot_pins += 1
+            try:
+                yield
+            finally:
+                self._snapshot_pins -= 1
+    
+    @contextmanager
+    def _mirror_write(self):
+        """書き込み中は他の書き込みをロックし、失敗したらスナップショットを破棄する
+        
+        古ければ最初に一度だけ取得し直し、操作が終わるまでは同じスナップショットを使う。
+        シートへの書き込み（HTTP）の間は_cache_lockを保持しない（読み取りを待たせない）。
+        スナップショットへの反映は、それぞれの処理で_cache_lockを取得して行う。
+        共有スナップショットを使う場合は、他のワーカーの書き込みと重ならないようファイルロックを保持し、
+        書き込み後のスナップショットを公開する（他のワーカーが反映した行番号で書き込むため）。
+        """
+        if self._snapshot is None:
+            # 書き込みのロックを取る前に一度読み込んでおく（ロックを待つ読み取りに現在の内容を返せるように）
+            self._get_snapshot()
+        with self._writer_lock():
+            with self._cache_lock:
+                outermost = self._snapshot_pins == 0
+                if outermost:
+                    self._get_snapshot()
+                version = self.snapshot_version
+                self._snapshot_pins += 1
+            try:
+                yield
+            except Exception:
+                with self._cache_lock:
+                    self._snapshot_pins -= 1
+                    # シートとスナップショットの整合性が保証できないため破棄
+                    self.invalidate_cache()
+                raise
+            with self._cache_lock:
+                self._snapshot_pins -= 1
+                if (self._shared is not None and outermost and self._snapshot is not None
+                        and self.snapshot_version != version):
+                    self._share_snapshot()
+    
+    def _mirror_rows(self, worksheet):
+        """パッチ対象のスナップショット行リストを返す（未取得ならNone）
+        
+        公開済みのスナップショットは読み取り中のスレッドがあるため直接変更せず、
+        コピーを作って差し替える（各行のリストも変更時は新しいリストに置き換える）。
+        """
+        if self._snapshot is None:
+            return None
+        indexed = self._index_is_current()
+        snapshot = dict(self._snapshot)
+        rows = list(snapshot.get(worksheet.title, []))
+        snapshot[worksheet.title] = rows
+        searched = self._search_is_current()
+        self._snapshot = snapshot
+        if indexed:
+            self._indexed_snapshot = snapshot
+        if searched:
+            self._search_snapshot = snapshot
+        self.snapshot_version += 1
+        self._write_seq += 1
+        return rows
+    
+    def _ensure_index(self):
+        """スナップショットが入れ替わっていればインデックスを作り直す"""
+        with self._cache_lock:
+            snapshot = self._get_snapshot()
+            if self._indexed_snapshot is snapshot:
+                return snapshot
+            self._id_index = {}
+            self._date_index = {}
+            # 変換済みのTodoは、新しいスナップショットにも残っている行の分だけ残す
+            todos_by_row = self._todos_by_row
+            self._todos_by_row = {}
+            for title, rows in snapshot.items():
+                self._id_index[title] = {}
+                for i, row in enumerate(rows[1:], start=2):  # ヘッダーを考慮して行番号を調整
+                    self._index_add(title, i, row)
+                    entry = todos_by_row.get(id(row))
+                    if entry is not None and entry[0] is row:
+                        self._todos_by_row[id(row)] = entry
+            self._indexed_snapshot = snapshot
+            self.cache_stats['index_rebuilds'] += 1
+            return snapshot
+    
+    def _to_todo(self, row):
+        """スナップショットの行をTodoに変換（同じ行は一度だけ変換し、以降は同じTodoを返す）"""
+        entry = self._todos_by_row.get(id(row))
+        if entry is not None and entry[0] is row:
+            return entry[1]
+        todo = Todo.from_row(row)
+        if None not in row:
+            # 範囲を絞った読み取りで全列がそろっていない行は覚えない
+            self._todos_by_row[id(row)] = (row, todo)
+        return todo
+    
+    def _index_is_current(self):
+        """インデックスが現在のスナップショットに対応しているか"""
+        return self._snapshot is not None and self._indexed_snapshot is self._snapshot
+    
+    def _index_add(self, title, row_index, row):
+        """1行分をインデックスに登録"""
+        if not row or not row[0].isdigit():
+            return
+        ids = self._id_index.setdefault(title, {})
+        if row[0] in ids:
+            # 同じシート内でIDが重複している場合は先頭の行を優先
+            return
+        ids[row[0]] = row_index
+        due_date = row[4].strip() if len(row) > 4 else ''
+        self._date_index.setdefault(due_date, set()).add((title, row[0]))
+    
+    def _index_remove(self, title, row):
+        """1行分をインデックスから削除"""
+        if not row or not row[0].isdigit():
+            return
+        self._id_index.get(title, {}).pop(row[0], None)
+        self._todos_by_row.pop(id(row), None)
+        due_date = row[4].strip() if len(row) > 4 else ''
+        keys = self._date_index.get(due_date)
+        if keys is not None:
+            keys.discard((title, row[0]))
+            if not keys:
+                del self._date_index[due_date]
+    
+    def _search_is_current(self):
+        """検索インデックスが現在のスナップショットに対応しているか"""
+        return self._search_index is not None and self._snapshot is not None and self._search_snapshot is self._snapshot
+    
+    def _search_replace(self, title, old_row, row):
+        """行の変更を検索インデックスに反映（インデックスが現在のスナップショットに対応している場合のみ）"""
+        if not self._search_is_current():
+            return
+        if old_row and row and old_row[0] == row[0] and old_row[1:3] == row[1:3]:
+            return  # タイトル・内容は変わっていない（完了・期日の変更など）
+        if old_row and old_row[0].isdigit():
+            self._search_index.remove((title, old_row[0]))
+        if row and row[0].isdigit():
+            if None in row[1:3]:
+                # 範囲を絞った読み取りでタイトル・内容が未取得の行は、次の検索で取得し直す
+                self._search_snapshot = None
+                return
+            self._search_index.add((title, row[0]), row[1] if len(row) > 1 else '', row[2] if len(row) > 2 else '')
+    
+    def _parse_appended_row(self, response):
+        """append_rowの応答から追加された行番号を取得"""
+        if isinstance(response, dict):
+            updated_range = response.get('updates', {}).get('updatedRange', '')
+            match = re.search(r'![A-Z]+(\d+)', updated_range)
+            if match:
+                return int(match.group(1))
+        return None
+    
+    def _mirror_append(self, worksheet, row, response=None):
+        """append_rowの結果をスナップショットに反映"""
+        indexed = self._index_is_current()
+        rows = self._mirror_rows(worksheet)
+        if rows is None:
+            return
+        # APIの応答（updatedRange）から実際に追加された行番号を取得
+        row_number = self._parse_appended_row(response)
+        if row_number is None:
+            row_number = len(rows) + 1
+        while len(rows) < row_number - 1:
+            rows.append([])
+        values = ['' if value is None else str(value) for value in row]
+        old_row = None
+        if len(rows) >= row_number:
+            old_row = rows[row_number - 1]
+            rows[row_number - 1] = values
+        else:
+            rows.append(values)
+        if indexed:
+            self._index_add(worksheet.title, row_number, values)
+        self._search_replace(worksheet.title, old_row, values)
+        self.cache_stats['patches'] += 1
+    
+    def _mirror_append_rows(self, worksheet, rows):
+        """末尾への複数行の追加（appendCells）の結果をスナップショットに反映（行リストのコピーは1回だけ）"""
+        indexed = self._index_is_current()
+        mirrored = self._mirror_rows(worksheet)
+        if mirrored is None:
+            return
+        for row in rows:
+            values = ['' if value is None else str(value) for value in row]
+            mirrored.append(values)
+            if indexed:
+                self._index_add(worksheet.title, len(mirrored), values)
+            self._search_replace(worksheet.title, None, values)
+        self.cache_stats['patches'] += len(rows)
+    
+    def _mirror_update(self, worksheet, row_index, start_col, values):
+        """セル更新の結果をスナップショットに反映（start_colは1始まり）"""
+        indexed = self._index_is_current()
+        rows = self._mirror_rows(worksheet)
+        if rows is None or row_index > len(rows):
+            return
+        old_row = rows[row_index - 1]
+        row = list(old_row)
+        end_col = start_col + len(values) - 1
+        while len(row) < end_col:
+            row.append('')
+        for offset, value in enumerate(values):
+            row[start_col - 1 + offset] = '' if value is None else str(value)
+        rows[row_index - 1] = row
+        if indexed:
+            self._index_remove(worksheet.title, old_row)
+            self._index_add(worksheet.title, row_index, row)
+        self._search_replace(worksheet.title, old_row, row)
+        self.cache_stats['patches'] += 1
+    
+    def _mirror_delete(self, worksheet, row_index):
+        """delete_rowsの結果をスナップショットに反映（以降の行番号は1つずつ繰り上がる）"""
+        indexed = self._index_is_current()
+        rows = self._mirror_rows(worksheet)
+        if rows is None or row_index > len(rows):
+            return
+        old_row = rows.pop(row_index - 1)
+        self._search_replace(worksheet.title, old_row, None)
+        if indexed:
+            self._index_remove(worksheet.title, old_row)
+            # 削除した行より下の行番号を繰り上げる
+            ids = self._id_index.get(worksheet.title, {})
+            for todo_id, i in ids.items():
+                if i > row_index:
+                    ids[todo_id] = i - 1
+        self.cache_stats['patches'] += 1
+    
+    def _locate_todo(self, todo_id):
+        """IDインデックスからTodoの位置を取得（[(ワークシート, 行番号)]、なければ空のリスト）"""
+        for worksheet in [self.worksheet, self.future_worksheet]:
+            i = self._id_index.get(worksheet.title, {}).get(str(todo_id))
+            if i is not None:
+                return [(worksheet, i)]
+        return []
+    
+    def _find_todo_row(self, todo_id, full=False):
+        """IDからTodoのワークシート・行番号・行データを検索（fullなら全列がそろった行データを返す）"""
+        with self._cache_lock:
+            if full:
+                found = self._full_rows(lambda: self._locate_todo(todo_id))
+            else:
+                snapshot = self._ensure_index()
+                found = [(worksheet, i, snapshot[worksheet.title][i - 1]) for worksheet, i in self._locate_todo(todo_id)]
+        return found[0] if found else (None, None, None)
+    
+    def _get_rows_by_due_date(self, due_date_str):
+        """期日インデックスから該当する行データを取得"""
+        def locate():
+            keys = self._date_index.get(due_date_str, ())
+            locations = []
+            # シートの並び順（Todos → Todos_Future、行番号順）を保つ
+            for worksheet in [self.worksheet, self.future_worksheet]:
+                ids = self._id_index.get(worksheet.title, {})
+                row_indexes = sorted(ids[todo_id] for title, todo_id in keys if title == worksheet.title)
+                locations.extend((worksheet, i) for i in row_indexes)
+            return locations
+        return [row for worksheet, i, row in self._full_rows(locate)]
+    
+    def _full_rows(self, locate):
+        """locate()が返す位置（[(ワークシート, 行番号)]）の行を全列そろえて返す（[(ワークシート, 行番号, 行データ)]）
+        
+        範囲を絞った読み取りでは、全列を取得していない行だけを1回のbatch_getでまとめて取得する。
+        取得した行が別のTodoに変わっていた場合は、インデックスを作り直してから位置を求め直す。
+        """
+        with self._cache_lock:
+            for attempt in range(3):
+                snapshot = self._ensure_index()
+                found = [(worksheet, i, snapshot[worksheet.title][i - 1]) for worksheet, i in locate()]
+                missing = [(worksheet, i) for worksheet, i, row in found if None in row]
+                if not missing:
+                    return found
+                if attempt == 2:
+                    break
+                self._fetch_rows(missing)
+            # 取得できなかった列は空文字列として返す
+            return [(worksheet, i, ['' if value is None else value for value in row]) for worksheet, i, row in found]
+    
+    def _fetch_rows(self, locations):
+        """指定した行の全列を1回のbatch_getで取得し、スナップショットに補う（連続する行は1つの範囲にまとめる）"""
+        spans = []  # [ワークシート, 開始行, 終了行]
+        for worksheet, i in sorted(set(locations), key=lambda item: (item[0].title, item[1])):
+            if spans and spans[-1][0] is worksheet and spans[-1][2] == i - 1:
+                spans[-1][2] = i
+            else:
+                spans.append([worksheet, i, i])
+        response = self._call(self.spreadsheet.values_batch_get,
+                              [f"'{worksheet.title}'!A{start}:I{end}" for worksheet, start, end in spans])
+        value_ranges = response.get('valueRanges', [])
+        # 公開済みのスナップショットは直接変更せず、コピーを作って差し替える（内容はシートと同じなのでバージョンは変えない）
+        indexed = self._index_is_current()
+        snapshot = dict(self._snapshot)
+        consistent = True
+        for n, (worksheet, start, end) in enumerate(spans):
+            values = value_ranges[n].get('values', []) if n < len(value_ranges) else []
+            rows = snapshot[worksheet.title] = list(snapshot[worksheet.title])
+            for i in range(start, end + 1):
+                row = list(values[i - start]) if i - start < len(values) else []
+                old_row = rows[i - 1]
+                # 読み込んだ後にシート側で行が追加・削除された場合は、別のTodoの行が返ってくる
+                if (row[0] if row else '') != old_row[0] or (row[4] if len(row) > 4 else '') != old_row[4]:
+                    consistent = False
+                rows[i - 1] = row
+        self._snapshot = snapshot
+        if indexed and consistent:
+            self._indexed_snapshot = snapshot
+        self.cache_stats['row_fetches'] += 1
+        self.cache_stats['rows_fetched'] += len(set(locations))
+        if not consistent:
+            self.cache_stats['row_mismatches'] += 1
+            if self._snapshot_pins == 0:
+                # 行の位置がずれているため、スナップショットを取得し直す
+                self.invalidate_cache()
+    
+    def _get_max_todo_id(self, snapshot):
+        """両方のワークシートで使われている最大のIDを取得"""
+        max_id = 0
+        for rows in snapshot.values():
+            for row in rows[1:]:  # ヘッダーをスキップ
+                if row and row[0].isdigit():
+                    max_id = max(max_id, int(row[0]))
+        return max_id
+    
+    def _init_id_allocator(self, settings, snapshot):
+        """ID採番の基準値を読み込む（初回は既存の最大IDから作成）
+        
+        Todos_Metaシートの構成:
+          1行目: ヘッダー
+          2行目: id_base, 基準ID, ブロックサイズ
+          3行目以降: IDブロックの予約（1行追加するごとにブロックサイズ分のIDを確保）
+        日次の整理の担当はTodos_Rolloverシートに記録する（以前のバージョンがここに追加した行もブロックとして数える）。
+        予約行の行番号はappendごとに必ず異なるため、複数のワーカーが同時に予約しても
+        IDが重複することはない。settingsは接続時に取得した2行目、ブロックは最初の追加時に予約する。
+        """
+        for attempt in range(3):
+            if attempt > 0:
+                settings = self._call(self._meta_worksheet.row_values, 2)
+            if settings and settings[0] == 'id_base' and len(settings) >= 3:
+                self._id_base = int(settings[1])
+                self._id_block_size = int(settings[2])
+                return
+            if attempt == 0 and not settings:
+                block_size = int(os.environ.get('SHEETS_ID_BLOCK_SIZE', '20'))
+                base = self._get_max_todo_id(snapshot)
+                self._call(self._meta_worksheet.update, 'A1:D2', [
+                    ['種別', '値1', '値2', '日時'],
+                    ['id_base', base, block_size, get_jst_now().strftime('%Y-%m-%d %H:%M:%S')]
+                ])
+                continue
+            # 別のワーカーが初期化中の場合は少し待って読み直す
+            time.sleep(1)
+        raise ValueError("Todos_MetaシートのID採番設定を読み込めませんでした")
+    
+    def _reserve_id_block(self, needed=1):
+        """needed個以上のIDを含むだけのIDブロックを続けて予約する（API呼び出しはこの1回のみ）
+        
+        複数のブロックは1回のappend_rowsで連続した行として追加されるため、IDも連続する。
+        """
+        meta_worksheet = self.meta_worksheet  # 接続時にID採番の設定を読み込む
+        count = -(-needed // self._id_block_size)
+        row = ['id_block', os.getpid(), '', get_jst_now().strftime('%Y-%m-%d %H:%M:%S')]
+        if count == 1:
+            response = self._call(meta_worksheet.append_row, row, table_range='A1')
+        else:
+            response = self._call(meta_worksheet.append_rows, [row] * count, table_range='A1')
+        row_number = self._parse_appended_row(response)
+        if row_number is None or row_number < 3:
+            raise ValueError("IDブロックの予約結果を取得できませんでした")
+        block = row_number - 3
+        start = self._id_base + block * self._id_block_size + 1
+        self._reserved_ids = iter(range(start, start + self._id_block_size * count))
+    
+    def _get_next_id(self):
+        """次のIDを取得（両方のワークシートで一意、通常はAPI呼び出しなし）"""
+        return self._get_next_ids(1)[0]
+    
+    def _get_next_ids(self, count):
+        """IDをcount個まとめて取得（予約済みのIDが足りなければ、残りの分のブロックを1回でまとめて予約する）"""
+        todo_ids = []
+        with self._id_lock:
+            while len(todo_ids) < count:
+                todo_id = next(self._reserved_ids, None)
+                if todo_id is None:
+                    self._reserve_id_block(count - len(todo_ids))
+                    continue
+                # スプレッドシートで直接入力されたIDとの衝突を避ける
+                worksheet, row_index, row = self._find_todo_row(todo_id)
+                if row is None:
+                    todo_ids.append(todo_id)
+        return todo_ids
+    
+    def iter_todos(self):
+        """すべてのTodoをシートの行の順に返すイテレーター（エクスポート用）
+        
+        スナップショットはこの呼び出しで取得し（取得できなければここで例外になる）、
+        Todoへの変換は読み進めるときに1件ずつ行う。
+        """
+        if self.compact_reads:
+            # 範囲を絞った読み取りでは全列がそろっていないため、まとめて取得する
+            return iter(self.get_all_todos())
+        snapshot = self._get_snapshot()
+        worksheet_rows = [snapshot.get(worksheet.title, []) for worksheet in [self.worksheet, self.future_worksheet]]
+        return (self._to_todo(row) for rows in worksheet_rows for row in islice(rows, 1, None)
+                if row and row[0].isdigit())
     
     def get_all_todos(self, due_date_filter=None):
         """すべてのTodoを取得（期日でフィルタリング可能）"""
@@ -146,11 +1281,10 @@ class SheetsAPI:
                 due_date_filter_obj = due_date_filter
                 due_date_filter_str = due_date_filter.strftime('%Y-%m-%d')
             elif isinstance(due_date_filter, str):
-                try:
-                    due_date_filter_obj = datetime.strptime(due_date_filter, '%Y-%m-%d').date()
+                due_date_filter_obj = parse_date(due_date_filter.strip())
+                if due_date_filter_obj is not None:
                     due_date_filter_str = due_date_filter_obj.strftime('%Y-%m-%d')
-                except:
-                    due_date_filter_obj = None
+                else:
                     due_date_filter_str = due_date_filter.strip()
             else:
                 due_date_filter_obj = None
@@ -159,48 +1293,28 @@ class SheetsAPI:
             due_date_filter_obj = None
             due_date_filter_str = None
         
-        # 両方のワークシートから取得（フィルタリングは後で行う）
-        all_todos = []
-        for worksheet in [self.worksheet, self.future_worksheet]:
-            all_values = worksheet.get_all_values()
-            
-            if len(all_values) > 1:
-                for row in all_values[1:]:  # ヘッダーをスキップ
-                    if row and row[0].isdigit():
-                        todo = {
-                            'id': int(row[0]),
-                            'title': row[1] if len(row) > 1 else '',
-                            'content': row[2] if len(row) > 2 else '',
-                            'day_of_week': row[3] if len(row) > 3 else '',
-                            'due_date': row[4] if len(row) > 4 else '',
-                            'created_at': row[5] if len(row) > 5 else '',
-                            'completed_at': row[6] if len(row) > 6 else '',
-                            'status': row[7] if len(row) > 7 else '未完了',
-                            'target_date': row[8] if len(row) > 8 else ''  # 互換性のため保持
-                        }
-                        all_todos.append(todo)
-        
-        # 期日でフィルタリング
+        # 期日の指定があれば期日インデックスから、なければ両方のワークシートの全行を対象にする
         if due_date_filter_str:
-            todos = []
-            print(f"DEBUG: Filtering todos by due_date='{due_date_filter_str}'")
-            for todo in all_todos:
-                todo_due_date = todo['due_date'].strip() if todo['due_date'] else ''
-                if len(todos) < 3:  # 最初の数件のみデバッグ出力
-                    print(f"DEBUG: Comparing filter='{due_date_filter_str}' with todo_due_date='{todo_due_date}' (Title: {todo.get('title', 'N/A')})")
-                if todo_due_date == due_date_filter_str:
-                    todos.append(todo)
-            print(f"DEBUG: Found {len(todos)} todos matching due_date='{due_date_filter_str}'")
+            rows = self._get_rows_by_due_date(due_date_filter_str)
+        elif self.compact_reads:
+            # 範囲を絞った読み取りでは、IDのある行の全列をまとめて取得する
+            def locate():
+                return [(worksheet, i) for worksheet in [self.worksheet, self.future_worksheet]
+                        for i in self._id_index.get(worksheet.title, {}).values()]
+            rows = [row for worksheet, i, row in self._full_rows(locate)]
         else:
-            todos = all_todos
+            rows = []
+            for worksheet in [self.worksheet, self.future_worksheet]:
+                rows.extend(self._get_values(worksheet)[1:])  # ヘッダーをスキップ
+        
+        todos = [self._to_todo(row) for row in rows if row and row[0].isdigit()]
         
         # 期限順にソート（期限がないものは最後に配置）
         def sort_key(todo):
-            due_date = todo.get('due_date', '').strip()
-            if not due_date:
+            if not todo.due_date:
                 # 期限がないものは最後に表示するため、非常に大きい値を返す
                 return '9999-12-31'
-            return due_date
+            return todo.due_date
         
         todos.sort(key=sort_key)
         return todos
@@ -208,121 +1322,645 @@ class SheetsAPI:
     def get_overdue_todos(self):
         """期日が過ぎている未完了のTodoを取得"""
         today = get_jst_today()
-        overdue_todos = []
         
-        # 両方のワークシートを確認
-        for worksheet in [self.worksheet, self.future_worksheet]:
-            all_values = worksheet.get_all_values()
-            if len(all_values) <= 1:
-                continue
-            
-            for row in all_values[1:]:  # ヘッダーをスキップ
-                if row and row[0].isdigit():
-                    status = row[7] if len(row) > 7 else '未完了'
-                    due_date_str = row[4] if len(row) > 4 else ''
-                    
-                    # 未完了かつ期日が設定されているTodoのみをチェック
-                    if status != '完了' and due_date_str:
-                        try:
-                            # 期日を日付オブジェクトに変換
-                            due_date = datetime.strptime(due_date_str.strip(), '%Y-%m-%d').date()
-                            
-                            # 期日が今日より前（過ぎている）場合
-                            if due_date < today:
-                                todo = {
-                                    'id': int(row[0]),
-                                    'title': row[1] if len(row) > 1 else '',
-                                    'content': row[2] if len(row) > 2 else '',
-                                    'day_of_week': row[3] if len(row) > 3 else '',
-                                    'due_date': due_date_str.strip(),
-                                    'created_at': row[5] if len(row) > 5 else '',
-                                    'completed_at': row[6] if len(row) > 6 else '',
-                                    'status': status,
-                                    'target_date': row[8] if len(row) > 8 else ''
-                                }
-                                overdue_todos.append(todo)
-                        except (ValueError, AttributeError):
-                            # 期日の形式が正しくない場合はスキップ
-                            continue
+        # 期日インデックスの日付と状態の列だけで対象を決める（行は走査しない）
+        def locate():
+            snapshot = self._snapshot
+            locations = []
+            for due_date_str, keys in self._date_index.items():
+                # 期日が設定されているTodoのみをチェック
+                if not due_date_str:
+                    continue
+                # 期日を日付オブジェクトに変換（形式が正しくない場合はスキップ）
+                due_date = parse_date(due_date_str)
+                if due_date is None:
+                    continue
+                
+                # 期日が今日より前（過ぎている）場合
+                if due_date >= today:
+                    continue
+                
+                for worksheet in [self.worksheet, self.future_worksheet]:
+                    ids = self._id_index.get(worksheet.title, {})
+                    for i in sorted(ids[todo_id] for title, todo_id in keys if title == worksheet.title):
+                        row = snapshot[worksheet.title][i - 1]
+                        # 未完了のTodoのみ
+                        if (row[7] if len(row) > 7 else '未完了') != '完了':
+                            locations.append((worksheet, i))
+            return locations
+        
+        overdue_todos = [todo for todo in (self._to_todo(row) for worksheet, i, row in self._full_rows(locate))
+                         if not todo.completed]
         
         # 期日でソート（古い順）
-        overdue_todos.sort(key=lambda x: x['due_date'])
+        overdue_todos.sort(key=lambda todo: todo.due)
         return overdue_todos
     
+    def get_todos_in_range(self, start_date, end_date):
+        """期日がstart_date〜end_dateのTodoを日付ごとに、期日超過のTodoと一緒に取得
+        
+        期日インデックスを1回たどって、範囲内の行と期日超過の未完了の行をまとめて求める
+        （範囲を絞った読み取りでも、全列の取得は1回のbatch_getで済む）。
+        """
+        today = get_jst_today()
+        
+        def locate():
+            snapshot = self._snapshot
+            order = {self.worksheet.title: 0, self.future_worksheet.title: 1}
+            locations = []
+            for due_date_str, keys in self._date_index.items():
+                due_date = parse_date(due_date_str) if due_date_str else None
+                if due_date is None:
+                    continue
+                in_range = start_date <= due_date <= end_date
+                if not in_range and due_date >= today:
+                    continue
+                for title, todo_id in keys:
+                    i = self._id_index[title][todo_id]
+                    row = snapshot[title][i - 1]
+                    # 範囲外の期日超過の行は未完了のものだけ
+                    if not in_range and (row[7] if len(row) > 7 else '未完了') == '完了':
+                        continue
+                    locations.append((order[title], i))
+            # シートの並び順（Todos → Todos_Future、行番号順）を保つ
+            worksheets = [self.worksheet, self.future_worksheet]
+            return [(worksheets[n], i) for n, i in sorted(locations)]
+        
+        todos = [self._to_todo(row) for worksheet, i, row in self._full_rows(locate) if row and row[0].isdigit()]
+        return bucket_todos_by_date(todos, start_date, end_date, today)
+    
+    def _ensure_search_index(self):
+        """検索インデックスを現在のスナップショットに合わせる（初回は全行から作り、以降は変わった行だけ登録し直す）"""
+        with self._cache_lock:
+            if self.compact_reads:
+                # 範囲を絞った読み取りでは、タイトル・内容の列をそろえるためIDのある行の全列を取得する
+                self._full_rows(lambda: [(worksheet, i) for worksheet in [self.worksheet, self.future_worksheet]
+                                         for i in self._id_index.get(worksheet.title, {}).values()])
+            else:
+                self._ensure_index()
+            if self._search_is_current():
+                return
+            if self._search_index is None:
+                self._search_index = SearchIndex()
+            docs = {}
+            for worksheet in [self.worksheet, self.future_worksheet]:
+                rows = self._snapshot.get(worksheet.title, [])
+                for todo_id, i in self._id_index.get(worksheet.title, {}).items():
+                    row = rows[i - 1]
+                    docs[(worksheet.title, todo_id)] = (row[1] if len(row) > 1 else '', row[2] if len(row) > 2 else '')
+            self.search_stats['syncs'] += 1
+            self.search_stats['synced_docs'] += self._search_index.sync(docs)
+            self._search_snapshot = self._snapshot
+    
+    def search(self, query):
+        """タイトル・内容に検索語を含むTodoを期日順に取得（空白で区切った語はすべて含むもの）"""
+        with self._cache_lock:
+            self._ensure_search_index()
+            self.search_stats['searches'] += 1
+            snapshot = self._snapshot
+            order = {self.worksheet.title: 0, self.future_worksheet.title: 1}
+            found = []
+            for title, todo_id in self._search_index.search(query):
+                i = self._id_index.get(title, {}).get(todo_id)
+                if i is not None:
+                    found.append((order[title], i, self._to_todo(snapshot[title][i - 1])))
+        # 期限順（期限がないものは最後）、同じ期日はシートの並び順
+        found.sort(key=lambda item: (item[2].due_date or '9999-12-31', item[0], item[1]))
+        return [todo for n, i, todo in found]
+    
     def get_todo_by_id(self, todo_id):
         """IDでTodoを取得"""
         # 両方のワークシートを検索
-        for worksheet in [self.worksheet, self.future_worksheet]:
-            all_values = worksheet.get_all_values()
-            for row in all_values[1:]:  # ヘッダーをスキップ
-                if row and row[0] == str(todo_id):
-                    return {
-                        'id': int(row[0]),
-                        'title': row[1] if len(row) > 1 else '',
-                        'content': row[2] if len(row) > 2 else '',
-                        'day_of_week': row[3] if len(row) > 3 else '',
-                        'due_date': row[4] if len(row) > 4 else '',
-                        'created_at': row[5] if len(row) > 5 else '',
-                        'completed_at': row[6] if len(row) > 6 else '',
-                        'status': row[7] if len(row) > 7 else '未完了',
-                        'target_date': row[8] if len(row) > 8 else ''  # 互換性のため保持
-                    }
-        return None
+        worksheet, row_index, row = self._find_todo_row(todo_id, full=True)
+        if row is None:
+            return None
+        return self._to_todo(row)
+    
+    def _batch_requests(self, batch):
+        """WriteBatchをspreadsheet.batch_update用のリクエストに変換"""
+        requests = []
+        # 1. セル更新（変更前の行番号のまま指定できるよう最初に行う）
+        for worksheet, row_index, start_col, values in batch.updates:
+            requests.append({
+                'updateCells': {
+                    'start': {'sheetId': worksheet.id, 'rowIndex': row_index - 1, 'columnIndex': start_col - 1},
+                    'rows': [{'values': [_cell_data(value) for value in values]}],
+                    'fields': 'userEnteredValue'
+                }
+            })
+        # 2. 行追加（データのある最終行の後ろに追加される。同じワークシートへの追加は1つのリクエストにまとめる）
+        for worksheet, rows in batch.grouped_appends():
+            requests.append({
+                'appendCells': {
+                    'sheetId': worksheet.id,
+                    'rows': [{'values': [_cell_data(value) for value in values]} for values in rows],
+                    'fields': 'userEnteredValue'
+                }
+            })
+        # 3. 行削除（行番号のずれを防ぐため下の行から削除）
+        for worksheet, row_index in batch.sorted_deletes():
+            requests.append({
+                'deleteDimension': {
+                    'range': {'sheetId': worksheet.id, 'dimension': 'ROWS', 'startIndex': row_index - 1, 'endIndex': row_index}
+                }
+            })
+        return requests
+    
+    def _apply_batch_to_mirror(self, batch):
+        """WriteBatchの内容をスナップショットに反映（シートへの書き込みと同じ順序）"""
+        with self._cache_lock:
+            for worksheet, row_index, start_col, values in batch.updates:
+                self._mirror_update(worksheet, row_index, start_col, values)
+            for worksheet, rows in batch.grouped_appends():
+                self._mirror_append_rows(worksheet, rows)
+            for worksheet, row_index in batch.sorted_deletes():
+                self._mirror_delete(worksheet, row_index)
+    
+    def _commit_batch(self, batch):
+        """WriteBatchの内容を1回のspreadsheet.batch_updateで書き込み、スナップショットに反映"""
+        if batch.is_empty():
+            return
+        with self._mirror_write():
+            before = None
+            if self.write_behind or self._change_listeners:
+                # 変更前の行（書き込み待ちのキューと変更の通知に使う）
+                before = {todo_id: self._find_todo_row(todo_id)[2] for todo_id in self._batch_todo_ids(batch)}
+            if self.write_behind:
+                # シートへの書き込みはバックグラウンドに任せ、スナップショットだけ先に更新する
+                with self._cache_lock:
+                    self._apply_batch_to_mirror(batch)
+                    self._enqueue_ops(list(before), {todo_id: row is not None for todo_id, row in before.items()})
+            else:
+                self._call(self.spreadsheet.batch_update, {'requests': self._batch_requests(batch)})
+                self._apply_batch_to_mirror(batch)
+            if self._change_listeners:
+                self._notify_row_changes(before)
+    
+    def _event_todo(self, row):
+        """変更の通知用に行をTodoに変換（範囲を絞った読み取りで未取得の列は空にする）
+        
+        変更前の行はスナップショットから外れているため、変換済みのTodoのキャッシュには入れない。
+        """
+        if row is None:
+            return None
+        return Todo.from_row(['' if value is None else value for value in row])
+    
+    def _notify_row_changes(self, before):
+        """書き込みによる変更を通知する（before: {ID: 変更前の行またはNone}、変更後の行はスナップショットから）"""
+        self._notify_changes([(self._event_todo(row), self._event_todo(self._find_todo_row(todo_id)[2]))
+                              for todo_id, row in before.items()])
+    
+    def _notify_snapshot_changes(self, old_snapshot, snapshot):
+        """取得し直したスナップショットで変わったTodo（シートの直接編集・他のワーカーの書き込み）を通知する"""
+        def rows_by_id(snapshot):
+            rows = {}
+            for title_rows in snapshot.values():
+                for row in title_rows[1:]:
+                    if row and row[0].isdigit():
+                        rows.setdefault(row[0], row)
+            return rows
+        old_rows = rows_by_id(old_snapshot)
+        changes = []
+        for todo_id, row in rows_by_id(snapshot).items():
+            old_row = old_rows.pop(todo_id, None)
+            if old_row is not row and old_row != row:
+                changes.append((self._event_todo(old_row), self._event_todo(row)))
+        changes.extend((self._event_todo(old_row), None) for old_row in old_rows.values())
+        self._notify_changes(changes)
+    
+    def _batch_todo_ids(self, batch):
+        """WriteBatchで変更されるTodoのID（文字列）を取得"""
+        todo_ids = []
+        for worksheet, row_index, start_col, values in batch.updates:
+            row = self._get_values(worksheet)[row_index - 1]
+            todo_ids.append(row[0])
+        for worksheet, values in batch.appends:
+            todo_ids.append(str(values[0]))
+        for worksheet, row_index in batch.deletes:
+            row = self._get_values(worksheet)[row_index - 1]
+            todo_ids.append(row[0])
+        return list(dict.fromkeys(todo_ids))
+    
+    def _stage_op(self, batch, todo_id, op, locate):
+        """IDごとの最終状態（op）を書き込むための変更をWriteBatchに積む
+        
+        locate(todo_id)は(ワークシート, 行番号)または(None, None)を返す。
+        opは何度適用しても同じ結果になるため、既に反映済みのシートに重ねても問題ない。
+        """
+        worksheet, row_index = locate(todo_id)
+        if op['action'] == 'delete':
+            if worksheet is not None:
+                batch.delete_row(worksheet, row_index)
+            return
+        target_worksheet = self._worksheets_by_title()[op['title']]
+        row = [int(todo_id)] + list(op['row'][1:])
+        if worksheet is None:
+            batch.append_row(target_worksheet, row)
+        elif worksheet.id == target_worksheet.id:
+            batch.update_cells(worksheet, row_index, 1, row)
+        else:
+            batch.append_row(target_worksheet, row)
+            batch.delete_row(worksheet, row_index)
+    
+    def _worksheets_by_title(self):
+        """Todo用ワークシートをシート名で引ける辞書"""
+        return {worksheet.title: worksheet for worksheet in [self.worksheet, self.future_worksheet]}
+    
+    def _overlay_ops(self, ops):
+        """未書き込みの変更をスナップショットに重ねる"""
+        def locate(todo_id):
+            worksheet, row_index, row = self._find_todo_row(todo_id)
+            return worksheet, row_index
+        for todo_id, op in ops.items():
+            batch = WriteBatch()
+            self._stage_op(batch, todo_id, op, locate)
+            self._apply_batch_to_mirror(batch)
+    
+    def _enqueue_ops(self, todo_ids, existed):
+        """変更後のスナップショットからIDごとの最終状態を取り出してキューに積む"""
+        items = []
+        for todo_id in todo_ids:
+            worksheet, row_index, row = self._find_todo_row(todo_id)
+            if row is None:
+                op = {'action': 'delete'}
+            else:
+                padded = list(row) + [''] * (len(HEADERS) - len(row))
+                op = {'action': 'upsert', 'title': worksheet.title, 'row': padded}
+            items.append((todo_id, op, not existed.get(todo_id, False)))
+        self._queue_ops(items)
+    
+    def _queue_ops(self, items):
+        """IDごとの最終状態をキューに積む（同じIDの変更はまとめる）。itemsは[(ID, op, 追加操作かどうか)]
+        
+        ジャーナルファイルへはまとめて1回だけ追記する（一括追加でも書き込みの同期は1回）。
+        """
+        journal = []
+        for todo_id, op, new in items:
+            self.write_behind_stats['queued'] += 1
+            previous = self._pending_ops.pop(todo_id, None)
+            if previous is not None:
+                self.write_behind_stats['merged'] += 1
+                if previous['new'] and op['action'] == 'delete':
+                    # 追加してから削除した場合はシートへの書き込み自体が不要
+                    self.write_behind_stats['cancelled'] += 1
+                    journal.append((todo_id, None))
+                    continue
+                op['new'] = previous['new']
+            else:
+                op['new'] = new
+            self._pending_ops[todo_id] = op
+            journal.append((todo_id, op))
+        self._journal_append(journal)
+    
+    def read_todo_sheets(self):
+        """Todo用ワークシートのすべての列を読み取る（他のバックエンドとの同期用。スナップショットは更新しない）
+        
+        戻り値: [(ワークシート, 行のリスト（ヘッダーを含む）), ...]
+        """
+        snapshot = self._load_snapshot(compact=False)
+        return [(worksheet, snapshot.get(worksheet.title, [])) for worksheet in self._worksheets_by_title().values()]
+    
+    def worksheet_for_due_date(self, due_date):
+        """期日に応じた書き込み先のワークシート（他のバックエンドとの同期用）"""
+        return self._get_worksheet_by_due_date(due_date)
+    
+    def write_batch(self, batch, column_count=None):
+        """WriteBatchの内容を1回のspreadsheet.batch_updateで書き込む（他のバックエンドとの同期用。スナップショットには反映しない）
+        
+        column_countを指定すると、列数が足りないTodo用ワークシートには同じ呼び出しの中で先に列を追加する。
+        """
+        requests = []
+        if column_count is not None:
+            for worksheet in self._worksheets_by_title().values():
+                col_count = getattr(worksheet, 'col_count', column_count)
+                if col_count < column_count:
+                    requests.append({
+                        'appendDimension': {'sheetId': worksheet.id, 'dimension': 'COLUMNS', 'length': column_count - col_count}
+                    })
+        requests.extend(self._batch_requests(batch))
+        if requests:
+            self._call(self.spreadsheet.batch_update, {'requests': requests})
+    
+    def export_todo(self, todo_id, todo, new=False):
+        """他のバックエンドでの変更をシートへの書き込みキューに積む（todoがNoneなら削除）
+        
+        write_behindが有効な場合のみ使用できる。シートへはバックグラウンドでまとめて書き込む。
+        """
+        self.export_todos([(todo_id, todo, new)])
+    
+    def export_todos(self, changes):
+        """他のバックエンドでの複数の変更をまとめて書き込みキューに積む（changes: [(ID, Todoまたは削除ならNone, 追加かどうか)]）"""
+        items = []
+        for todo_id, todo, new in changes:
+            if todo is None:
+                op = {'action': 'delete'}
+            else:
+                row = [todo['id'], todo['title'], todo['content'], todo['day_of_week'], todo['due_date'],
+                       todo['created_at'], todo['completed_at'], todo['status'], todo['target_date']]
+                title = 'Todos_Future' if self._is_future_due_date(todo['due_date']) else 'Todos'
+                op = {'action': 'upsert', 'title': title, 'row': row}
+            items.append((str(todo_id), op, new))
+        with self._cache_lock:
+            self._queue_ops(items)
+    
+    def _journal_append(self, entries):
+        """未書き込みの変更をジャーナルファイルに追記（プロセスが落ちても再起動時に書き込めるように）"""
+        if not entries:
+            return
+        with open(self.write_behind_journal, 'a', encoding='utf-8') as f:
+            f.write(''.join(json.dumps({'id': todo_id, 'op': op}, ensure_ascii=False) + '\n' for todo_id, op in entries))
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def _journal_rewrite(self):
+        """ジャーナルファイルを未書き込みの変更だけに書き直す"""
+        ops = list(self._inflight_ops.items()) + list(self._pending_ops.items())
+        if not ops:
+            if os.path.exists(self.write_behind_journal):
+                os.remove(self.write_behind_journal)
+            return
+        temp_path = self.write_behind_journal + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for todo_id, op in ops:
+                f.write(json.dumps({'id': todo_id, 'op': op}, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.write_behind_journal)
+    
+    def _replay_journal(self):
+        """前回書き込めなかった変更をジャーナルファイルから読み込む"""
+        if not os.path.exists(self.write_behind_journal):
+            return
+        ops = OrderedDict()
+        with open(self.write_behind_journal, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # 書き込み途中で終了した最終行は無視
+                    continue
+                ops.pop(entry['id'], None)
+                if entry['op'] is not None:
+                    ops[entry['id']] = entry['op']
+        with self._cache_lock:
+            self._pending_ops = ops
+            if self._snapshot is not None:
+                with self._pinned_snapshot():
+                    self._overlay_ops(ops)
+        print(f"未書き込みの変更を{len(ops)}件読み込みました")
+    
+    def flush_writes(self):
+        """未書き込みの変更をまとめてシートに書き込む（読み取り1回・書き込み1回）。書き込んだ件数を返す"""
+        with self._flush_lock:
+            with self._cache_lock:
+                if not self._pending_ops:
+                    return 0
+                self._inflight_ops = self._pending_ops
+                self._pending_ops = OrderedDict()
+            try:
+                # 行番号はシートの最新の内容から求める
+                snapshot = self._load_snapshot()
+                locations = {}
+                worksheets = self._worksheets_by_title()
+                for title, rows in snapshot.items():
+                    for i, row in enumerate(rows[1:], start=2):  # ヘッダーを考慮して行番号を調整
+                        if row and row[0].isdigit():
+                            locations.setdefault(row[0], (worksheets[title], i))
+                batch = WriteBatch()
+                for todo_id, op in self._inflight_ops.items():
+                    self._stage_op(batch, todo_id, op, lambda key: locations.get(key, (None, None)))
+                if not batch.is_empty():
+                    requests = self._batch_requests(batch)
+                    self._call(self.spreadsheet.batch_update, {'requests': requests})
+            except Exception as e:
+                # 書き込めなかった変更はキューに戻す（後から積まれた変更を優先）
+                with self._cache_lock:
+                    ops = self._inflight_ops
+                    for todo_id, op in self._pending_ops.items():
+                        ops.pop(todo_id, None)
+                        ops[todo_id] = op
+                    self._pending_ops = ops
+                    self._inflight_ops = OrderedDict()
+                self.write_behind_stats['flush_errors'] += 1
+                print(f"シートへの書き込みに失敗しました（次回再試行します）: {e}")
+                return 0
+            with self._cache_lock:
+                count = len(self._inflight_ops)
+                # 書き込み前に取得した内容に、書き込んだ変更と書き込み中に積まれた変更を重ねて公開
+                # （共有スナップショットを使う場合は、他のワーカーの書き込みを含む現在の内容をそのまま使う）
+                if self._shared is None:
+                    self._publish_snapshot(snapshot)
+                self._inflight_ops = OrderedDict()
+                self._journal_rewrite()
+                self.write_behind_stats['flushes'] += 1
+                self.write_behind_stats['flushed_ops'] += count
+            return count
+    
+    def _flush_loop(self):
+        """書き込み用バックグラウンドスレッドの本体"""
+        while not self._flush_stop.wait(self.write_behind_interval):
+            self.flush_writes()
+    
+    def shutdown(self):
+        """バックグラウンド処理を止め、未書き込みの変更をすべて書き込む"""
+        self.stop_poller()
+        if self._flush_thread is not None:
+            self._flush_stop.set()
+            self._flush_thread.join(timeout=self.write_behind_interval + 5)
+            self._flush_thread = None
+        if self.write_behind:
+            self.flush_writes()
+            if self._pending_ops:
+                print(f"未書き込みの変更が{len(self._pending_ops)}件残っています（{self.write_behind_journal}に保存済み、次回起動時に書き込みます）")
+    
+    def run_daily_maintenance(self):
+        """日付が変わって最初の呼び出しで、日次の整理（rollover）をバックグラウンドで始める"""
+        if not self.rollover_enabled or self._rollover_date == get_jst_today():
+            return False
+        if not self._rollover_lock.acquire(blocking=False):
+            return False
+        def run():
+            try:
+                self.rollover()
+            except Exception as e:
+                self.rollover_stats['errors'] += 1
+                print(f"日次の整理に失敗しました（次のリクエストで再試行します）: {e}")
+            finally:
+                self._rollover_lock.release()
+        thread = threading.Thread(target=run, name='sheets-rollover', daemon=True)
+        thread.start()
+        return True
+    
+    def _claim_rollover(self, today_str):
+        """今日の日次の整理をこのプロセスが担当するか決める（Todos_Rolloverに行を追加し、今日の最初の行の追加者が担当）
+        
+        担当の行は日付順に並ぶため、追加した行から上へROLLOVER_CLAIM_WINDOW行ずつ、今日の最初の行が見つかるまで読む
+        （過去の日の行は読まない）。ID採番の行番号に影響しないよう、Todos_Metaとは別のシートに記録する。
+        """
+        worksheet = self._ensure_rollover_worksheet()
+        response = self._call(
+            worksheet.append_row,
+            ['rollover', today_str, self._instance_token, get_jst_now().strftime('%Y-%m-%d %H:%M:%S')],
+            table_range='A1'
+        )
+        row_number = self._parse_appended_row(response)
+        if row_number is None or row_number < 2:
+            raise ValueError("日次の整理の担当を登録できませんでした")
+        def is_today(row):
+            return len(row) >= 3 and row[0] == 'rollover' and row[1] == today_str
+        winner = None
+        end = row_number
+        while end >= 2:
+            start = max(2, end - ROLLOVER_CLAIM_WINDOW + 1)
+            rows = self._call(worksheet.get_values, f'A{start}:C{end}')
+            today_rows = [row for row in rows if is_today(row)]
+            if today_rows:
+                winner = today_rows[0][2]
+            # 読んだ範囲の先頭も今日の行なら、それより上にも今日の行がある
+            if not (rows and is_today(rows[0])):
+                break
+            end = start - 1
+        return winner == self._instance_token
+    
+    def _ensure_rollover_worksheet(self):
+        """日次の整理の担当を記録する非表示のワークシートを返す（なければ作成）"""
+        if self._rollover_worksheet is None:
+            worksheet = self._add_hidden_worksheet(self.spreadsheet, 'Todos_Rollover', rows=100, cols=4)
+            if not self._call(worksheet.row_values, 1):
+                self._call(worksheet.update, 'A1:D1', [['種別', '日付', '担当', '日時']])
+            self._rollover_worksheet = worksheet
+        return self._rollover_worksheet
+    
+    def _ensure_archive_worksheet(self):
+        """アーカイブ用ワークシートを返す（なければ作成）"""
+        if self._archive_worksheet is None:
+            worksheet = self._add_worksheet(self.spreadsheet, 'Todos_Archive', rows=1000, cols=len(HEADERS))
+            if not self._call(worksheet.row_values, 1):
+                self._call(worksheet.update, 'A1:I1', [HEADERS])
+            self._archive_worksheet = worksheet
+        return self._archive_worksheet
+    
+    def rollover(self):
+        """期日が明日以前になった未来用シートの行を通常のシートへ戻し、古い完了済みの行をアーカイブする
+        
+        移動はすべて1回のspreadsheet.batch_updateで行う。複数のワーカーがいても担当の1つだけが行う。
+        移動した件数を返す。
+        """
+        today = get_jst_today()
+        today_str = today.strftime('%Y-%m-%d')
+        if not self._claim_rollover(today_str):
+            self.rollover_stats['skipped'] += 1
+            self._rollover_date = today
+            return 0
+        if self.write_behind:
+            # 行番号がずれないよう、先に未書き込みの変更を書き込んでおく
+            self.flush_writes()
+        archive_worksheet = self._ensure_archive_worksheet() if self.archive_after_days > 0 else None
+        with self._writer_lock():
+            # 他のワーカーの書き込みも含めた最新の内容から移動対象を決める
+            self.invalidate_cache()
+            with self._mirror_write():
+                if self._pending_ops or self._inflight_ops:
+                    raise ValueError("未書き込みの変更が残っているため、日次の整理を延期します")
+                # 移動する可能性のある行（範囲を絞った読み取りでは、これらの行の全列だけをまとめて取得する）
+                def locate():
+                    locations = []
+                    for i, row in enumerate(self._get_values(self.future_worksheet)[1:], start=2):  # ヘッダーを考慮して行番号を調整
+                        if row and row[0].isdigit() and not self._is_future_due_date(row[4] if len(row) > 4 else ''):
+                            locations.append((self.future_worksheet, i))
+                    if archive_worksheet is not None:
+                        for i, row in enumerate(self._get_values(self.worksheet)[1:], start=2):
+                            if row and row[0].isdigit() and len(row) > 7 and row[7] == '完了':
+                                locations.append((self.worksheet, i))
+                    return locations
+                batch = WriteBatch()
+                archive_batch = WriteBatch()
+                moved = 0
+                cutoff = (today - timedelta(days=self.archive_after_days)).strftime('%Y-%m-%d')
+                for worksheet, i, row in self._full_rows(locate):
+                    if worksheet is self.future_worksheet:
+                        # 1. 期日が明日以前になった行を未来用シートから通常のシートへ
+                        batch.append_row(self.worksheet, [int(row[0])] + list(row[1:]))
+                        batch.delete_row(self.future_worksheet, i)
+                        moved += 1
+                        continue
+                    # 2. archive_after_days日より前に完了した行を通常のシートからアーカイブへ（完了日時がなければ期日で判断）
+                    completed_on = ((row[6] if len(row) > 6 else '') or row[4])[:10]
+                    if completed_on and completed_on < cutoff:
+                        values = list(row[:len(HEADERS)]) + [''] * (len(HEADERS) - len(row))
+                        archive_batch.append_row(archive_worksheet, [int(row[0])] + values[1:])
+                        batch.delete_row(self.worksheet, i)
+                if not batch.is_empty():
+                    requests = self._batch_requests(batch) + self._batch_requests(archive_batch)
+                    self._call(self.spreadsheet.batch_update, {'requests': requests})
+                    # アーカイブはスナップショットに含めないため、通常・未来用シートの変更だけを反映
+                    self._apply_batch_to_mirror(batch)
+        archived = len(archive_batch.appends)
+        self._rollover_date = today
+        self.rollover_stats['runs'] += 1
+        self.rollover_stats['moved'] += moved
+        self.rollover_stats['archived'] += archived
+        self.rollover_stats['last_run_at'] = get_jst_now().strftime('%Y-%m-%d %H:%M:%S')
+        if moved or archived:
+            print(f"日次の整理: 未来用シートから{moved}件を戻し、{archived}件をアーカイブしました")
+        return moved + archived
     
     def add_todo(self, title, content, due_date):
         """Todoを追加"""
         # 期日から適切なワークシートを選択
         worksheet = self._get_worksheet_by_due_date(due_date)
         
-        todo_id = self._get_next_id(worksheet)
+        todo_id = self._get_next_id()
         created_at = get_jst_now().strftime('%Y-%m-%d %H:%M:%S')
         
         # 期日から曜日を計算
-        day_of_week = ''
-        if due_date:
-            try:
-                due_date_obj = datetime.strptime(due_date, '%Y-%m-%d')
-                weekday_names = ['月', '火', '水', '木', '金', '土', '日']
-                day_of_week = weekday_names[due_date_obj.weekday()]
-            except:
-                pass
+        day_of_week = self._get_day_of_week(due_date)
         
         # 対象日は空文字列にする（互換性のため列は保持）
         target_date_str = ''
         row = [todo_id, title, content, day_of_week, due_date, created_at, '', '未完了', target_date_str]
-        worksheet.append_row(row)
+        if self.write_behind:
+            batch = WriteBatch()
+            batch.append_row(worksheet, row)
+            self._commit_batch(batch)
+            return todo_id
+        with self._mirror_write():
+            response = self._call(worksheet.append_row, row)
+            with self._cache_lock:
+                self._mirror_append(worksheet, row, response)
+            if self._change_listeners:
+                self._notify_row_changes({str(todo_id): None})
         return todo_id
     
-    def update_todo(self, todo_id, title, content, due_date):
-        """Todoを更新"""
-        # まず、既存のTodoを検索してワークシートを特定
-        found_worksheet = None
-        found_row_index = None
-        found_row = None
+    def import_todos(self, records, chunk_size=500):
+        """Todoをまとめて追加し、追加した件数を返す
         
-        for worksheet in [self.worksheet, self.future_worksheet]:
-            all_values = worksheet.get_all_values()
-            for i, row in enumerate(all_values[1:], start=2):  # ヘッダーを考慮して行番号を調整
-                if row and row[0] == str(todo_id):
-                    found_worksheet = worksheet
-                    found_row_index = i
-                    found_row = row
-                    break
-            if found_worksheet:
-                break
+        recordsは順に読み込み、chunk_size件ごとにIDをまとめて払い出して、
+        期日に応じたワークシート（TodosまたはTodos_Future）へ1回のspreadsheet.batch_updateで追加する。
+        """
+        imported = 0
+        for chunk in chunked(records, chunk_size):
+            todo_ids = self._get_next_ids(len(chunk))
+            now = get_jst_now().strftime('%Y-%m-%d %H:%M:%S')
+            batch = WriteBatch()
+            for todo_id, record in zip(todo_ids, chunk):
+                todo = self._new_todo(record, now)
+                batch.append_row(self._get_worksheet_by_due_date(todo['due_date']),
+                                 [todo_id] + [todo[field] for field in TODO_FIELDS[1:]])
+            self._commit_batch(batch)
+            imported += len(chunk)
+        return imported
+    
+    def _stage_update(self, batch, todo_id, title, content, due_date):
+        """Todoの更新をWriteBatchに積む（見つからなければFalse）"""
+        # まず、既存のTodoを検索してワークシートを特定
+        found_worksheet, found_row_index, found_row = self._find_todo_row(todo_id, full=True)
         
         if not found_worksheet or not found_row:
             return False
         
         # 期日から曜日を計算
-        day_of_week = ''
-        if due_date:
-            try:
-                due_date_obj = datetime.strptime(due_date, '%Y-%m-%d')
-                weekday_names = ['月', '火', '水', '木', '金', '土', '日']
-                day_of_week = weekday_names[due_date_obj.weekday()]
-            except:
-                pass
+        day_of_week = self._get_day_of_week(due_date)
         
         # 既存の状態と完了日時を保持
         current_status = found_row[7] if len(found_row) > 7 else '未完了'
@@ -333,50 +1971,81 @@ class SheetsAPI:
         
         # 対象日は空文字列にする（互換性のため列は保持）
         target_date_str = ''
+        row_data = [int(todo_id), title, content, day_of_week, due_date, found_row[5] if len(found_row) > 5 else '', completed_at, current_status, target_date_str]
         
         # ワークシートが変更された場合のみ移動
         if target_worksheet.id != found_worksheet.id:
-            # 新しいワークシートに追加
-            new_todo_id = self._get_next_id(target_worksheet)
-            row_data = [new_todo_id, title, content, day_of_week, due_date, found_row[5] if len(found_row) > 5 else '', completed_at, current_status, target_date_str]
-            target_worksheet.append_row(row_data)
-            # 古いワークシートから削除
-            found_worksheet.delete_rows(found_row_index)
+            # 新しいワークシートに追加し、古いワークシートから削除（IDは両シートで一意なのでそのまま引き継ぐ）
+            batch.append_row(target_worksheet, row_data)
+            batch.delete_row(found_worksheet, found_row_index)
         else:
             # 同じワークシート内で更新（IDも含めて更新）
-            found_worksheet.update(f'A{found_row_index}:I{found_row_index}', [[todo_id, title, content, day_of_week, due_date, found_row[5] if len(found_row) > 5 else '', completed_at, current_status, target_date_str]])
+            batch.update_cells(found_worksheet, found_row_index, 1, row_data)
         return True
     
-    def complete_todo(self, todo_id):
-        """Todoを完了にする"""
-        # 両方のワークシートを検索
-        for worksheet in [self.worksheet, self.future_worksheet]:
-            all_values = worksheet.get_all_values()
-            for i, row in enumerate(all_values[1:], start=2):
-                if row and row[0] == str(todo_id):
-                    completed_at = get_jst_now().strftime('%Y-%m-%d %H:%M:%S')
-                    worksheet.update(f'H{i}', [['完了']])
-                    worksheet.update(f'G{i}', [[completed_at]])
-                    return True
-        return False
+    def update_todo(self, todo_id, title, content, due_date):
+        """Todoを更新"""
+        with self._mirror_write():
+            batch = WriteBatch()
+            if not self._stage_update(batch, todo_id, title, content, due_date):
+                return False
+            self._commit_batch(batch)
+        return True
     
-    def carryover_todo(self, todo_id, new_due_date):
-        """Todoを次の日に持越す（期日を更新）"""
-        todo = self.get_todo_by_id(todo_id)
-        if not todo:
-            return False
-        
-        # 期日を更新して新しいワークシートに移動する場合があるため、update_todoを使用
-        return self.update_todo(todo_id, todo['title'], todo['content'], new_due_date)
+    def complete_todos(self, todo_ids):
+        """複数のTodoをまとめて完了にする（API呼び出しは1回）。完了にした件数を返す"""
+        completed_at = get_jst_now().strftime('%Y-%m-%d %H:%M:%S')
+        count = 0
+        with self._mirror_write():
+            batch = WriteBatch()
+            for todo_id in dict.fromkeys(todo_ids):
+                # 両方のワークシートを検索
+                worksheet, i, row = self._find_todo_row(todo_id)
+                if row is None:
+                    continue
+                # G列（完了日時）とH列（状態）を1つの更新にまとめる
+                batch.update_cells(worksheet, i, 7, [completed_at, '完了'])
+                count += 1
+            self._commit_batch(batch)
+        return count
     
-    def delete_todo(self, todo_id):
-        """Todoを削除"""
-        # 両方のワークシートを検索
-        for worksheet in [self.worksheet, self.future_worksheet]:
-            all_values = worksheet.get_all_values()
-            for i, row in enumerate(all_values[1:], start=2):  # ヘッダーを考慮して行番号を調整
-                if row and row[0] == str(todo_id):
-                    worksheet.delete_rows(i)
-                    return True
-        return False
-
+    def carryover_todos(self, todo_ids, new_due_date):
+        """複数のTodoの期日をまとめて更新する（シート間の移動も含めてAPI呼び出しは1回）。更新した件数を返す"""
+        count = 0
+        with self._mirror_write():
+            # 範囲を絞った読み取りでは、対象の行の全列を先に1回でまとめて取得しておく
+            self._full_rows(lambda: [location for todo_id in dict.fromkeys(todo_ids) for location in self._locate_todo(todo_id)])
+            batch = WriteBatch()
+            for todo_id in dict.fromkeys(todo_ids):
+                todo = self.get_todo_by_id(todo_id)
+                if not todo:
+                    continue
+                # 期日を更新して新しいワークシートに移動する場合があるため、update_todoと同じ処理を使用
+                if self._stage_update(batch, todo_id, todo['title'], todo['content'], new_due_date):
+                    count += 1
+            self._commit_batch(batch)
+        return count
+    
+    def carryover_overdue_todos(self, new_due_date=None):
+        """期日が過ぎている未完了のTodoをすべて持越す（読み取り・書き込みとも1回）。持越した件数を返す"""
+        if new_due_date is None:
+            new_due_date = (get_jst_today() + timedelta(days=1)).strftime('%Y-%m-%d')
+        with self._mirror_write():
+            # 同じスナップショットから対象を決めて、まとめて書き込む
+            overdue_ids = [todo['id'] for todo in self.get_overdue_todos()]
+            return self.carryover_todos(overdue_ids, new_due_date)
+    
+    def delete_todos(self, todo_ids):
+        """複数のTodoをまとめて削除する（API呼び出しは1回）。削除した件数を返す"""
+        count = 0
+        with self._mirror_write():
+            batch = WriteBatch()
+            for todo_id in dict.fromkeys(todo_ids):
+                # 両方のワークシートを検索
+                worksheet, i, row = self._find_todo_row(todo_id)
+                if row is None:
+                    continue
+                batch.delete_row(worksheet, i)
+                count += 1
+            self._commit_batch(batch)
+        return count
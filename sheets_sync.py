@@ -0,0 +1,272 @@
+import json
+import threading
+import time
+import uuid
+from sheets_api import HEADERS, WriteBatch, get_jst_now
+from sqlite_backend import COLUMNS, SYNC_COLUMNS
+
+# 同期用にシートのJ・K列へ書き込む列（更新日時と版）
+SYNC_HEADERS = ['更新日時', '版']
+ROW_WIDTH = len(HEADERS) + len(SYNC_HEADERS)
+DATA_WIDTH = len(HEADERS)
+
+def _normalize_row(row):
+    """シートの行を同期用の11列の文字列のリストにそろえる"""
+    values = [str(value) for value in row[:ROW_WIDTH]]
+    values += [''] * (ROW_WIDTH - len(values))
+    if len(row) <= 7:
+        values[7] = '未完了'
+    return values
+
+def _row_version(row):
+    """行の版（書かれていなければ0）"""
+    try:
+        return int(row[DATA_WIDTH + 1] or 0)
+    except (IndexError, TypeError, ValueError):
+        return 0
+
+class SheetsSync:
+    """SQLiteバックエンドとスプレッドシート（TodosとTodos_Future）を双方向に同期する
+    
+    前回同期した時点のシートの行（sync_base）と比べて、シート側の変更は取り込み、
+    こちらで変更した行（sync_dirty）は1回のbatch_updateでまとめて書き込む。
+    両方で変更された行は、版と更新日時の新しいほうを採用する（同じならシート側を優先）。
+    """
+    def __init__(self, store, sheets, interval):
+        self.store = store
+        self.sheets = sheets
+        self.interval = interval
+        self.lease_seconds = max(60, interval * 4)  # 複数のワーカーが同時に同期しないようにする
+        self._owner = uuid.uuid4().hex[:8]
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {
+            'runs': 0,
+            'pulled': 0,
+            'pushed': 0,
+            'conflicts': 0,
+            'reassigned': 0,
+            'errors': 0,
+            'skipped': 0,
+            'last_sync_at': None,
+            'last_ms': None
+        }
+    
+    def start(self):
+        """同期用のバックグラウンドスレッドを開始（すぐに1回同期し、以降はinterval秒ごと）"""
+        if self._thread is not None:
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sync_loop, name='sheets-sync', daemon=True)
+        self._thread.start()
+        return True
+    
+    def stop(self):
+        """バックグラウンドスレッドを止め、最後に1回同期する"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=self.interval + 5)
+            self._thread = None
+        self.sync_once()
+    
+    def _sync_loop(self):
+        """同期用バックグラウンドスレッドの本体"""
+        while True:
+            self.sync_once()
+            if self._stop.wait(self.interval):
+                break
+    
+    def get_stats(self):
+        """同期の統計情報"""
+        stats = dict(self.stats)
+        stats['interval'] = self.interval
+        stats['pending'] = self.store._connect().execute('SELECT COUNT(DISTINCT todo_id) FROM sync_dirty').fetchone()[0]
+        return stats
+    
+    def _acquire_lease(self):
+        """同期の担当を確保する（他のワーカーが同期中ならFalse）"""
+        now = time.time()
+        with self.store._transaction() as conn:
+            row = conn.execute("SELECT value FROM todo_meta WHERE key = 'sync_lease'").fetchone()
+            if row is not None:
+                owner, _, expires = row['value'].partition(':')
+                if owner != self._owner and float(expires or 0) > now:
+                    return False
+            conn.execute(
+                "INSERT OR REPLACE INTO todo_meta (key, value) VALUES ('sync_lease', ?)",
+                (f"{self._owner}:{now + self.lease_seconds}",)
+            )
+        return True
+    
+    def _release_lease(self):
+        with self.store._transaction() as conn:
+            conn.execute("DELETE FROM todo_meta WHERE key = 'sync_lease' AND value LIKE ?", (f"{self._owner}:%",))
+    
+    def sync_once(self):
+        """1回同期する（シートの読み取り1回・書き込み1回）。同期できたかを返す"""
+        with self._lock:
+            try:
+                if not self._acquire_lease():
+                    self.stats['skipped'] += 1
+                    return False
+            except Exception as e:
+                self.stats['errors'] += 1
+                print(f"スプレッドシートとの同期を開始できませんでした: {e}")
+                return False
+            started = time.perf_counter()
+            try:
+                self._sync()
+            except Exception as e:
+                self.stats['errors'] += 1
+                print(f"スプレッドシートとの同期に失敗しました（次回再試行します）: {e}")
+                return False
+            finally:
+                try:
+                    self._release_lease()
+                except Exception:
+                    pass
+            self.stats['runs'] += 1
+            self.stats['last_sync_at'] = get_jst_now().strftime('%Y-%m-%d %H:%M:%S')
+            self.stats['last_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            return True
+    
+    def _local_row(self, row):
+        """SQLiteの行をシートの行と同じ11列の文字列のリストに変換"""
+        return [str(row[column]) for column in COLUMNS + SYNC_COLUMNS]
+    
+    def _sync(self):
+        """シートとSQLiteの差分を求めて、両方に反映する"""
+        sheets = self.sheets
+        now = get_jst_now().strftime('%Y-%m-%d %H:%M:%S')
+        
+        # 1. シートの現在の内容（IDごとの位置と行。IDが重複していれば最初の行を使う）
+        sheet_rows = sheets.read_todo_sheets()
+        remote = {}
+        for worksheet, rows in sheet_rows:
+            for i, row in enumerate(rows[1:], start=2):  # ヘッダーを考慮して行番号を調整
+                if row and row[0].isdigit():
+                    remote.setdefault(int(row[0]), (worksheet, i, _normalize_row(row)))
+        
+        # 2. 前回の同期以降の変更（ここまでに記録された変更だけを今回の対象にする）
+        with self.store._transaction() as conn:
+            max_seq = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM sync_dirty').fetchone()[0]
+            dirty = {row[0] for row in conn.execute('SELECT DISTINCT todo_id FROM sync_dirty WHERE seq <= ?', (max_seq,))}
+            base = {row['todo_id']: json.loads(row['row']) for row in conn.execute('SELECT todo_id, row FROM sync_base')}
+            local = {
+                row['id']: self._local_row(row)
+                for row in conn.execute(f"SELECT {', '.join(COLUMNS + SYNC_COLUMNS)} FROM todos")
+            }
+        
+        batch = WriteBatch()
+        pulls = {}  # ID -> シートの行（削除ならNone）
+        new_base = {}  # ID -> 同期後のシートの行（削除ならNone）
+        reassigned = []  # (元のID, 新しいID)
+        next_id = max(list(local) + list(remote) + [0]) + 1
+        
+        def push(todo_id, row):
+            """こちらの行をシートに書き込む（期日に応じてシートを移動）"""
+            location = remote.get(todo_id)
+            if row is None:
+                if location is not None:
+                    batch.delete_row(location[0], location[1])
+                new_base[todo_id] = None
+                return
+            values = [int(row[0])] + row[1:DATA_WIDTH] + [row[DATA_WIDTH], _row_version(row)]
+            target = sheets.worksheet_for_due_date(row[4])
+            if location is not None and location[0] is target:
+                batch.update_cells(target, location[1], 1, values)
+            else:
+                batch.append_row(target, values)
+                if location is not None:
+                    batch.delete_row(location[0], location[1])
+            new_base[todo_id] = row
+            self.stats['pushed'] += 1
+        
+        for todo_id in sorted(set(remote) | set(base) | dirty):
+            base_row = base.get(todo_id)
+            remote_row = remote[todo_id][2] if todo_id in remote else None
+            local_row = local.get(todo_id)
+            
+            # 版が上がっていないシートの変更は手で編集されたものとみなし、今回の同期時刻と次の版を付ける
+            if remote_row is not None and remote_row != base_row and _row_version(remote_row) <= _row_version(base_row):
+                remote_row = remote_row[:DATA_WIDTH] + [now, str(_row_version(base_row) + 1)]
+                worksheet, row_index, _ = remote[todo_id]
+                batch.update_cells(worksheet, row_index, DATA_WIDTH + 1, [now, _row_version(remote_row)])
+            
+            remote_changed = remote_row != base_row
+            local_changed = todo_id in dirty and local_row != base_row
+            if not remote_changed and not local_changed:
+                continue
+            if remote_changed and not local_changed:
+                pulls[todo_id] = remote_row
+                new_base[todo_id] = remote_row
+                continue
+            if local_changed and not remote_changed:
+                push(todo_id, local_row)
+                continue
+            
+            # 両方で変更されている（内容が同じなら版と更新日時をそろえるだけ）
+            same = remote_row is not None and local_row is not None and remote_row[:DATA_WIDTH] == local_row[:DATA_WIDTH]
+            if not same and base_row is None and remote_row is not None and local_row is not None:
+                # 両方で同じIDのTodoが追加された: こちらのTodoに新しいIDを振り直して両方残す
+                new_id = next_id
+                next_id += 1
+                reassigned.append((todo_id, new_id))
+                push(new_id, [str(new_id)] + local_row[1:])
+                pulls[todo_id] = remote_row
+                new_base[todo_id] = remote_row
+                self.stats['reassigned'] += 1
+                continue
+            if not same:
+                self.stats['conflicts'] += 1
+            if remote_row is None or local_row is None:
+                # 削除と変更が競合した場合は変更を残す
+                if local_row is not None:
+                    push(todo_id, local_row)
+                else:
+                    pulls[todo_id] = remote_row
+                    new_base[todo_id] = remote_row
+                continue
+            remote_key = (_row_version(remote_row), remote_row[DATA_WIDTH])
+            local_key = (_row_version(local_row), local_row[DATA_WIDTH])
+            if local_key > remote_key:
+                push(todo_id, local_row)
+            else:
+                pulls[todo_id] = remote_row
+                new_base[todo_id] = remote_row
+        
+        # 3. シートへの書き込み（J・K列がなければ先に追加する）
+        if not batch.is_empty():
+            for worksheet, rows in sheet_rows:
+                if not rows or len(rows[0]) < ROW_WIDTH:
+                    batch.update_cells(worksheet, 1, DATA_WIDTH + 1, SYNC_HEADERS)
+            sheets.write_batch(batch, column_count=ROW_WIDTH)
+        
+        # 4. SQLiteへの反映（同期中にこちらで変更された行はシートの内容で上書きしない）
+        with self.store._transaction() as conn:
+            changed_since = {row[0] for row in conn.execute('SELECT DISTINCT todo_id FROM sync_dirty WHERE seq > ?', (max_seq,))}
+            for old_id, new_id in reassigned:
+                conn.execute('UPDATE todos SET id = ? WHERE id = ?', (new_id, old_id))
+                conn.execute('UPDATE sync_dirty SET todo_id = ? WHERE todo_id = ? AND seq > ?', (new_id, old_id, max_seq))
+            pulled = 0
+            for todo_id, row in pulls.items():
+                if todo_id in changed_since and todo_id not in dict(reassigned):
+                    continue
+                if row is None:
+                    conn.execute('DELETE FROM todos WHERE id = ?', (todo_id,))
+                else:
+                    conn.execute(
+                        f"INSERT OR REPLACE INTO todos ({', '.join(COLUMNS + SYNC_COLUMNS)}) VALUES ({', '.join('?' * ROW_WIDTH)})",
+                        [todo_id] + row[1:DATA_WIDTH] + [row[DATA_WIDTH], _row_version(row)]
+                    )
+                pulled += 1
+            for todo_id, row in new_base.items():
+                if row is None:
+                    conn.execute('DELETE FROM sync_base WHERE todo_id = ?', (todo_id,))
+                else:
+                    conn.execute('INSERT OR REPLACE INTO sync_base (todo_id, row) VALUES (?, ?)', (todo_id, json.dumps(row, ensure_ascii=False)))
+            conn.execute('DELETE FROM sync_dirty WHERE seq <= ?', (max_seq,))
+            if pulled or reassigned:
+                self.store._bump_version(conn)
+        self.stats['pulled'] += pulled
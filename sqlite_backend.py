@@ -0,0 +1,385 @@
+import atexit
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from search_index import normalize
+from todo_backend import Todo, TodoBackend, bucket_todos_by_date, chunked, get_jst_now, get_jst_today, parse_date
+
+# Todoの列（SheetsAPIのワークシートの列と同じ順序）
+COLUMNS = ['id', 'title', 'content', 'day_of_week', 'due_date', 'created_at', 'completed_at', 'status', 'target_date']
+
+# 同期用の列（更新日時と版。変更するたびに版を1つ上げる）
+SYNC_COLUMNS = ['updated_at', 'revision']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS todos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL DEFAULT '',
+    content TEXT NOT NULL DEFAULT '',
+    day_of_week TEXT NOT NULL DEFAULT '',
+    due_date TEXT NOT NULL DEFAULT '',
+    created_at TEXT NOT NULL DEFAULT '',
+    completed_at TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT '未完了',
+    target_date TEXT NOT NULL DEFAULT '',
+    updated_at TEXT NOT NULL DEFAULT '',
+    revision INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_todos_due_date ON todos (due_date);
+CREATE INDEX IF NOT EXISTS idx_todos_status_due_date ON todos (status, due_date);
+CREATE TABLE IF NOT EXISTS todo_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+-- スプレッドシートとの同期用（前回同期した時点のシートの行と、それ以降にこちらで変更したID）
+CREATE TABLE IF NOT EXISTS sync_base (
+    todo_id INTEGER PRIMARY KEY,
+    row TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sync_dirty (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    todo_id INTEGER NOT NULL
+);
+"""
+
+class SQLiteTodoBackend(TodoBackend):
+    """ローカルのSQLiteファイルにTodoを保存するバックエンド（WALモード）
+    
+    exporterにSheetsAPI（write_behind有効）を渡すと、変更をスプレッドシートへ非同期に書き出す。
+    ファイルが空なら、スプレッドシートの内容はconnect_in_backgroundで（間に合わなければ最初の追加のときに）取り込む。
+    enable_syncを呼ぶと、スプレッドシートと双方向に同期する（sheets_sync.SheetsSync）。
+    """
+    def __init__(self, path, exporter=None):
+        """SQLiteファイルを開き、テーブルとインデックスを作成"""
+        self.path = path
+        self.exporter = exporter
+        self._local = threading.local()  # スレッドごとの接続
+        self.syncer = None
+        self._seed_lock = threading.Lock()
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        # 同期用の列がない古いファイルには列を追加する
+        existing = {row['name'] for row in conn.execute('PRAGMA table_info(todos)')}
+        if 'updated_at' not in existing:
+            conn.execute("ALTER TABLE todos ADD COLUMN updated_at TEXT NOT NULL DEFAULT ''")
+        if 'revision' not in existing:
+            conn.execute('ALTER TABLE todos ADD COLUMN revision INTEGER NOT NULL DEFAULT 0')
+        with self._transaction() as conn:
+            # バージョン文字列の接頭辞（ファイルを作り直したときに以前のETagと一致しないように）
+            conn.execute("INSERT OR IGNORE INTO todo_meta (key, value) VALUES ('token', ?)", (uuid.uuid4().hex[:8],))
+            conn.execute("INSERT OR IGNORE INTO todo_meta (key, value) VALUES ('version', '0')")
+            empty = conn.execute('SELECT NOT EXISTS (SELECT 1 FROM todos)').fetchone()[0]
+            if exporter is not None and empty:
+                # 書き出し先のIDと重ならないよう、スプレッドシートの内容を取り込むまではTodoの追加を待たせる
+                # （ここでは取り込まない。起動時にスプレッドシートへ接続しないように）
+                conn.execute("INSERT OR IGNORE INTO todo_meta (key, value) VALUES ('seed_pending', '1')")
+            pending = conn.execute("SELECT 1 FROM todo_meta WHERE key = 'seed_pending'").fetchone() is not None
+        self._seeded = exporter is None or not pending
+    
+    def _connect(self):
+        """このスレッド用の接続を返す（初回のみ作成）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            # 検索でSheetsと同じ正規化（全角・半角、大文字・小文字）を使うため
+            conn.create_function('todo_normalize', 1, normalize, deterministic=True)
+            self._local.conn = conn
+        return conn
+    
+    @contextmanager
+    def _transaction(self):
+        """書き込み用のトランザクション（最初に書き込みロックを取り、失敗したらロールバック）"""
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+    
+    def _bump_version(self, conn):
+        """データのバージョンを1つ進める（書き込みのトランザクション内で呼ぶ）"""
+        conn.execute("UPDATE todo_meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'version'")
+    
+    def _record_changes(self, conn, todo_ids):
+        """同期が有効なら、変更したIDを次の同期で書き込む対象として記録（書き込みのトランザクション内で呼ぶ）"""
+        if self.syncer is not None and todo_ids:
+            conn.executemany('INSERT INTO sync_dirty (todo_id) VALUES (?)', [(todo_id,) for todo_id in todo_ids])
+    
+    def enable_sync(self, sheets, interval):
+        """スプレッドシートとの双方向同期を有効にする（同期はstart_pollerで開始）"""
+        from sheets_sync import SheetsSync
+        self.syncer = SheetsSync(self, sheets, interval)
+        with self._transaction() as conn:
+            # 初めて同期する場合は、既存のTodoをすべて書き込み対象にする
+            if conn.execute("SELECT value FROM todo_meta WHERE key = 'sync_initialized'").fetchone() is None:
+                conn.execute('INSERT INTO sync_dirty (todo_id) SELECT id FROM todos')
+                conn.execute("INSERT INTO todo_meta (key, value) VALUES ('sync_initialized', '1')")
+        atexit.register(self.shutdown)
+    
+    def _export(self, changes):
+        """変更をスプレッドシートへの書き出しキューに積む（changes: [(ID, Todoまたは削除ならNone, 追加かどうか)]）"""
+        if self.exporter is None or not changes:
+            return
+        try:
+            self.exporter.export_todos(changes)
+        except Exception as e:
+            print(f"スプレッドシートへの書き出しの登録に失敗しました（{len(changes)}件）: {e}")
+    
+    def _ensure_seeded(self):
+        """スプレッドシートの内容の取り込みが済んでいなければ取り込む（IDを払い出す書き込みの前に呼ぶ）
+        
+        取り込めない場合（Googleに接続できないなど）は例外になり、Todoは追加しない。
+        """
+        if self._seeded:
+            return
+        with self._seed_lock:
+            if self._seeded:
+                return
+            if self._connect().execute("SELECT 1 FROM todo_meta WHERE key = 'seed_pending'").fetchone() is not None:
+                self._import_todos(self.exporter.get_all_todos())
+            self._seeded = True
+    
+    def _import_todos(self, todos):
+        """既存のTodoをIDを保ったまま取り込む（他のプロセスが取り込み済みなら何もしない）"""
+        with self._transaction() as conn:
+            if conn.execute("DELETE FROM todo_meta WHERE key = 'seed_pending'").rowcount == 0:
+                return
+            conn.executemany(
+                f"INSERT OR REPLACE INTO todos ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                [[todo[column] for column in COLUMNS] for todo in todos]
+            )
+            self._bump_version(conn)
+        print(f"スプレッドシートから{len(todos)}件のTodoを取り込みました")
+    
+    def _fetch_todos(self, where='', params=()):
+        """条件に合うTodoを期日順（期日がないものは最後）に取得"""
+        rows = self._connect().execute(
+            f"SELECT {', '.join(COLUMNS)} FROM todos {where} ORDER BY due_date = '', due_date, id", params
+        ).fetchall()
+        return [Todo.from_row(row) for row in rows]
+    
+    def iter_todos(self):
+        """すべてのTodoをID順に返すイテレーター（エクスポート用。行はカーソルから順に読み、全件をメモリに載せない）"""
+        cursor = self._connect().execute(f"SELECT {', '.join(COLUMNS)} FROM todos ORDER BY id")
+        return (Todo.from_row(row) for row in cursor)
+    
+    def get_all_todos(self, due_date_filter=None):
+        """すべてのTodoを取得（期日でフィルタリング可能）"""
+        if not due_date_filter:
+            return self._fetch_todos()
+        if hasattr(due_date_filter, 'strftime'):
+            due_date_filter_str = due_date_filter.strftime('%Y-%m-%d')
+        else:
+            due_date_filter_str = str(due_date_filter).strip()
+            due_date_filter_obj = parse_date(due_date_filter_str)
+            if due_date_filter_obj is not None:
+                due_date_filter_str = due_date_filter_obj.strftime('%Y-%m-%d')
+        return self._fetch_todos('WHERE due_date = ?', (due_date_filter_str,))
+    
+    def get_overdue_todos(self):
+        """期日が過ぎている未完了のTodoを取得"""
+        today = get_jst_today().strftime('%Y-%m-%d')
+        # 形式が正しくない期日は対象外（due_dateのインデックスで範囲検索する）
+        return self._fetch_todos(
+            "WHERE due_date < ? AND due_date GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]' AND status != '完了'",
+            (today,)
+        )
+    
+    def get_todos_in_range(self, start_date, end_date):
+        """期日がstart_date〜end_dateのTodoを日付ごとに、期日超過のTodoと一緒に取得（1回のクエリ）"""
+        today = get_jst_today()
+        todos = self._fetch_todos(
+            "WHERE due_date GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]' "
+            "AND (due_date BETWEEN ? AND ? OR (due_date < ? AND status != '完了'))",
+            (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'), today.strftime('%Y-%m-%d'))
+        )
+        return bucket_todos_by_date(todos, start_date, end_date, today)
+    
+    def get_todo_by_id(self, todo_id):
+        """IDでTodoを取得"""
+        todos = self._fetch_todos('WHERE id = ?', (int(todo_id),))
+        return todos[0] if todos else None
+    
+    def search(self, query):
+        """タイトル・内容に検索語を含むTodoを取得（空白で区切った語はすべて含むもの、期日順）"""
+        terms = normalize(query).split()
+        if not terms:
+            return []
+        return self._fetch_todos(
+            'WHERE ' + ' AND '.join(["instr(todo_normalize(title || char(10) || content), ?) > 0"] * len(terms)), terms
+        )
+    
+    def add_todo(self, title, content, due_date):
+        """Todoを追加"""
+        self._ensure_seeded()
+        now = get_jst_now().strftime('%Y-%m-%d %H:%M:%S')
+        todo = {
+            'title': title,
+            'content': content,
+            'day_of_week': self._get_day_of_week(due_date),
+            'due_date': due_date,
+            'created_at': now,
+            'completed_at': '',
+            'status': '未完了',
+            'target_date': ''  # 互換性のため保持
+        }
+        columns = COLUMNS[1:]
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                f"INSERT INTO todos ({', '.join(columns + SYNC_COLUMNS)}) VALUES ({', '.join('?' * (len(columns) + 2))})",
+                [todo[column] for column in columns] + [now, 1]
+            )
+            self._record_changes(conn, [cursor.lastrowid])
+            self._bump_version(conn)
+        todo['id'] = cursor.lastrowid
+        self._export([(todo['id'], todo, True)])
+        if self._change_listeners:
+            self._notify_changes([(None, Todo.from_row([todo[column] for column in COLUMNS]))])
+        return todo['id']
+    
+    def import_todos(self, records, chunk_size=500):
+        """Todoをまとめて追加し、追加した件数を返す（chunk_size件ごとに1回のトランザクション）"""
+        self._ensure_seeded()
+        columns = COLUMNS[1:]
+        sql = f"INSERT INTO todos ({', '.join(columns + SYNC_COLUMNS)}) VALUES ({', '.join('?' * (len(columns) + 2))})"
+        imported = 0
+        for chunk in chunked(records, chunk_size):
+            now = get_jst_now().strftime('%Y-%m-%d %H:%M:%S')
+            todos = [self._new_todo(record, now) for record in chunk]
+            with self._transaction() as conn:
+                for todo in todos:
+                    todo['id'] = conn.execute(sql, [todo[column] for column in columns] + [now, 1]).lastrowid
+                self._record_changes(conn, [todo['id'] for todo in todos])
+                self._bump_version(conn)
+            self._export([(todo['id'], todo, True) for todo in todos])
+            if self._change_listeners:
+                self._notify_changes([(None, Todo.from_row([todo[column] for column in COLUMNS])) for todo in todos])
+            imported += len(todos)
+        return imported
+    
+    def _update_todos(self, todo_ids, assignments, params, where=''):
+        """指定IDのTodoをまとめて更新し、更新後のTodoを返す（1トランザクション）"""
+        todo_ids = [int(todo_id) for todo_id in dict.fromkeys(todo_ids)]
+        if not todo_ids:
+            return []
+        placeholders = ', '.join('?' * len(todo_ids))
+        now = get_jst_now().strftime('%Y-%m-%d %H:%M:%S')
+        select = f"SELECT {', '.join(COLUMNS)} FROM todos WHERE id IN ({placeholders}) {where}"
+        with self._transaction() as conn:
+            # 変更の通知に使う変更前のTodo
+            before = {row['id']: Todo.from_row(row) for row in conn.execute(select, todo_ids)} if self._change_listeners else None
+            cursor = conn.execute(
+                f"UPDATE todos SET {assignments}, updated_at = ?, revision = revision + 1 WHERE id IN ({placeholders}) {where}",
+                list(params) + [now] + todo_ids
+            )
+            if cursor.rowcount == 0:
+                return []
+            self._bump_version(conn)
+            rows = conn.execute(select, todo_ids).fetchall()
+            self._record_changes(conn, [row['id'] for row in rows])
+        todos = [dict(row) for row in rows]
+        self._export([(todo['id'], todo, False) for todo in todos])
+        if before is not None:
+            self._notify_changes([(before.get(row['id']), Todo.from_row(row)) for row in rows])
+        return todos
+    
+    def update_todo(self, todo_id, title, content, due_date):
+        """Todoを更新（状態と完了日時はそのまま）"""
+        todos = self._update_todos([todo_id], 'title = ?, content = ?, due_date = ?, day_of_week = ?',
+                                   (title, content, due_date, self._get_day_of_week(due_date)))
+        return bool(todos)
+    
+    def complete_todos(self, todo_ids):
+        """複数のTodoをまとめて完了にする。完了にした件数を返す"""
+        completed_at = get_jst_now().strftime('%Y-%m-%d %H:%M:%S')
+        return len(self._update_todos(todo_ids, "completed_at = ?, status = '完了'", (completed_at,)))
+    
+    def carryover_todos(self, todo_ids, new_due_date):
+        """複数のTodoの期日をまとめて更新する。更新した件数を返す"""
+        return len(self._update_todos(todo_ids, 'due_date = ?, day_of_week = ?',
+                                      (new_due_date, self._get_day_of_week(new_due_date))))
+    
+    def carryover_overdue_todos(self, new_due_date=None):
+        """期日が過ぎている未完了のTodoをすべて持越す。持越した件数を返す"""
+        if new_due_date is None:
+            new_due_date = (get_jst_today() + timedelta(days=1)).strftime('%Y-%m-%d')
+        overdue_ids = [todo['id'] for todo in self.get_overdue_todos()]
+        # 一覧の取得後に完了・削除されたTodoは対象外にする
+        return len(self._update_todos(overdue_ids, 'due_date = ?, day_of_week = ?',
+                                      (new_due_date, self._get_day_of_week(new_due_date)),
+                                      where="AND status != '完了'"))
+    
+    def delete_todos(self, todo_ids):
+        """複数のTodoをまとめて削除する。削除した件数を返す"""
+        todo_ids = [int(todo_id) for todo_id in dict.fromkeys(todo_ids)]
+        if not todo_ids:
+            return 0
+        placeholders = ', '.join('?' * len(todo_ids))
+        with self._transaction() as conn:
+            rows = conn.execute(f"SELECT {', '.join(COLUMNS)} FROM todos WHERE id IN ({placeholders})", todo_ids).fetchall()
+            if not rows:
+                return 0
+            deleted = [row['id'] for row in rows]
+            conn.execute(f"DELETE FROM todos WHERE id IN ({placeholders})", todo_ids)
+            self._record_changes(conn, deleted)
+            self._bump_version(conn)
+        self._export([(todo_id, None, False) for todo_id in deleted])
+        if self._change_listeners:
+            self._notify_changes([(Todo.from_row(row), None) for row in rows])
+        return len(deleted)
+    
+    def get_data_version(self):
+        """データのバージョン文字列を取得（どのプロセスからの書き込みでも変わる）"""
+        values = dict(self._connect().execute("SELECT key, value FROM todo_meta WHERE key IN ('token', 'version')").fetchall())
+        return f"{values['token']}-{values['version']}"
+    
+    def connect_in_background(self):
+        """書き出し先のスプレッドシートへの接続をバックグラウンドで始める（取り込み待ちなら、あわせて内容を取り込む）"""
+        if self.exporter is None:
+            return None
+        if self._seeded:
+            return self.exporter.connect_in_background()
+        def run():
+            try:
+                self._ensure_seeded()
+            except Exception as e:
+                print(f"スプレッドシートの内容を取り込めませんでした（最初の追加のときに再試行します）: {e}")
+        thread = threading.Thread(target=run, name='sqlite-seed', daemon=True)
+        thread.start()
+        return thread
+    
+    def start_poller(self):
+        """スプレッドシートとの同期を開始（同期が有効な場合のみ。すぐに1回同期し、以降は一定間隔で同期）"""
+        if self.syncer is None:
+            return False
+        return self.syncer.start()
+    
+    def shutdown(self):
+        """書き出し・同期待ちの変更をすべて書き込む"""
+        if self.exporter is not None:
+            self.exporter.shutdown()
+        if self.syncer is not None:
+            self.syncer.stop()
+    
+    def get_cache_stats(self):
+        """バックエンドの情報（SQLiteは読み取りキャッシュを使わない）"""
+        stats = {'backend': 'sqlite', 'path': self.path, 'version': self.get_data_version()}
+        if self.exporter is not None:
+            stats['export'] = self.exporter.get_cache_stats()['write_behind']
+        if self.syncer is not None:
+            stats['sync'] = self.syncer.get_stats()
+        return stats
+    
+    def get_api_stats(self):
+        """書き出し・同期先のスプレッドシートへのAPI呼び出しの統計情報"""
+        sheets = self.exporter if self.exporter is not None else (self.syncer.sheets if self.syncer is not None else None)
+        if sheets is None:
+            return {}
+        return sheets.get_api_stats()
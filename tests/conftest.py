@@ -0,0 +1,60 @@
+"""テスト共通の設定（Googleには接続せず、bench/fake_gspread.pyのメモリ上のスプレッドシートを使う）"""
+import atexit
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, 'bench'))
+
+import fake_gspread  # noqa: E402
+from bench_routes import seed_spreadsheet  # noqa: E402
+from todo_backend import get_jst_today  # noqa: E402
+
+@pytest.fixture
+def sheets_env(monkeypatch, tmp_path):
+    """SheetsAPI用の環境変数（レート制限・日次の整理・定期取得を無効にし、再試行を待たない）"""
+    for key, value in [('SHEETS_RATE_LIMIT', '0'), ('SHEETS_ROLLOVER', '0'), ('SHEETS_CACHE_TTL', '3600'),
+                       ('SHEETS_RETRY_BASE_DELAY', '0'), ('SHEETS_POLL_INTERVAL', '0'),
+                       ('SHEETS_WRITE_BEHIND', '0'), ('SHEETS_COMPACT_READS', '0'),
+                       ('SHEETS_WRITE_BEHIND_INTERVAL', '3600'),
+                       ('SHEETS_WRITE_BEHIND_JOURNAL', str(tmp_path / 'journal.jsonl')),
+                       ('METRICS_ENABLED', '0'), ('METRICS_PROFILE', '0')]:
+        monkeypatch.setenv(key, value)
+    monkeypatch.delenv('SHEETS_SHARED_CACHE', raising=False)
+    # fake_gspread.installが書き換える環境変数を、テストの終了時に元に戻す
+    monkeypatch.setenv('SPREADSHEET_ID', '')
+    monkeypatch.setenv('GOOGLE_CREDENTIALS_FILE', '')
+    monkeypatch.delenv('GOOGLE_CREDENTIALS_JSON', raising=False)
+    return monkeypatch
+
+@pytest.fixture
+def spreadsheet(sheets_env):
+    """Todoを20件用意したメモリ上のスプレッドシート"""
+    spreadsheet = fake_gspread.FakeSpreadsheet()
+    seed_spreadsheet(spreadsheet, 20, get_jst_today())
+    return fake_gspread.install(spreadsheet)
+
+@pytest.fixture
+def make_api(spreadsheet):
+    """SheetsAPIを作る関数（テストの終了時にバックグラウンド処理を止める）"""
+    from sheets_api import SheetsAPI
+    apis = []
+    def make(**kwargs):
+        api = SheetsAPI(**kwargs)
+        atexit.unregister(api.shutdown)
+        apis.append(api)
+        return api
+    yield make
+    for api in apis:
+        api.stop_poller()
+        if api._flush_thread is not None:
+            api._flush_stop.set()
+            api._flush_thread.join()
+            api._flush_thread = None
+
+def sheet_rows(spreadsheet, title='Todos'):
+    """ワークシートのTodoの行（{ID: 行}）"""
+    return {row[0]: row for row in spreadsheet.sheet(title).rows[1:] if row and row[0].isdigit()}
@@ -0,0 +1,81 @@
+"""Google Sheets APIの呼び出し（レート制限・再試行・サーキットブレーカー）"""
+import fake_gspread
+import pytest
+from sheets_api import TokenBucket
+from todo_backend import SheetsUnavailableError, get_jst_today
+
+TODAY = get_jst_today().strftime('%Y-%m-%d')
+
+def failing(errors):
+    """errorsを順に送出し、使い切ったら'ok'を返す関数"""
+    errors = list(errors)
+    def flaky():
+        if errors:
+            raise errors.pop(0)
+        return 'ok'
+    return flaky
+
+def test_token_bucket_waits_after_burst():
+    bucket = TokenBucket(6000, 2)
+    # バースト分（2回）は待たずに呼び出し、3回目はトークンが補充されるまで待つ
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0
+    assert bucket.acquire() > 0
+
+def test_rate_limit_is_counted(make_api, sheets_env):
+    sheets_env.setenv('SHEETS_RATE_LIMIT', '6000')
+    sheets_env.setenv('SHEETS_RATE_BURST', '1')
+    api = make_api()
+    api.get_all_todos()
+    stats = api.get_api_stats()['rate_limiter']
+    # 接続時の3回の呼び出しのうち、2回目以降は待つ
+    assert stats['enabled']
+    assert stats['throttled'] == 2
+    assert stats['wait_ms'] > 0
+
+def test_transient_errors_are_retried(make_api):
+    api = make_api()
+    assert api._call(failing([fake_gspread.quota_error(), OSError('timeout')])) == 'ok'
+    stats = api.get_api_stats()['methods']['flaky']
+    assert (stats['calls'], stats['errors'], stats['retries'], stats['rejected']) == (3, 2, 2, 0)
+    assert api._breaker.failures == 0
+
+def test_client_errors_are_not_retried(make_api):
+    api = make_api()
+    with pytest.raises(fake_gspread.gspread.exceptions.APIError):
+        api._call(failing([fake_gspread.api_error(400, 'Bad request (fake)', 'INVALID_ARGUMENT')]))
+    stats = api.get_api_stats()
+    assert (stats['methods']['flaky']['calls'], stats['methods']['flaky']['retries']) == (1, 0)
+    # 400はGoogleに接続できているため、ブレーカーの失敗としては数えない
+    assert stats['breaker']['failures'] == 0
+
+def test_breaker_serves_stale_snapshot(make_api, spreadsheet, sheets_env):
+    sheets_env.setenv('SHEETS_BREAKER_THRESHOLD', '2')
+    api = make_api()
+    todos = [todo.id for todo in api.get_all_todos()]
+    
+    # Googleに接続できなくなると、2回続けて失敗した時点で呼び出しを止め、最後に取得した内容を返す
+    spreadsheet.quota_error_rate = 1.0
+    api.invalidate_cache()
+    assert [todo.id for todo in api.get_all_todos()] == todos
+    assert spreadsheet.errors['values_batch_get'] == 2
+    assert api.cache_stats['stale_served'] > 0
+    breaker = api.get_api_stats()['breaker']
+    assert (breaker['state'], breaker['opened']) == ('open', 1)
+    assert breaker['retry_after'] > 0
+    # 止めている間はAPIを呼ばず、読み取りは最後の内容、書き込みはSheetsUnavailableErrorになる
+    calls = sum(spreadsheet.calls.values())
+    assert [todo.id for todo in api.get_all_todos()] == todos
+    with pytest.raises(SheetsUnavailableError) as excinfo:
+        api.add_todo('接続できない間の追加', '', TODAY)
+    assert excinfo.value.retry_after > 0
+    assert sum(spreadsheet.calls.values()) == calls
+    assert api.get_api_stats()['methods']['values_batch_get']['rejected'] >= 1
+    
+    # 停止時間が過ぎたら1回だけ試し、成功すれば再開する
+    spreadsheet.quota_error_rate = 0.0
+    api._breaker.opened_at -= api._breaker.cooldown
+    api.invalidate_cache()
+    api.get_all_todos()
+    assert api.get_api_stats()['breaker']['state'] == 'closed'
+    assert api.add_todo('再開後の追加', '', TODAY) == 21
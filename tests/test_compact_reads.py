@@ -0,0 +1,80 @@
+"""範囲を絞った読み取り（SHEETS_COMPACT_READS）と全列の読み取りで同じ結果になること"""
+from datetime import datetime, timedelta
+
+import fake_gspread
+import pytest
+from bench_routes import seed_spreadsheet
+from todo_backend import get_jst_today
+
+TODAY = get_jst_today()
+
+def day(offset):
+    return (TODAY + timedelta(days=offset)).strftime('%Y-%m-%d')
+
+DATES = [day(offset) for offset in (-50, -45, -1, 0, 1, 5)]
+
+def make_spreadsheet():
+    """Todo20件（期日は過去）に、昨日〜未来のTodoを加えたスプレッドシート"""
+    spreadsheet = fake_gspread.FakeSpreadsheet()
+    seed_spreadsheet(spreadsheet, 20, TODAY)
+    for n, offset in enumerate([-1, 0, 0, 1]):
+        spreadsheet.sheet('Todos').rows.append([str(21 + n), f'近いTodo {n}', '長い内容' * 50, '', day(offset),
+                                                '2026-01-01 09:00:00', '', '未完了', ''])
+    spreadsheet.sheet('Todos_Future').rows.append(['25', '未来のTodo', '', '', day(5), '2026-01-01 09:00:00', '', '未完了', ''])
+    spreadsheet.sheet('Todos_Meta').rows[1][1] = '25'
+    return spreadsheet
+
+def read_all(api):
+    """期日ごと・期日超過・IDでの読み取り結果"""
+    return {
+        'by_date': {date: [todo.to_dict() for todo in api.get_all_todos(date)] for date in DATES},
+        'overdue': [todo.to_dict() for todo in api.get_overdue_todos()],
+        'by_id': [api.get_todo_by_id(todo_id).to_dict() for todo_id in (1, 21, 25)],
+    }
+
+def write_some(api):
+    api.add_todo('追加', '内容', day(0))
+    api.update_todo(22, '未来用シートへ', '', day(5))
+    api.update_todo(25, '通常のシートへ', '', day(1))
+    api.complete_todo(23)
+    api.delete_todo(2)
+    api.carryover_todos([21, 4], day(1))
+
+@pytest.fixture
+def run(sheets_env, monkeypatch):
+    """範囲を絞った読み取りの有効・無効を指定して、同じ内容のスプレッドシートで読み書きする"""
+    import sheets_api
+    from sheets_api import SheetsAPI
+    monkeypatch.setattr(sheets_api, 'get_jst_now', lambda: datetime(2026, 1, 3, 9, 0))
+    def run(compact):
+        sheets_env.setenv('SHEETS_COMPACT_READS', '1' if compact else '0')
+        spreadsheet = fake_gspread.install(make_spreadsheet())
+        api = SheetsAPI()
+        assert api.compact_reads == compact
+        before = read_all(api)
+        write_some(api)
+        return api, spreadsheet, before, read_all(api)
+    return run
+
+def test_compact_reads_match_full_reads(run):
+    full, full_sheet, full_before, full_after = run(False)
+    compact, compact_sheet, compact_before, compact_after = run(True)
+    assert compact_before == full_before
+    assert compact_after == full_after
+    # 書き込み後のシートも同じ
+    for title in ['Todos', 'Todos_Future']:
+        assert compact_sheet.sheet(title).rows == full_sheet.sheet(title).rows
+    # スナップショットはID・期日・状態の列と行の並びが同じで、それ以外の列は未取得（None）か同じ値
+    full_snapshot, compact_snapshot = full._get_snapshot(), compact._get_snapshot()
+    assert list(compact_snapshot) == list(full_snapshot)
+    for title, rows in full_snapshot.items():
+        assert len(compact_snapshot[title]) == len(rows)
+        for compact_row, row in zip(compact_snapshot[title], rows):
+            padded = list(row) + [''] * (len(compact_row) - len(row))
+            assert [compact_row[i] for i in (0, 4, 7)] == [padded[i] for i in (0, 4, 7)]
+            assert all(value is None or value == padded[i] for i, value in enumerate(compact_row))
+    # 範囲を絞った読み取りでは、長い内容の列を読み込んでいない行が残っている
+    assert any(None in row for row in compact_snapshot['Todos'][1:])
+    assert compact.cache_stats['row_fetches'] > 0
+    assert compact.cache_stats['row_mismatches'] == 0
+    assert full.cache_stats['row_fetches'] == 0
@@ -0,0 +1,52 @@
+"""スプレッドシートへの接続（最初の利用時に3回のAPI呼び出しで接続する）"""
+import fake_gspread
+from conftest import sheet_rows
+
+CONNECT_CALLS = {'open_by_key': 1, 'fetch_sheet_metadata': 1, 'values_batch_get': 1}
+
+def test_connects_on_first_read(make_api, spreadsheet):
+    api = make_api()
+    # 作成しただけではGoogleに接続しない
+    assert not spreadsheet.calls
+    assert api.get_api_stats()['startup']['connected'] is False
+    
+    assert len(api.get_all_todos()) > 0
+    # 確認済みのシート構成なら、開く・メタデータ・全行とID採番の設定の3回だけ
+    assert spreadsheet.calls == CONNECT_CALLS
+    assert api.startup_stats['connect_api_calls'] == 3
+    assert api.startup_stats['schema_checked'] is False
+    # 接続時に取得した全行を使うため、続けて読み取ってもAPIは呼ばない
+    api.get_overdue_todos()
+    api.get_todo_by_id(1)
+    assert spreadsheet.calls == CONNECT_CALLS
+
+def test_new_spreadsheet_is_set_up_once(sheets_env):
+    from sheets_api import SCHEMA_METADATA_KEY, SheetsAPI
+    spreadsheet = fake_gspread.install(fake_gspread.FakeSpreadsheet())
+    first = SheetsAPI()
+    assert first.get_all_todos() == []
+    # シートを作成して空白の1枚目を削除し、確認済みの印を付ける
+    assert first.startup_stats['schema_checked'] is True
+    assert [worksheet.title for worksheet in spreadsheet.sheets] == ['Todos', 'Todos_Future', 'Todos_Meta']
+    assert [item['metadataKey'] for item in spreadsheet.developer_metadata] == [SCHEMA_METADATA_KEY]
+    assert first.add_todo('最初のTodo', '', '2026-01-01') == 1
+    
+    # 次に起動したワーカーはシート構成の確認を省略する
+    spreadsheet.calls.clear()
+    second = SheetsAPI()
+    assert [todo.id for todo in second.get_all_todos()] == [1]
+    assert spreadsheet.calls == CONNECT_CALLS
+    assert second.startup_stats['schema_checked'] is False
+    assert list(sheet_rows(spreadsheet)) == ['1']
+
+def test_background_connect_failure_is_retried(make_api, spreadsheet):
+    spreadsheet.quota_error_rate = 1.0
+    api = make_api()
+    api.retry_attempts = 1
+    # 接続に失敗してもスレッドの中で表示するだけで、次の利用時に接続し直す
+    api.connect_in_background().join()
+    assert api.get_api_stats()['startup']['connected'] is False
+    
+    spreadsheet.quota_error_rate = 0.0
+    assert len(api.get_all_todos()) > 0
+    assert api.get_api_stats()['startup']['connected'] is True
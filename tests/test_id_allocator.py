@@ -0,0 +1,50 @@
+"""ID採番（Todos_MetaシートでのIDブロックの予約）"""
+from datetime import timedelta
+
+from conftest import sheet_rows
+from todo_backend import get_jst_today
+
+TODAY = get_jst_today().strftime('%Y-%m-%d')
+FUTURE = (get_jst_today() + timedelta(days=10)).strftime('%Y-%m-%d')
+
+def test_ids_unique_across_sheets_and_workers(make_api, spreadsheet):
+    first = make_api()
+    second = make_api()
+    added = []
+    for n in range(25):
+        # 2つのワーカーから交互に、通常のシートと未来用シートの両方に追加する
+        api = first if n % 2 else second
+        added.append(api.add_todo(f'追加{n}', '', FUTURE if n % 3 else TODAY))
+    assert len(set(added)) == len(added)
+    assert min(added) > 20
+    # 両方のシートを通してIDは一意
+    ids = list(sheet_rows(spreadsheet)) + list(sheet_rows(spreadsheet, 'Todos_Future'))
+    assert len(ids) == len(set(ids)) == 45
+    # ワーカーごとに別のブロック（20件ずつ）を予約し、その中から順に払い出す
+    assert added[0::2] == list(range(21, 34))
+    assert added[1::2] == list(range(41, 53))
+    assert [row[0] for row in spreadsheet.sheet('Todos_Meta').rows[2:]] == ['id_block', 'id_block']
+
+def test_multi_block_reservation_is_consecutive(make_api, spreadsheet):
+    api = make_api()
+    # ブロックサイズ（20）を超える数を求めると、必要なブロックを1回のappend_rowsでまとめて予約する
+    assert api._get_next_ids(45) == list(range(21, 66))
+    assert spreadsheet.calls['append_rows'] == 1
+    assert len(spreadsheet.sheet('Todos_Meta').rows) == 2 + 3
+    # 予約した残りのIDから続けて払い出す（APIは呼ばない）
+    assert api._get_next_ids(15) == list(range(66, 81))
+    assert len(spreadsheet.sheet('Todos_Meta').rows) == 2 + 3
+    # 予約済みのIDを使い切ったら、次のブロックを予約する
+    assert api._get_next_id() == 81
+    assert spreadsheet.calls['append_row'] == 1
+    assert len(spreadsheet.sheet('Todos_Meta').rows) == 2 + 4
+
+def test_id_typed_into_sheet_is_skipped(make_api, spreadsheet):
+    # 基準ID（20）の直後のIDを、スプレッドシートで直接入力しておく
+    spreadsheet.sheet('Todos').rows.append(['21', '直接入力', '', '', TODAY, '', '', '未完了', ''])
+    spreadsheet.sheet('Todos_Future').rows.append(['23', '直接入力（未来）', '', '', FUTURE, '', '', '未完了', ''])
+    api = make_api()
+    assert api.add_todo('追加1', '', TODAY) == 22
+    assert api.add_todo('追加2', '', TODAY) == 24
+    assert api.get_todo_by_id(21).title == '直接入力'
+    assert api.get_todo_by_id(23).title == '直接入力（未来）'
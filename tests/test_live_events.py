@@ -0,0 +1,164 @@
+"""Todoの変更の配信（live_events.EventBrokerと/events）"""
+import json
+
+import pytest
+from live_events import MAX_EVENTS_PER_CHANGE, EventBroker
+from sqlite_backend import SQLiteTodoBackend
+from todo_backend import Todo, get_jst_today
+
+TODAY = get_jst_today().strftime('%Y-%m-%d')
+
+def parse_events(chunks):
+    """送られた文字列をイベント（{'id', 'event', 'data'}）とコメントに分ける（retryは除く）"""
+    events, comments = [], []
+    for block in ''.join(chunks).split('\n\n'):
+        if not block or block.startswith('retry: '):
+            continue
+        if block.startswith(':'):
+            comments.append(block)
+            continue
+        fields = dict(line.split(': ', 1) for line in block.split('\n'))
+        if 'data' in fields:
+            fields['data'] = json.loads(fields['data'])
+        events.append(fields)
+    return events, comments
+
+def publish_once(broker, name, data):
+    """最初の確認（check）のときに1回だけイベントを追加する（接続を受け付けた後に変更が起きた状態にする）"""
+    published = []
+    def check():
+        if not published:
+            published.append(name)
+            broker.publish(name, data)
+    return check
+
+def test_stream_format():
+    broker = EventBroker()
+    todo = Todo(5, '牛乳を買う', due_date=TODAY)
+    check = publish_once(broker, 'todo', {'type': 'added', 'id': 5, 'todo': todo.to_dict(), 'previous': None})
+    chunks = list(broker.stream(check=check, check_interval=0.01, max_seconds=0.1, retry_ms=1500))
+    # 最初に再接続までの待ち時間を送る
+    assert chunks[0] == 'retry: 1500\n\n'
+    assert chunks[1].startswith(f"id: {broker._token}-1\nevent: todo\ndata: {{")
+    assert chunks[1].endswith('}\n\n') and chunks[1].count('\n') == 4
+    events, comments = parse_events(chunks[1:])
+    assert [(event['id'], event['event']) for event in events] == [(f'{broker._token}-1', 'todo')]
+    assert events[0]['data']['todo']['title'] == '牛乳を買う'
+    # イベントがない間は接続を確かめるコメントを送る
+    assert comments and set(comments) == {': keepalive'}
+
+def test_publish_changes_classifies_and_collapses():
+    broker = EventBroker()
+    before = Todo(1, '元のタイトル', due_date=TODAY)
+    broker.publish_changes([
+        (None, before),
+        (before, Todo(1, '元のタイトル', due_date=TODAY, status='完了')),
+        (before, Todo(1, '元のタイトル', due_date='2099-01-01')),
+        (before, Todo(1, '編集', due_date=TODAY)),
+        (before, None)
+    ])
+    types = [json.loads(payload)['type'] for seq, name, payload in broker._events]
+    assert types == ['added', 'completed', 'moved', 'updated', 'deleted']
+    assert json.loads(broker._events[2][2])['previous'] == {'due_date': TODAY, 'status': '未完了'}
+    # 一度に多くのTodoが変わった場合は、個別のイベントの代わりにreloadを1つ送る
+    broker.publish_changes([(None, Todo(n)) for n in range(MAX_EVENTS_PER_CHANGE + 1)])
+    assert broker._events[-1][1] == 'reload'
+    assert broker.get_stats()['published'] == 6
+    assert broker.get_stats()['reloads'] == 1
+
+def test_resume_with_last_event_id():
+    broker = EventBroker()
+    for n in range(1, 4):
+        broker.publish('todo', {'id': n})
+    chunks = list(broker.stream(f'{broker._token}-1', max_seconds=0))
+    events, _ = parse_events(chunks)
+    # 受け取り済みのイベントより後のものだけを送り直す
+    assert [event['data']['id'] for event in events] == [2, 3]
+    assert events[-1]['id'] == f'{broker._token}-3'
+    # 最新まで受け取っていれば何も送り直さない
+    events, _ = parse_events(list(broker.stream(f'{broker._token}-3', max_seconds=0)))
+    assert events == []
+
+@pytest.mark.parametrize('last_event_id', ['{token}-1', 'other-2', '{token}-x'])
+def test_history_overflow_sends_reload(last_event_id):
+    broker = EventBroker(history=3)
+    for n in range(1, 6):
+        broker.publish('todo', {'id': n})
+    # 保持していないイベント・別のプロセスのIDからの再接続には、一覧を取得し直すよう伝える
+    chunks = list(broker.stream(last_event_id.format(token=broker._token), max_seconds=0))
+    events, _ = parse_events(chunks)
+    assert [(event['event'], event['data']) for event in events] == [('reload', {})]
+    assert events[0]['id'] == f'{broker._token}-5'
+    assert broker.get_stats()['reloads'] == 1
+    assert broker.get_stats()['history'] == 3
+
+def test_connection_limit():
+    broker = EventBroker(max_clients=2)
+    assert broker.connect() and broker.connect()
+    assert not broker.connect()
+    broker.disconnect()
+    assert broker.connect()
+    for _ in range(3):
+        broker.disconnect()
+    stats = broker.get_stats()
+    assert stats['clients'] == 0
+    assert (stats['connections'], stats['rejected']) == (3, 1)
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    """LIVE_EVENTS=1・SQLiteバックエンドのアプリ（接続は1つまで）"""
+    monkeypatch.setenv('TODO_BACKEND', 'sqlite')
+    monkeypatch.setenv('SQLITE_PATH', str(tmp_path / 'app.db'))
+    monkeypatch.setenv('METRICS_ENABLED', '0')
+    import app as app_module
+    backend = SQLiteTodoBackend(str(tmp_path / 'todos.db'))
+    broker = EventBroker(max_clients=1)
+    backend.add_change_listener(broker.publish_changes)
+    monkeypatch.setattr(app_module, 'backend', backend)
+    monkeypatch.setattr(app_module, 'live_events', broker)
+    monkeypatch.setattr(app_module, 'LIVE_EVENTS', True)
+    return app_module.app.test_client()
+
+def test_events_disabled(client, monkeypatch):
+    import app as app_module
+    monkeypatch.setattr(app_module, 'LIVE_EVENTS', False)
+    assert client.get('/events').status_code == 404
+
+def test_events_route_streams_changes(client):
+    import app as app_module
+    broker = app_module.live_events
+    todo_id = app_module.backend.add_todo('配信するTodo', '', TODAY)
+    response = client.get('/events', headers={'Last-Event-ID': f'{broker._token}-0'}, buffered=False)
+    try:
+        assert response.status_code == 200
+        assert response.mimetype == 'text/event-stream'
+        assert response.headers['Cache-Control'] == 'no-cache'
+        assert response.headers['X-Accel-Buffering'] == 'no'
+        chunks = iter(response.response)
+        assert next(chunks).decode() == 'retry: 3000\n\n'
+        events, _ = parse_events([next(chunks).decode()])
+        assert events[0]['event'] == 'todo'
+        assert events[0]['data']['type'] == 'added'
+        assert events[0]['data']['id'] == todo_id
+        assert broker.get_stats()['clients'] == 1
+    finally:
+        response.close()
+
+def test_events_disconnect_releases_client(client):
+    import app as app_module
+    broker = app_module.live_events
+    first = client.get('/events', buffered=False)
+    assert first.status_code == 200
+    assert broker.get_stats()['clients'] == 1
+    # 上限に達している間は503を返す
+    rejected = client.get('/events')
+    assert rejected.status_code == 503
+    assert rejected.headers['Retry-After'] == '30'
+    # 切断すると接続数が戻り、次の接続を受け付ける
+    first.close()
+    assert broker.get_stats()['clients'] == 0
+    second = client.get('/events', buffered=False)
+    assert second.status_code == 200
+    second.close()
+    stats = broker.get_stats()
+    assert (stats['clients'], stats['connections'], stats['rejected']) == (0, 2, 1)
@@ -0,0 +1,74 @@
+"""Prometheus形式の計測（/metrics）とServer-Timingヘッダー"""
+import json
+import os
+import subprocess
+import sys
+
+import metrics
+from conftest import ROOT_DIR
+
+def metric_lines(text):
+    """コメント以外の行（{メトリクス名とラベル: 値}）"""
+    return dict(line.rsplit(' ', 1) for line in text.splitlines() if line and not line.startswith('#'))
+
+def test_sheets_calls_are_counted(make_api, spreadsheet, monkeypatch):
+    monkeypatch.setattr(metrics, '_metrics', metrics.Metrics(enabled=True))
+    api = make_api()
+    api.get_all_todos()
+    spreadsheet.quota_error_rate = 1.0
+    api.retry_attempts = 1
+    api.invalidate_cache()
+    api.get_all_todos()
+    
+    lines = metric_lines(metrics.get_metrics().render())
+    sheets = 'worksheet="Todos,Todos_Future,Todos_Meta"'
+    assert lines['todo_sheets_calls_total{method="open_by_key",worksheet="-",outcome="ok"}'] == '1'
+    assert lines[f'todo_sheets_calls_total{{method="values_batch_get",{sheets},outcome="ok"}}'] == '1'
+    # 再取得ではID採番の設定は読まない
+    errors = lines['todo_sheets_calls_total{method="values_batch_get",worksheet="Todos,Todos_Future",outcome="error"}']
+    assert int(errors) == spreadsheet.errors['values_batch_get'] > 0
+    # 受け取った行数（両シートのヘッダーとTodo20件、ID採番の設定1行）。失敗した呼び出しは数えない
+    assert lines[f'todo_sheets_rows_total{{method="values_batch_get",{sheets}}}'] == str(2 + 20 + 1)
+    assert int(lines[f'todo_sheets_response_bytes_total{{method="values_batch_get",{sheets}}}']) > 0
+    assert lines['todo_sheets_call_duration_seconds_count{method="values_batch_get"}'] == str(1 + int(errors))
+
+def test_disabled_metrics_are_not_served(tmp_path, monkeypatch):
+    monkeypatch.setenv('TODO_BACKEND', 'sqlite')
+    monkeypatch.setenv('SQLITE_PATH', str(tmp_path / 'todos.db'))
+    monkeypatch.setenv('METRICS_ENABLED', '0')
+    import app as app_module
+    monkeypatch.setattr(app_module, 'metrics', metrics.Metrics())
+    assert app_module.app.test_client().get('/metrics').status_code == 404
+
+def test_requests_are_counted_per_route(tmp_path):
+    # 計測のフックはimport時に登録するため、有効にした状態のアプリを別のプロセスで動かす
+    script = (
+        "import json\n"
+        "import app\n"
+        "client = app.app.test_client()\n"
+        "for path in ['/today', '/today', '/date/2026-01-01', '/no-such-page']:\n"
+        "    client.get(path)\n"
+        "profiled = client.get('/today', headers={'X-Profile': '1'})\n"
+        "response = client.get('/metrics')\n"
+        "print(json.dumps({'status': response.status_code, 'type': response.headers['Content-Type'],\n"
+        "                  'text': response.get_data(as_text=True),\n"
+        "                  'timing': profiled.headers.get('Server-Timing')}))\n"
+    )
+    env = dict(os.environ, TODO_BACKEND='sqlite', SQLITE_PATH=str(tmp_path / 'todos.db'),
+               METRICS_ENABLED='1', METRICS_PROFILE='1', SHEETS_POLL_INTERVAL='0')
+    result = subprocess.run([sys.executable, '-c', script], cwd=ROOT_DIR, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    output = json.loads(result.stdout.strip().splitlines()[-1])
+    assert output['status'] == 200
+    assert output['type'].startswith('text/plain; version=0.0.4')
+    lines = metric_lines(output['text'])
+    # ルートはURLではなくルールごとにまとめる（/metrics自体は応答を返した後に数える）
+    assert lines['todo_http_requests_total{route="/today",method="GET",status="200"}'] == '3'
+    assert lines['todo_http_requests_total{route="/date/<date_str>",method="GET",status="200"}'] == '1'
+    assert lines['todo_http_requests_total{route="unmatched",method="GET",status="404"}'] == '1'
+    assert lines['todo_http_request_duration_seconds_count{route="/today",method="GET"}'] == '3'
+    assert lines['todo_http_request_duration_seconds_bucket{route="/today",method="GET",le="+Inf"}'] == '3'
+    assert '# TYPE todo_http_requests_total counter' in output['text']
+    # X-Profileを付けたリクエストだけServer-Timingヘッダーを返す
+    assert output['timing'].startswith('app;dur=')
+    assert 'sheets;dur=' in output['timing']
@@ -0,0 +1,66 @@
+"""書き込みのスナップショットへの反映（行のパッチ・ID/期日インデックス・1操作1回の書き込み）"""
+from collections import Counter
+from datetime import timedelta
+
+import pytest
+from todo_backend import get_jst_today
+
+TODAY = get_jst_today().strftime('%Y-%m-%d')
+FUTURE = (get_jst_today() + timedelta(days=10)).strftime('%Y-%m-%d')
+
+def trim(rows):
+    """行末の空のセルを除く（get_all_valuesは行の長さをそろえて返すため）"""
+    return [row[:max([i + 1 for i, value in enumerate(row) if value], default=0)] for row in rows]
+
+def assert_mirrors_sheet(api, spreadsheet):
+    """パッチしたスナップショットとインデックスが、シートの現在の内容と一致する"""
+    expected = {title: trim(spreadsheet.sheet(title).get_all_values()) for title in ['Todos', 'Todos_Future']}
+    assert {title: trim(rows) for title, rows in api._get_snapshot().items()} == expected
+    for title, rows in expected.items():
+        for i, row in enumerate(rows[1:], start=2):
+            worksheet, row_index, found = api._find_todo_row(row[0])
+            assert (worksheet.title, row_index, trim([found])[0]) == (title, i, row)
+    dates = {}
+    for title, rows in expected.items():
+        for row in rows[1:]:
+            dates.setdefault(row[4], set()).add((title, row[0]))
+    assert api._date_index == dates
+
+@pytest.fixture
+def api(make_api, spreadsheet):
+    api = make_api()
+    api.get_all_todos()
+    # IDブロックの予約（Todos_Metaへの追加）を先に済ませておく
+    api.add_todo('最初の追加', '', TODAY)
+    return api
+
+def test_each_write_patches_snapshot(api, spreadsheet):
+    write = {'batch_update': 1}
+    steps = [
+        (lambda: api.add_todo('今日のTodo', '内容', TODAY), {'append_row': 1}),
+        (lambda: api.add_todo('未来のTodo', '', FUTURE), {'append_row': 1}),
+        (lambda: api.update_todo(3, '同じシートで編集', '', TODAY), write),
+        (lambda: api.update_todo(5, '未来用シートへ', '', FUTURE), write),
+        (lambda: api.update_todo(5, '通常のシートへ', '', TODAY), write),
+        (lambda: api.complete_todo(7), write),
+        (lambda: api.complete_todos([8, 10, 404]), write),
+        # 削除で行番号が繰り上がった後の書き込みも、正しい行に行う
+        (lambda: api.delete_todo(2), write),
+        (lambda: api.update_todo(9, '削除の後に編集', '', TODAY), write),
+        (lambda: api.delete_todos([4, 6, 11]), write),
+        (lambda: api.carryover_todos([13, 14], FUTURE), write),
+        (lambda: api.carryover_overdue_todos(), write),
+    ]
+    rebuilds = api.cache_stats['index_rebuilds']
+    for run, expected_calls in steps:
+        before = Counter(spreadsheet.calls)
+        assert run()
+        calls = Counter(spreadsheet.calls)
+        calls.subtract(before)
+        # 1つの操作は1回の書き込みだけで行い、シートを読み直さない
+        assert +calls == Counter(expected_calls)
+        assert_mirrors_sheet(api, spreadsheet)
+    # インデックスは作り直さずに、変わった行だけを更新する
+    assert api.cache_stats['index_rebuilds'] == rebuilds
+    assert api.cache_stats['misses'] == 1
+    assert len(api.get_all_todos(FUTURE)) == 3
@@ -0,0 +1,87 @@
+"""一覧ページの条件付きGET（ETag・304）・X-Fragment・フラグメントキャッシュ"""
+from datetime import timedelta
+
+import pytest
+from fragment_cache import FragmentCache
+from sqlite_backend import SQLiteTodoBackend
+from todo_backend import get_jst_today
+
+TODAY = get_jst_today()
+
+@pytest.fixture
+def clock(monkeypatch):
+    """今日の日付（日本時間）を変えられるようにする"""
+    import app as app_module
+    import sqlite_backend
+    clock = {'today': TODAY}
+    for module in (app_module, sqlite_backend):
+        monkeypatch.setattr(module, 'get_jst_today', lambda: clock['today'])
+    return clock
+
+@pytest.fixture
+def client(monkeypatch, tmp_path, clock):
+    """SQLiteバックエンドのアプリ（フラグメントキャッシュは空の状態から）"""
+    monkeypatch.setenv('TODO_BACKEND', 'sqlite')
+    monkeypatch.setenv('SQLITE_PATH', str(tmp_path / 'app.db'))
+    monkeypatch.setenv('METRICS_ENABLED', '0')
+    import app as app_module
+    monkeypatch.setattr(app_module, 'backend', SQLiteTodoBackend(str(tmp_path / 'todos.db')))
+    monkeypatch.setattr(app_module, 'fragment_cache', FragmentCache())
+    return app_module.app.test_client()
+
+def test_if_none_match_returns_304(client):
+    import app as app_module
+    app_module.backend.add_todo('今日のTodo', '', TODAY.strftime('%Y-%m-%d'))
+    first = client.get('/today')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'] == 'no-cache'
+    assert 'X-Fragment' in first.headers['Vary']
+    
+    cached = client.get('/today', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.data == b''
+    assert cached.headers['ETag'] == etag
+    # 一覧だけを取得する場合はページ全体とは別のETagになる
+    section = client.get('/today', headers={'X-Fragment': 'section', 'If-None-Match': etag})
+    assert section.status_code == 200
+    assert section.headers['ETag'] != etag
+    assert '今日のTodo' in section.get_data(as_text=True)
+    assert '<html' not in section.get_data(as_text=True)
+    assert client.get('/today', headers={'X-Fragment': 'section', 'If-None-Match': section.headers['ETag']}).status_code == 304
+
+def test_write_changes_etag_and_fragments(client):
+    import app as app_module
+    cache = app_module.fragment_cache
+    etag = client.get('/today').headers['ETag']
+    assert cache.get_stats()['misses'] == 2  # 期日超過の通知と一覧
+    client.get('/today')
+    assert cache.get_stats()['hits'] == 2
+    
+    app_module.backend.add_todo('書き込み後のTodo', '', TODAY.strftime('%Y-%m-%d'))
+    response = client.get('/today', headers={'If-None-Match': etag})
+    # データのバージョンが変わったため、304にせず、キャッシュしたフラグメントも使わずに描画し直す
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert '書き込み後のTodo' in response.get_data(as_text=True)
+    stats = cache.get_stats()
+    assert (stats['hits'], stats['misses'], stats['invalidations']) == (2, 4, 1)
+
+def test_fragments_not_reused_after_date_change(client, clock):
+    import app as app_module
+    # 今日が期日の未完了のTodoは、日付が変わると期日超過になる
+    app_module.backend.add_todo('今日が期日', '', TODAY.strftime('%Y-%m-%d'))
+    later = (TODAY + timedelta(days=5)).strftime('%Y-%m-%d')
+    before = client.get(f'/date/{later}')
+    assert 'id="overdue-notification"' not in before.get_data(as_text=True)
+    assert '今日が期日' not in client.get('/yesterday').get_data(as_text=True)
+    
+    clock['today'] = TODAY + timedelta(days=1)
+    # データは変わっていなくても、日付が変わったら304にせず、前日に描画したフラグメントも使わない
+    after = client.get(f'/date/{later}', headers={'If-None-Match': before.headers['ETag']})
+    assert after.status_code == 200
+    assert after.headers['ETag'] != before.headers['ETag']
+    assert '期日が過ぎている未完了のTodoが1件あります' in after.get_data(as_text=True)
+    # 「昨日」のページは前日の「昨日」（一昨日）の一覧ではなく、前日の一覧になる
+    assert '今日が期日' in client.get('/yesterday').get_data(as_text=True)
+    assert app_module.fragment_cache.get_stats()['hits'] == 0
@@ -0,0 +1,116 @@
+"""週・月・期間の一覧（日付ごとの振り分けと期日超過）"""
+from datetime import date
+
+import pytest
+from sqlite_backend import SQLiteTodoBackend
+from todo_backend import Todo, bucket_todos_by_date, month_range, week_range
+
+TODAY = date(2026, 1, 7)  # 水曜日
+# (タイトル, 期日, 完了)
+ENTRIES = [
+    ('前週のTodo', '2026-01-04', False),
+    ('月曜のTodo', '2026-01-05', False),
+    ('月曜の完了したTodo', '2026-01-05', True),
+    ('水曜のTodo', '2026-01-07', False),
+    ('日曜のTodo', '2026-01-11', False),
+    ('翌週のTodo', '2026-01-12', False),
+    ('2月末のTodo', '2026-02-28', False),
+]
+
+def add_entries(backend):
+    for title, due, completed in ENTRIES:
+        todo_id = backend.add_todo(title, '', due)
+        if completed:
+            backend.complete_todo(todo_id)
+
+def titles(result):
+    """get_todos_in_rangeの結果を（{日付: [タイトル, ...]}, [期日超過のタイトル, ...]）にする"""
+    days, overdue = result
+    return ({day.strftime('%Y-%m-%d'): [todo.title for todo in todos] for day, todos in days},
+            [todo.title for todo in overdue])
+
+@pytest.fixture
+def clock(monkeypatch):
+    """今日を2026-01-07に固定する"""
+    import app as app_module
+    import sheets_api
+    import sqlite_backend
+    for module in (app_module, sqlite_backend, sheets_api):
+        monkeypatch.setattr(module, 'get_jst_today', lambda: TODAY)
+
+@pytest.fixture
+def store(tmp_path, clock):
+    store = SQLiteTodoBackend(str(tmp_path / 'todos.db'))
+    add_entries(store)
+    return store
+
+@pytest.fixture
+def client(monkeypatch, tmp_path, store):
+    monkeypatch.setenv('TODO_BACKEND', 'sqlite')
+    monkeypatch.setenv('SQLITE_PATH', str(tmp_path / 'app.db'))
+    monkeypatch.setenv('METRICS_ENABLED', '0')
+    import app as app_module
+    from fragment_cache import FragmentCache
+    monkeypatch.setattr(app_module, 'backend', store)
+    monkeypatch.setattr(app_module, 'fragment_cache', FragmentCache())
+    return app_module.app.test_client()
+
+def test_week_and_month_ranges():
+    # 週は月曜〜日曜
+    assert week_range(TODAY) == (date(2026, 1, 5), date(2026, 1, 11))
+    assert week_range(date(2026, 1, 11)) == (date(2026, 1, 5), date(2026, 1, 11))
+    assert week_range(date(2026, 1, 1)) == (date(2025, 12, 29), date(2026, 1, 4))
+    assert month_range(2026, 2) == (date(2026, 2, 1), date(2026, 2, 28))
+    assert month_range(2028, 2) == (date(2028, 2, 1), date(2028, 2, 29))
+    assert month_range(2026, 12) == (date(2026, 12, 1), date(2026, 12, 31))
+
+def test_bucket_todos_by_date():
+    todos = [Todo.from_row([str(n), title, '', '', due, '', '', '完了' if completed else '未完了', ''])
+             for n, (title, due, completed) in enumerate(ENTRIES, start=1)]
+    todos.append(Todo.from_row(['99', '期日が不正なTodo', '', '', '2026/01/05', '', '', '未完了', '']))
+    days, overdue = titles(bucket_todos_by_date(todos, *week_range(TODAY), TODAY))
+    # 範囲のすべての日付を返し、Todoがない日は空のリスト
+    assert days == {
+        '2026-01-05': ['月曜のTodo', '月曜の完了したTodo'], '2026-01-06': [], '2026-01-07': ['水曜のTodo'],
+        '2026-01-08': [], '2026-01-09': [], '2026-01-10': [], '2026-01-11': ['日曜のTodo'],
+    }
+    # 期日超過は範囲に関係なく、今日より前の未完了のTodo（範囲内の日付にも重ねて入る）
+    assert overdue == ['前週のTodo', '月曜のTodo']
+
+def test_sheets_and_sqlite_agree(make_api, store):
+    api = make_api()
+    add_entries(api)
+    for start, end in [week_range(TODAY), month_range(2026, 2), (date(2026, 1, 1), date(2026, 3, 3))]:
+        assert titles(api.get_todos_in_range(start, end)) == titles(store.get_todos_in_range(start, end))
+
+def test_range_api(client):
+    data = client.get('/api/todos/range?from=2026-01-05&to=2026-01-11').get_json()
+    assert list(data['days']) == [f'2026-01-{day:02d}' for day in range(5, 12)]
+    assert [todo['title'] for todo in data['days']['2026-01-07']] == ['水曜のTodo']
+    assert [todo['title'] for todo in data['overdue']] == ['前週のTodo', '月曜のTodo']
+    # 逆順の期間と、RANGE_MAX_DAYS（62日）を超える期間は受け付けない
+    assert client.get('/api/todos/range?from=2026-01-11&to=2026-01-05').status_code == 400
+    assert client.get('/api/todos/range?from=2026-01-01&to=2026-03-03').status_code == 200
+    assert client.get('/api/todos/range?from=2026-01-01&to=2026-03-04').status_code == 400
+
+def test_week_and_month_pages(client):
+    week = client.get('/week/2026-01-09').get_data(as_text=True)
+    assert '2026年01月05日〜01月11日' in week
+    assert all(title in week for title in ['月曜のTodo', '月曜の完了したTodo', '水曜のTodo', '日曜のTodo'])
+    assert '翌週のTodo' not in week
+    assert client.get('/week').headers['Location'].endswith('/week/2026-01-05')
+    assert client.get('/week/2026-13-01').headers['Location'].endswith('/week')
+    
+    month = client.get('/month/2026-02').get_data(as_text=True)
+    assert '2026年02月' in month
+    assert '2月末のTodo' in month
+    assert '日曜のTodo' not in month
+    assert client.get('/month').headers['Location'].endswith('/month/2026-01')
+
+def test_range_page_swaps_and_limits_dates(client):
+    swapped = client.get('/range?from=2026-01-11&to=2026-01-05').get_data(as_text=True)
+    assert '2026年01月05日〜2026年01月11日' in swapped
+    # 一度に表示するのはRANGE_MAX_DAYS日まで
+    limited = client.get('/range?from=2026-01-01&to=2026-12-31').get_data(as_text=True)
+    assert '2026年01月01日〜2026年03月03日' in limited
+    assert '2月末のTodo' in limited
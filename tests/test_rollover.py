@@ -0,0 +1,103 @@
+"""日次の整理（未来用シートからの移動・アーカイブ・担当のワーカーの決定）"""
+from datetime import timedelta
+
+import pytest
+from conftest import sheet_rows
+from sheets_api import ROLLOVER_CLAIM_WINDOW
+from todo_backend import get_jst_today
+
+TODAY = get_jst_today()
+TODAY_STR = TODAY.strftime('%Y-%m-%d')
+YESTERDAY_STR = (TODAY - timedelta(days=1)).strftime('%Y-%m-%d')
+
+@pytest.fixture
+def archive_env(sheets_env):
+    sheets_env.setenv('SHEETS_ARCHIVE_AFTER_DAYS', '7')
+    return sheets_env
+
+def due_tomorrow(spreadsheet, count):
+    """期日が明日の行（日付が変わって移動の対象になった行）と明後日の行を未来用シートに置く。前者のIDを返す"""
+    rows = spreadsheet.sheet('Todos_Future').rows
+    moved_ids = []
+    for n in range(count + 1):
+        todo_id = str(100 + n)
+        due = (TODAY + timedelta(days=1 if n < count else 2)).strftime('%Y-%m-%d')
+        rows.append([todo_id, f'未来のTodo {n}', '', '', due, '2026-01-01 09:00:00', '', '未完了', ''])
+        if n < count:
+            moved_ids.append(todo_id)
+    return moved_ids
+
+def claim_rows(spreadsheet):
+    return [row[1:3] for row in spreadsheet.sheet('Todos_Rollover').rows[1:]]
+
+def test_rollover_moves_and_archives(make_api, spreadsheet, archive_env):
+    moved_ids = due_tomorrow(spreadsheet, 2)
+    # 前日までの整理で作成済みの担当の記録
+    spreadsheet.add_sheet('Todos_Rollover', [['種別', '日付', '担当', '日時'], ['rollover', YESTERDAY_STR, 'other', '']])
+    # 1月に完了したTodo（seed_spreadsheetでは3件に1件）のうち、通常のシートにあるもの
+    archived_ids = [todo_id for todo_id, row in sheet_rows(spreadsheet).items() if row[7] == '完了']
+    assert moved_ids and archived_ids
+    api = make_api()
+    api.get_all_todos()
+    calls = spreadsheet.calls['batch_update']
+    
+    assert api.rollover() == len(moved_ids) + len(archived_ids)
+    # 移動・アーカイブは1回のbatch_updateでまとめて行う
+    assert spreadsheet.calls['batch_update'] == calls + 1
+    todos, future = sheet_rows(spreadsheet), sheet_rows(spreadsheet, 'Todos_Future')
+    archive = sheet_rows(spreadsheet, 'Todos_Archive')
+    assert all(todo_id in todos and todo_id not in future for todo_id in moved_ids)
+    assert all(todo_id in archive and todo_id not in todos for todo_id in archived_ids)
+    assert list(future) == [str(100 + len(moved_ids))]
+    # スナップショットにもシートと同じ内容を反映する
+    assert [todo.id for todo in api.get_all_todos()] == [todo.id for todo in make_api().get_all_todos()]
+    assert api.rollover_stats['moved'] == len(moved_ids)
+    assert api.rollover_stats['archived'] == len(archived_ids)
+    assert api._rollover_date == TODAY
+
+def test_second_worker_is_skipped(make_api, spreadsheet):
+    moved_ids = due_tomorrow(spreadsheet, 1)
+    first = make_api()
+    second = make_api()
+    assert first.rollover() == 1
+    # 同じ日に後から担当を登録したワーカーは何もしない
+    assert second.rollover() == 0
+    assert second.rollover_stats['skipped'] == 1
+    assert second._rollover_date == TODAY
+    assert moved_ids[0] in sheet_rows(spreadsheet)
+    assert claim_rows(spreadsheet) == [[TODAY_STR, first._instance_token], [TODAY_STR, second._instance_token]]
+
+def test_claims_do_not_use_id_blocks(make_api, spreadsheet):
+    api = make_api()
+    for _ in range(2):
+        api.rollover()
+        make_api().rollover()
+    # 担当の行はTodos_Metaに追加しないため、IDは基準ID（20）の直後から払い出される
+    assert len(spreadsheet.sheet('Todos_Meta').rows) == 2
+    assert api.add_todo('整理の後に追加', '', TODAY_STR) == 21
+
+def test_claim_reads_only_todays_rows(make_api, spreadsheet, monkeypatch):
+    # 過去の日の担当の行が多数ある状態で、今日は他のワーカーがウィンドウ1つ分より多く登録済み
+    api = make_api()
+    worksheet = spreadsheet.add_sheet('Todos_Rollover', [['種別', '日付', '担当', '日時']], col_count=4)
+    worksheet.rows += [['rollover', YESTERDAY_STR, f'old{n}', ''] for n in range(100)]
+    worksheet.rows += [['rollover', TODAY_STR, f'other{n}', ''] for n in range(ROLLOVER_CLAIM_WINDOW + 5)]
+    api._rollover_worksheet = worksheet
+    ranges = []
+    get_values = worksheet.get_values
+    def recording_get_values(a1=None, **kwargs):
+        ranges.append(a1)
+        return get_values(a1, **kwargs)
+    monkeypatch.setattr(worksheet, 'get_values', recording_get_values)
+    
+    assert not api._claim_rollover(TODAY_STR)
+    # 追加した行から上へ、今日の最初の行（102行目）を含む範囲までしか読まない
+    last = 1 + 100 + ROLLOVER_CLAIM_WINDOW + 5 + 1
+    middle = last - ROLLOVER_CLAIM_WINDOW
+    assert ranges == [f'A{middle + 1}:C{last}', f'A{middle - ROLLOVER_CLAIM_WINDOW + 1}:C{middle}']
+    
+    # 今日の最初の登録なら、読むのは1回だけで担当になる
+    tomorrow_str = (TODAY + timedelta(days=1)).strftime('%Y-%m-%d')
+    ranges.clear()
+    assert api._claim_rollover(tomorrow_str)
+    assert len(ranges) == 1
@@ -0,0 +1,98 @@
+"""タイトル・内容の全文検索（search_index.SearchIndexと、書き込み後のSheetsAPIの検索インデックス）"""
+import pytest
+from conftest import sheet_rows
+from search_index import SearchIndex
+from sqlite_backend import SQLiteTodoBackend
+from todo_backend import get_jst_today
+
+TODAY = get_jst_today().strftime('%Y-%m-%d')
+
+@pytest.fixture
+def index():
+    index = SearchIndex()
+    index.add(1, '牛乳を買う', 'スーパーで')
+    index.add(2, 'Pythonの勉強', 'Flask tutorial')
+    index.add(3, 'ＡＰＩ設計レビュー', 'ｶﾀｶﾅ半角のメモ')
+    index.add(4, 'a', '')
+    return index
+
+def test_single_character_query(index):
+    # 1文字の語はbigramで絞り込めないため、登録済みの本文を順に調べる
+    assert index.search('牛') == {1}
+    assert index.search('a') == {2, 3, 4}
+    assert index.search('Ａ') == {2, 3, 4}
+    assert index.search('z') == set()
+    # 1文字の語と2文字以上の語の組み合わせ
+    assert index.search('a 設計') == {3}
+
+def test_mixed_japanese_and_ascii(index):
+    assert index.search('Pythonの') == {2}
+    assert index.search('python 勉強') == {2}
+    assert index.search('の勉') == {2}
+    assert index.search('flask TUTORIAL') == {2}
+    # 全角英数字・半角カナは正規化してから比べる
+    assert index.search('api設計') == {3}
+    assert index.search('カタカナ') == {3}
+    assert index.search('ＰＹＴＨＯＮ') == {2}
+    # bigramがすべて含まれていても、語として含まれていなければ除く
+    assert index.search('勉強の') == set()
+    # タイトルと内容をまたぐ語には一致しない
+    assert index.search('買うスーパー') == set()
+    assert index.search('') == set()
+    assert index.search('   ') == set()
+
+def test_add_remove_and_sync(index):
+    index.add(1, 'パンを買う', '')
+    assert index.search('牛乳') == set()
+    assert index.search('パン') == {1}
+    index.remove(2)
+    index.remove(2)
+    assert index.search('python') == set()
+    assert index.sync({1: ('パンを買う', ''), 3: ('API', ''), 5: ('新しいTodo', '')}) == 3
+    assert len(index) == 3
+    assert index.search('todo') == {5}
+    assert index.search('設計') == set()
+    assert index.sync({1: ('パンを買う', ''), 3: ('API', ''), 5: ('新しいTodo', '')}) == 0
+
+def search_ids(api, query):
+    return [todo.id for todo in api.search(query)]
+
+@pytest.mark.parametrize('write_behind', [False, True])
+def test_sheets_index_follows_writes(make_api, spreadsheet, write_behind):
+    api = make_api(write_behind=write_behind)
+    assert search_ids(api, 'todo 1') == search_ids(api, 'Todo 1')
+    assert api.search_stats['syncs'] == 1
+    
+    added = api.add_todo('牛乳とEggを買う', 'スーパー', TODAY)
+    api.update_todo(1, 'Pythonの勉強', '', TODAY)
+    api.complete_todo(2)
+    api.delete_todo(4)
+    # 書き込みはスナップショットと同時に検索インデックスにも反映する（作り直さない）
+    assert api._search_is_current()
+    assert search_ids(api, 'egg') == [added]
+    assert search_ids(api, '牛') == [added]
+    assert search_ids(api, 'python 勉強') == [1]
+    assert search_ids(api, 'Todo 1') == [10, 11, 12, 13, 14, 15, 16, 17, 18, 19]
+    assert search_ids(api, 'Todo 2') == [2, 12, 20]  # 完了にしたTodoも検索できる
+    assert 4 not in search_ids(api, 'Todo')
+    assert api.search_stats['syncs'] == 1
+
+def test_sheets_index_after_reload(make_api, spreadsheet):
+    api = make_api()
+    api.search('Todo')
+    # シートを直接編集してから取得し直すと、変わった行だけを登録し直す
+    spreadsheet.sheet('Todos').rows[3][1] = '直接編集した行'
+    api.invalidate_cache()
+    assert [todo.title for todo in api.search('直接')] == ['直接編集した行']
+    assert api.search_stats['syncs'] == 2
+    assert api.search_stats['synced_docs'] == 21
+    assert sheet_rows(spreadsheet)['3'][1] == '直接編集した行'
+
+def test_sqlite_search(tmp_path):
+    store = SQLiteTodoBackend(str(tmp_path / 'todos.db'))
+    first = store.add_todo('牛乳とEggを買う', 'スーパー', TODAY)
+    second = store.add_todo('ＡＰＩ設計', 'ｶﾀｶﾅ', TODAY)
+    assert [todo.id for todo in store.search('牛')] == [first]
+    assert [todo.id for todo in store.search('egg 買う')] == [first]
+    assert [todo.id for todo in store.search('api カタカナ')] == [second]
+    assert store.search('') == []
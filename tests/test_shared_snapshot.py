@@ -0,0 +1,97 @@
+"""ワーカー間で共有するスナップショット（SHEETS_SHARED_CACHE）と書き込み中のロック"""
+import threading
+
+import pytest
+from conftest import sheet_rows
+from todo_backend import get_jst_today
+
+TODAY = get_jst_today().strftime('%Y-%m-%d')
+
+@pytest.fixture
+def shared_path(sheets_env, tmp_path):
+    path = tmp_path / 'snapshot.json'
+    sheets_env.setenv('SHEETS_SHARED_CACHE', str(path))
+    return path
+
+def run_in_thread(func, *args):
+    """別のスレッドで実行する（終わるのを待たない）。(スレッド, 結果のリスト)を返す"""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(func(*args)), daemon=True)
+    thread.start()
+    return thread, result
+
+def test_write_in_one_worker_is_read_by_another(make_api, spreadsheet, shared_path):
+    first = make_api()
+    second = make_api()
+    first.get_all_todos()
+    second.get_all_todos()
+    reads = spreadsheet.calls['values_batch_get']
+    
+    added = first.add_todo('ワーカー1で追加', '', TODAY)
+    first.update_todo(1, 'ワーカー1で編集', '', TODAY)
+    # シートを読み直さず、公開されたスナップショットから読み取る
+    assert second.get_todo_by_id(added).title == 'ワーカー1で追加'
+    assert second.get_todo_by_id(1).title == 'ワーカー1で編集'
+    assert second.get_data_version() == first.get_data_version()
+    assert spreadsheet.calls['values_batch_get'] == reads
+    assert shared_path.exists()
+
+def test_row_numbers_after_delete_in_another_worker(make_api, spreadsheet, shared_path):
+    first = make_api()
+    second = make_api()
+    first.get_all_todos()
+    second.get_all_todos()
+    
+    # ワーカー2の削除で行番号が繰り上がった後も、ワーカー1は正しい行に書き込む
+    assert second.delete_todos([2, 5]) == 2
+    assert first.update_todo(10, '削除後に編集', '', TODAY)
+    assert first.complete_todo(11)
+    assert first.delete_todo(12)
+    rows = sheet_rows(spreadsheet)
+    assert '2' not in rows and '5' not in rows and '12' not in rows
+    assert rows['10'][1] == '削除後に編集'
+    assert rows['11'][7] == '完了'
+    assert rows['9'][1] == 'Todo 9' and rows['13'][1] == 'Todo 13'
+    
+    # どちらのワーカーのスナップショットもシートと同じ行の並びになっている
+    expected = [row[0] for row in spreadsheet.sheet('Todos').rows]
+    for api in (first, second):
+        assert [row[0] for row in api._get_snapshot()['Todos']] == expected
+        assert api._find_todo_row(13)[1] == expected.index('13') + 1
+
+@pytest.mark.parametrize('shared', [False, True])
+def test_reads_not_blocked_during_write(make_api, spreadsheet, sheets_env, tmp_path, monkeypatch, shared):
+    if shared:
+        sheets_env.setenv('SHEETS_SHARED_CACHE', str(tmp_path / 'snapshot.json'))
+    api = make_api()
+    api.get_all_todos()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    batch_update = spreadsheet.batch_update
+    def slow_batch_update(body):
+        calls.append(body)
+        started.set()
+        release.wait(10)
+        return batch_update(body)
+    monkeypatch.setattr(spreadsheet, 'batch_update', slow_batch_update)
+    
+    writer, _ = run_in_thread(api.complete_todo, 1)
+    assert started.wait(10)
+    try:
+        # シートへの書き込み中も、読み取りは待たずに書き込み前の内容を返す
+        reader, result = run_in_thread(api.get_todo_by_id, 1)
+        reader.join(5)
+        assert not reader.is_alive()
+        assert result[0].status == '未完了'
+        # 他の書き込みは、先の書き込みが終わるまで待つ
+        other, _ = run_in_thread(api.complete_todo, 2)
+        other.join(0.2)
+        assert other.is_alive() and len(calls) == 1
+    finally:
+        release.set()
+    writer.join(10)
+    other.join(10)
+    assert api.get_todo_by_id(1).status == '完了'
+    assert api.get_todo_by_id(2).status == '完了'
+    assert len(calls) == 2
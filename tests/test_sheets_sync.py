@@ -0,0 +1,139 @@
+"""SQLiteバックエンドとスプレッドシートの双方向同期（SQLITE_SYNC_WITH_SHEETS）"""
+import atexit
+from datetime import timedelta
+
+import pytest
+from conftest import sheet_rows
+from sqlite_backend import SQLiteTodoBackend
+from todo_backend import get_jst_today
+
+TODAY = get_jst_today().strftime('%Y-%m-%d')
+
+@pytest.fixture
+def store(tmp_path, make_api, spreadsheet):
+    """シートのTodo（20件）を一度同期し終えたSQLiteバックエンド"""
+    store = SQLiteTodoBackend(str(tmp_path / 'todos.db'))
+    store.enable_sync(make_api(), 3600)
+    atexit.unregister(store.shutdown)
+    assert store.syncer.sync_once()
+    return store
+
+def edit_sheet(spreadsheet, todo_id, **values):
+    """シートの行を直接編集する（列: title・updated_at・revision）"""
+    columns = {'title': 1, 'updated_at': 9, 'revision': 10}
+    for row in spreadsheet.sheet('Todos').rows:
+        if row and row[0] == str(todo_id):
+            row.extend([''] * (11 - len(row)))
+            for name, value in values.items():
+                row[columns[name]] = str(value)
+            return row
+    raise KeyError(todo_id)
+
+def delete_from_sheet(spreadsheet, todo_id):
+    rows = spreadsheet.sheet('Todos').rows
+    rows[:] = [row for row in rows if not row or row[0] != str(todo_id)]
+
+def test_initial_sync_pulls_everything(store, spreadsheet):
+    assert len(store.get_all_todos()) == 20
+    assert store.get_todo_by_id(7).title == 'Todo 7'
+    # 版のない行には同期時刻と版1を付ける（同期用の列がなければ追加する）
+    assert spreadsheet.calls['batch_update'] == 1
+    assert all(row[9] and row[10] == '1' for row in sheet_rows(spreadsheet).values())
+    assert spreadsheet.sheet('Todos').rows[0][9:] == ['更新日時', '版']
+    assert spreadsheet.sheet('Todos').col_count >= 11
+    # シートにもこちらにも変更がなければ書き込まない
+    assert store.syncer.sync_once()
+    assert spreadsheet.calls['batch_update'] == 1
+
+def test_pull_sheet_edit(store, spreadsheet):
+    edit_sheet(spreadsheet, 1, title='シートで編集')
+    version = store.get_data_version()
+    assert store.syncer.sync_once()
+    assert store.get_todo_by_id(1).title == 'シートで編集'
+    assert store.get_data_version() != version
+    # 手で編集された行には同期時刻と次の版を書き込む
+    assert sheet_rows(spreadsheet)['1'][10] == '2'
+
+def test_push_local_changes(store, spreadsheet):
+    store.update_todo(2, 'こちらで編集', '', TODAY)
+    future = (get_jst_today() + timedelta(days=5)).strftime('%Y-%m-%d')
+    added = store.add_todo('未来のTodo', '', future)
+    store.delete_todo(4)
+    assert store.syncer.sync_once()
+    rows = sheet_rows(spreadsheet)
+    assert rows['2'][1] == 'こちらで編集' and rows['2'][10] == '2'
+    assert '4' not in rows
+    # 期日に応じたワークシートに書き込む
+    assert sheet_rows(spreadsheet, 'Todos_Future')[str(added)][1] == '未来のTodo'
+    assert spreadsheet.calls['batch_update'] == 2
+
+@pytest.mark.parametrize('local_edits, sheet_revision, winner', [
+    (1, 5, 'シート'),   # シートの版のほうが新しい
+    (2, None, 'こちら'),  # 手での編集（版が上がっていない）は同期時の次の版として比べる
+    (1, None, 'シート'),  # 版が同じならシートを優先
+])
+def test_conflict_decided_by_revision(store, spreadsheet, local_edits, sheet_revision, winner):
+    for n in range(local_edits):
+        store.update_todo(3, f'こちら{n}', '', TODAY)
+    local_title = store.get_todo_by_id(3).title
+    if sheet_revision is None:
+        edit_sheet(spreadsheet, 3, title='シート')
+    else:
+        edit_sheet(spreadsheet, 3, title='シート', updated_at='2030-01-01 00:00:00', revision=sheet_revision)
+    assert store.syncer.sync_once()
+    assert store.syncer.stats['conflicts'] == 1
+    expected = 'シート' if winner == 'シート' else local_title
+    assert store.get_todo_by_id(3).title == expected
+    assert sheet_rows(spreadsheet)['3'][1] == expected
+
+def test_conflict_same_revision_decided_by_updated_at(store, spreadsheet):
+    store.update_todo(3, 'こちら', '', TODAY)
+    edit_sheet(spreadsheet, 3, title='シート', updated_at='2000-01-01 00:00:00', revision=2)
+    assert store.syncer.sync_once()
+    # 版が同じなら更新日時の新しいほう（こちら）を採用する
+    assert store.get_todo_by_id(3).title == 'こちら'
+    assert sheet_rows(spreadsheet)['3'][1] == 'こちら'
+
+def test_delete_versus_modify_keeps_modification(store, spreadsheet):
+    # シートで削除・こちらで変更
+    delete_from_sheet(spreadsheet, 5)
+    store.update_todo(5, 'こちらで変更', '', TODAY)
+    # シートで変更・こちらで削除
+    edit_sheet(spreadsheet, 7, title='シートで変更')
+    store.delete_todo(7)
+    assert store.syncer.sync_once()
+    assert store.syncer.stats['conflicts'] == 2
+    rows = sheet_rows(spreadsheet)
+    assert rows['5'][1] == 'こちらで変更'
+    assert store.get_todo_by_id(5).title == 'こちらで変更'
+    assert rows['7'][1] == 'シートで変更'
+    assert store.get_todo_by_id(7).title == 'シートで変更'
+    # 次の同期では何も変わらない
+    calls = spreadsheet.calls['batch_update']
+    assert store.syncer.sync_once()
+    assert spreadsheet.calls['batch_update'] == calls
+
+def test_delete_on_both_sides(store, spreadsheet):
+    delete_from_sheet(spreadsheet, 8)
+    store.delete_todo(8)
+    assert store.syncer.sync_once()
+    assert store.get_todo_by_id(8) is None
+    assert '8' not in sheet_rows(spreadsheet)
+
+def test_same_id_added_on_both_sides_is_reassigned(store, spreadsheet):
+    added = store.add_todo('こちらで追加', '', TODAY)
+    assert added == 21
+    spreadsheet.sheet('Todos').rows.append(['21', 'シートで追加', '', '', TODAY, '', '', '未完了', ''])
+    assert store.syncer.sync_once()
+    assert store.syncer.stats['reassigned'] == 1
+    # シートのTodoがIDを保ち、こちらのTodoには新しいIDを振り直して両方残す
+    assert store.get_todo_by_id(21).title == 'シートで追加'
+    assert store.get_todo_by_id(22).title == 'こちらで追加'
+    rows = sheet_rows(spreadsheet)
+    assert rows['21'][1] == 'シートで追加'
+    assert rows['22'][1] == 'こちらで追加'
+    assert [row[0] for row in spreadsheet.sheet('Todos').rows].count('21') == 1
+    # 振り直したIDで続けて編集できる
+    store.update_todo(22, 'こちらで追加（編集）', '', TODAY)
+    assert store.syncer.sync_once()
+    assert sheet_rows(spreadsheet)['22'][1] == 'こちらで追加（編集）'
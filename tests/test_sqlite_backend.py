@@ -0,0 +1,161 @@
+"""SQLiteバックエンド（TODO_BACKEND=sqlite）の読み書き・持越し・同期用の変更の記録"""
+import atexit
+import json
+import os
+import subprocess
+import sys
+from datetime import timedelta
+
+import gspread
+import pytest
+from conftest import ROOT_DIR, sheet_rows
+from sqlite_backend import SQLiteTodoBackend
+from todo_backend import get_jst_today
+
+TODAY = get_jst_today()
+
+def day(offset):
+    return (TODAY + timedelta(days=offset)).strftime('%Y-%m-%d')
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteTodoBackend(str(tmp_path / 'todos.db'))
+
+def dirty_ids(store):
+    return {row[0] for row in store._connect().execute('SELECT todo_id FROM sync_dirty')}
+
+def test_crud(store):
+    version = store.get_data_version()
+    todo_id = store.add_todo('買い物', '牛乳', day(0))
+    assert store.get_data_version() != version
+    todo = store.get_todo_by_id(todo_id)
+    assert (todo.title, todo.content, todo.due_date, todo.status) == ('買い物', '牛乳', day(0), '未完了')
+    assert todo.day_of_week == store._get_day_of_week(day(0))
+    
+    assert store.update_todo(todo_id, '買い物（編集）', '', day(1))
+    todo = store.get_todo_by_id(todo_id)
+    assert (todo.title, todo.due_date) == ('買い物（編集）', day(1))
+    assert [todo.id for todo in store.get_all_todos(day(1))] == [todo_id]
+    
+    assert store.complete_todo(todo_id)
+    todo = store.get_todo_by_id(todo_id)
+    assert todo.status == '完了' and todo.completed_at
+    
+    assert store.delete_todo(todo_id)
+    assert store.get_todo_by_id(todo_id) is None
+    assert not store.delete_todo(todo_id)
+    assert not store.update_todo(todo_id, '存在しない', '', day(0))
+
+def test_changes_are_visible_to_other_connections(store):
+    """別のプロセス（別の接続）からの書き込みもバージョンと読み取りに反映される"""
+    other = SQLiteTodoBackend(store.path)
+    version = store.get_data_version()
+    todo_id = other.add_todo('別の接続から追加', '', day(0))
+    assert store.get_data_version() != version
+    assert store.get_todo_by_id(todo_id).title == '別の接続から追加'
+
+def test_carryover(store):
+    overdue = store.add_todo('期日超過', '', day(-2))
+    done = store.add_todo('完了済み', '', day(-1))
+    store.complete_todo(done)
+    today = store.add_todo('今日', '', day(0))
+    assert [todo.id for todo in store.get_overdue_todos()] == [overdue]
+    
+    # 期日超過の未完了のTodoだけを明日に持越す
+    assert store.carryover_overdue_todos() == 1
+    assert store.get_todo_by_id(overdue).due_date == day(1)
+    assert store.get_todo_by_id(done).due_date == day(-1)
+    assert not store.get_overdue_todos()
+    
+    assert store.carryover_todos([today, overdue], day(3)) == 2
+    assert [todo.id for todo in store.get_all_todos(day(3))] == [overdue, today]
+    days, overdue_todos = store.get_todos_in_range(TODAY, TODAY + timedelta(days=6))
+    assert [todo.id for todo in dict(days)[TODAY + timedelta(days=3)]] == [overdue, today]
+    assert not overdue_todos
+
+def test_changes_not_recorded_without_sync(store):
+    todo_id = store.add_todo('同期なし', '', day(0))
+    store.update_todo(todo_id, '同期なし（編集）', '', day(0))
+    assert not dirty_ids(store)
+
+def test_dirty_tracking(store, make_api, spreadsheet):
+    existing = store.add_todo('同期前から', '', day(0))
+    store.enable_sync(make_api(), 3600)
+    atexit.unregister(store.shutdown)
+    # 初めて同期する場合は既存のTodoをすべて書き込み対象にする
+    assert dirty_ids(store) == {existing}
+    
+    assert store.syncer.sync_once()
+    assert not dirty_ids(store)
+    base = {row[0]: json.loads(row[1]) for row in store._connect().execute('SELECT todo_id, row FROM sync_base')}
+    assert len(base) == 21
+    
+    store.update_todo(3, 'こちらで編集', '', day(0))
+    added = store.add_todo('こちらで追加', '', day(0))
+    store.delete_todo(5)
+    assert dirty_ids(store) == {3, added, 5}
+    assert store.syncer.get_stats()['pending'] == 3
+    
+    assert store.syncer.sync_once()
+    assert not dirty_ids(store)
+    rows = sheet_rows(spreadsheet)
+    assert rows['3'][1] == 'こちらで編集'
+    assert rows[str(added)][1] == 'こちらで追加'
+    assert '5' not in rows
+    # 同期した行は次回の比較の基準になる（版はこちらで変更するたびに上がる）
+    row = json.loads(store._connect().execute('SELECT row FROM sync_base WHERE todo_id = 3').fetchone()[0])
+    assert row[1] == 'こちらで編集' and row[10] == '2'
+    assert store._connect().execute('SELECT 1 FROM sync_base WHERE todo_id = 5').fetchone() is None
+
+def test_sqlite_app_does_not_need_gspread(tmp_path):
+    """SQLiteバックエンドだけならgspread・google-authがなくても起動できる"""
+    script = (
+        "import sys\n"
+        "for name in ('gspread', 'google', 'google.oauth2', 'google.oauth2.service_account'):\n"
+        "    sys.modules[name] = None\n"
+        "import app\n"
+        "app.backend.add_todo('gspreadなし', '', '2030-01-01')\n"
+        "assert 'sheets_api' not in sys.modules\n"
+    )
+    env = dict(os.environ, TODO_BACKEND='sqlite', SQLITE_PATH=str(tmp_path / 'todos.db'), METRICS_ENABLED='0')
+    result = subprocess.run([sys.executable, '-c', script], cwd=ROOT_DIR, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+@pytest.fixture
+def exporter(make_api, spreadsheet):
+    """書き出し先のSheetsAPI（シートにはTodoが20件ある）"""
+    return make_api(write_behind=True)
+
+def test_seed_import_runs_in_background(tmp_path, exporter, spreadsheet):
+    # 空のファイルで起動しても、起動時にはスプレッドシートに接続しない
+    store = SQLiteTodoBackend(str(tmp_path / 'todos.db'), exporter=exporter)
+    assert sum(spreadsheet.calls.values()) == 0
+    assert store.get_all_todos() == []
+    store.connect_in_background().join()
+    assert len(store.get_all_todos()) == 20
+    assert store.get_todo_by_id(7).title == 'Todo 7'
+    # 取り込みは一度だけ（別のプロセスが同じファイルを開いても取り込み直さない）
+    other = SQLiteTodoBackend(store.path, exporter=exporter)
+    assert other._seeded
+    assert store.add_todo('取り込み後に追加', '', day(0)) == 21
+
+def test_add_waits_for_seed_import(tmp_path, exporter, spreadsheet):
+    store = SQLiteTodoBackend(str(tmp_path / 'todos.db'), exporter=exporter)
+    # 取り込みが終わる前の追加は、先に取り込んでからシートのIDと重ならないIDで追加する
+    assert store.add_todo('取り込み前に追加', '', day(0)) == 21
+    assert len(store.get_all_todos()) == 21
+
+def test_starts_when_sheets_unreachable(tmp_path, exporter, spreadsheet):
+    # Googleが429を返し続ける（再試行しない）
+    spreadsheet.quota_error_rate = 1.0
+    exporter.retry_attempts = 1
+    store = SQLiteTodoBackend(str(tmp_path / 'todos.db'), exporter=exporter)
+    store.connect_in_background().join()
+    # 取り込めない間も読み取りはでき、追加は取り込めるまで行わない
+    assert store.get_all_todos() == []
+    with pytest.raises(gspread.exceptions.APIError):
+        store.add_todo('取り込めない間に追加', '', day(0))
+    assert store.get_all_todos() == []
+    spreadsheet.quota_error_rate = 0.0
+    assert store.add_todo('接続できてから追加', '', day(0)) == 21
+    assert len(store.get_all_todos()) == 21
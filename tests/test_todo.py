@@ -0,0 +1,14 @@
+"""Todo（シートの行の変換と比較）"""
+from todo_backend import Todo
+
+ROW = ['7', '買い物', '牛乳', '土', '2026-01-03', '2026-01-01 09:00:00', '', '未完了', '']
+
+def test_equal_todos_have_equal_hashes():
+    todo, same = Todo.from_row(ROW), Todo.from_row(list(ROW))
+    assert todo == same and hash(todo) == hash(same)
+    assert len({todo, same}) == 1
+    assert {todo: 'a'}[same] == 'a'
+    # 内容が違えば、同じIDでも別のTodo
+    edited = Todo.from_row(ROW[:1] + ['買い物（編集）'] + ROW[2:])
+    assert edited != todo
+    assert len({todo, edited}) == 2
@@ -0,0 +1,104 @@
+"""Todoのインポート（CSV・NDJSONの読み込み、読み飛ばした行の報告）"""
+import io
+
+import pytest
+from sqlite_backend import SQLiteTodoBackend
+from todo_transfer import MAX_REPORTED_ERRORS, ImportReader, export_todos, normalize_record
+
+# シートと同じ日本語の見出しのCSV（表計算ソフトで保存した、BOM付き・YYYY/M/Dの期日）
+SHEET_CSV = (
+    '\ufeffID,タイトル,内容,曜日,期日,作成日時,完了日時,状態,対象日\r\n'
+    '7,買い物,"牛乳, 卵",土,2026/1/3,2026-01-01 09:00:00,,未完了,\r\n'
+    '8,掃除,,日,2026-01-04,2026-01-01 09:00:00,2026-01-04 10:00:00,完了,\r\n'
+    '9,,タイトルなし,,2026-01-05,,,,\r\n'
+    '10,期日が不正,,,2026-13-01,,,,\r\n'
+    '11,期日なし,,,,,,,\r\n'
+)
+
+def read(text, fmt):
+    reader = ImportReader(io.StringIO(text, newline=''), fmt)
+    return reader, list(reader)
+
+def test_csv_with_sheet_headers():
+    reader, records = read(SHEET_CSV, 'csv')
+    # IDや曜日の列は読まず、期日はYYYY-MM-DDにそろえる
+    assert records == [
+        {'title': '買い物', 'content': '牛乳, 卵', 'due_date': '2026-01-03', 'created_at': '2026-01-01 09:00:00',
+         'completed_at': '', 'status': '未完了'},
+        {'title': '掃除', 'content': '', 'due_date': '2026-01-04', 'created_at': '2026-01-01 09:00:00',
+         'completed_at': '2026-01-04 10:00:00', 'status': '完了'},
+        {'title': '期日なし', 'content': '', 'due_date': '', 'created_at': '', 'completed_at': '', 'status': '未完了'},
+    ]
+    # 読み飛ばした行は、見出しを1行目とした行番号と理由を報告する
+    assert reader.skipped == 2
+    assert reader.errors == [(4, 'タイトルがありません'), (5, '期日の形式が正しくありません: 2026-13-01')]
+
+def test_ndjson_skips_unreadable_lines():
+    text = ('{"title": "最初", "due_date": "2026/12/1", "status": "done"}\n'
+            '\n'
+            '{"title": "閉じていない"\n'
+            '["配列"]\n'
+            '{"title": "  ", "due_date": "2026-01-01"}\n'
+            '{"id": 99, "title": "最後", "target_date": "2026-01-01"}\n')
+    reader, records = read(text, 'ndjson')
+    assert records == [
+        {'title': '最初', 'due_date': '2026-12-01', 'status': '完了'},
+        {'title': '最後', 'due_date': '', 'status': '未完了'},
+    ]
+    # 空行は数えずに読み飛ばす
+    assert reader.skipped == 3
+    assert [line_number for line_number, _ in reader.errors] == [3, 4, 5]
+    assert reader.errors[0][1].startswith('JSONとして読めません')
+    assert reader.errors[1][1] == 'JSONのオブジェクトではありません'
+
+def test_reported_errors_are_limited():
+    reader, records = read('{"title": ""}\n' * (MAX_REPORTED_ERRORS + 5) + '{"title": "残り"}\n', 'ndjson')
+    assert [record['title'] for record in records] == ['残り']
+    assert reader.skipped == MAX_REPORTED_ERRORS + 5
+    assert len(reader.errors) == MAX_REPORTED_ERRORS
+
+def test_normalize_record():
+    assert normalize_record({'タイトル': ' 前後の空白 ', '状態': 'completed', None: ['余分な列']}) == {
+        'title': '前後の空白', 'due_date': '', 'status': '完了'}
+    with pytest.raises(ValueError):
+        normalize_record({'title': '期日が不正', 'due_date': '1月3日'})
+    with pytest.raises(ValueError):
+        ImportReader(io.StringIO(''), 'xlsx')
+
+def test_export_then_import(tmp_path):
+    source = SQLiteTodoBackend(str(tmp_path / 'source.db'))
+    source.add_todo('買い物', '牛乳\n卵', '2026-01-03')
+    source.complete_todo(source.add_todo('掃除', '', '2026-01-04'))
+    target = SQLiteTodoBackend(str(tmp_path / 'target.db'))
+    for fmt in ['csv', 'ndjson']:
+        text = ''.join(export_todos(source.iter_todos(), fmt))
+        reader = ImportReader(io.StringIO(text, newline=''), fmt)
+        assert target.import_todos(reader, chunk_size=1) == 2
+        assert reader.skipped == 0
+    imported = target.get_all_todos()
+    assert [(todo.title, todo.content, todo.due_date, todo.status) for todo in imported] == [
+        ('買い物', '牛乳\n卵', '2026-01-03', '未完了'), ('買い物', '牛乳\n卵', '2026-01-03', '未完了'),
+        ('掃除', '', '2026-01-04', '完了'), ('掃除', '', '2026-01-04', '完了'),
+    ]
+    # インポートしたTodoには新しいIDを払い出す
+    assert len({todo.id for todo in imported}) == 4
+
+def test_import_route_reports_skipped(monkeypatch, tmp_path):
+    monkeypatch.setenv('TODO_BACKEND', 'sqlite')
+    monkeypatch.setenv('SQLITE_PATH', str(tmp_path / 'app.db'))
+    monkeypatch.setenv('METRICS_ENABLED', '0')
+    import app as app_module
+    store = SQLiteTodoBackend(str(tmp_path / 'todos.db'))
+    monkeypatch.setattr(app_module, 'backend', store)
+    client = app_module.app.test_client()
+    response = client.post('/import', data={'file': (io.BytesIO(SHEET_CSV.encode('utf-8')), 'todos.csv')})
+    assert response.get_json() == {
+        'imported': 3, 'skipped': 2,
+        'errors': [{'line': 4, 'reason': 'タイトルがありません'},
+                   {'line': 5, 'reason': '期日の形式が正しくありません: 2026-13-01'}],
+    }
+    assert {todo.title for todo in store.get_all_todos()} == {'買い物', '掃除', '期日なし'}
+    # UTF-8以外のファイルは読まない
+    response = client.post('/import?format=csv', data='タイトル\r\n買い物\r\n'.encode('shift_jis'),
+                           content_type='text/csv')
+    assert response.status_code == 400
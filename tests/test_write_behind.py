@@ -0,0 +1,167 @@
+"""書き込みの遅延反映（SHEETS_WRITE_BEHIND）のキュー・ジャーナル・再試行"""
+import json
+import os
+
+import pytest
+from conftest import sheet_rows
+from todo_backend import get_jst_today
+
+TODAY = get_jst_today().strftime('%Y-%m-%d')
+
+def read_journal(api):
+    with open(api.write_behind_journal, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def kill(api):
+    """プロセスが落ちた状態にする（バックグラウンドの書き込みを止め、未書き込みの変更はそのまま残す）"""
+    api._flush_stop.set()
+    api._flush_thread.join()
+    api._flush_thread = None
+
+def test_queue_merges_and_cancels(make_api, spreadsheet):
+    api = make_api(write_behind=True)
+    kept = api.add_todo('残す', '', TODAY)
+    api.update_todo(kept, '残す（編集）', '', TODAY)
+    dropped = api.add_todo('すぐ消す', '', TODAY)
+    api.delete_todo(dropped)
+    # 同じIDの変更は1つにまとまり、追加してから削除したTodoはシートに書き込まない
+    assert list(api._pending_ops) == [str(kept)]
+    assert api._pending_ops[str(kept)]['row'][1] == '残す（編集）'
+    assert api.write_behind_stats['cancelled'] == 1
+    assert spreadsheet.calls['batch_update'] == 0
+    
+    assert api.flush_writes() == 1
+    rows = sheet_rows(spreadsheet)
+    assert rows[str(kept)][1] == '残す（編集）'
+    assert str(dropped) not in rows
+    assert spreadsheet.calls['batch_update'] == 1
+
+def test_replay_journal_after_kill(make_api, spreadsheet):
+    api = make_api(write_behind=True)
+    added = api.add_todo('落ちる前に追加', '', TODAY)
+    api.complete_todo(1)
+    api.delete_todo(2)
+    kill(api)
+    # 書き込み途中で落ちた最終行は読み飛ばす
+    with open(api.write_behind_journal, 'a', encoding='utf-8') as f:
+        f.write('{"id": "4", "op": {"act')
+    assert str(added) not in sheet_rows(spreadsheet)
+    
+    restarted = make_api(write_behind=True)
+    assert list(restarted._pending_ops) == [str(added), '1', '2']
+    # 書き込む前から、再起動後の読み取りには未書き込みの変更が反映されている
+    assert restarted.get_todo_by_id(added).title == '落ちる前に追加'
+    assert restarted.get_todo_by_id(1).status == '完了'
+    assert restarted.get_todo_by_id(2) is None
+    assert restarted.get_todo_by_id(4).status == '未完了'
+    
+    assert restarted.flush_writes() == 3
+    rows = sheet_rows(spreadsheet)
+    assert rows[str(added)][1] == '落ちる前に追加'
+    assert rows['1'][7] == '完了'
+    assert '2' not in rows
+    assert not os.path.exists(restarted.write_behind_journal)
+
+def test_replay_skips_ops_already_written(make_api, spreadsheet):
+    """書き込んだ後、ジャーナルを書き直す前に落ちた場合も、同じ変更を重ねて書き込まない"""
+    api = make_api(write_behind=True)
+    added = api.add_todo('二重に追加しない', '', TODAY)
+    api.delete_todo(4)
+    kill(api)
+    with open(api.write_behind_journal, encoding='utf-8') as f:
+        journal = f.read()
+    api.flush_writes()
+    with open(api.write_behind_journal, 'w', encoding='utf-8') as f:
+        f.write(journal)
+    
+    restarted = make_api(write_behind=True)
+    restarted.flush_writes()
+    rows = sheet_rows(spreadsheet)
+    assert [row[0] for row in spreadsheet.sheet('Todos').rows].count(str(added)) == 1
+    assert '4' not in rows and '5' in rows
+
+def test_failed_flush_requeues(make_api, spreadsheet, monkeypatch):
+    api = make_api(write_behind=True)
+    api.update_todo(1, '1回目', '', TODAY)
+    added = api.add_todo('追加', '', TODAY)
+    batch_update = spreadsheet.batch_update
+    def fail(body):
+        # 書き込み中に積まれた変更は、戻したキューで書き込み中だった変更より優先される
+        api.update_todo(1, '書き込み中に編集', '', TODAY)
+        raise RuntimeError('書き込みに失敗')
+    monkeypatch.setattr(spreadsheet, 'batch_update', fail)
+    
+    assert api.flush_writes() == 0
+    assert api.write_behind_stats['flush_errors'] == 1
+    assert not api._inflight_ops
+    assert set(api._pending_ops) == {'1', str(added)}
+    assert api._pending_ops['1']['row'][1] == '書き込み中に編集'
+    assert sheet_rows(spreadsheet)['1'][1] == 'Todo 1'
+    # 失敗した変更はジャーナルに残っている
+    assert {entry['id'] for entry in read_journal(api)} >= {'1', str(added)}
+    
+    monkeypatch.setattr(spreadsheet, 'batch_update', batch_update)
+    assert api.flush_writes() == 2
+    rows = sheet_rows(spreadsheet)
+    assert rows['1'][1] == '書き込み中に編集'
+    assert rows[str(added)][1] == '追加'
+    assert not api._pending_ops
+
+def test_journal_removed_only_after_successful_write(make_api, spreadsheet, monkeypatch):
+    api = make_api(write_behind=True)
+    api.complete_todo(1)
+    batch_update = spreadsheet.batch_update
+    seen = []
+    def check_journal(body):
+        # batch_updateが終わるまではジャーナルが残っている
+        seen.append([entry['id'] for entry in read_journal(api)])
+        return batch_update(body)
+    monkeypatch.setattr(spreadsheet, 'batch_update', check_journal)
+    
+    assert api.flush_writes() == 1
+    assert seen == [['1']]
+    assert not os.path.exists(api.write_behind_journal)
+
+def test_journal_kept_when_write_fails(make_api, spreadsheet, monkeypatch):
+    api = make_api(write_behind=True)
+    api.complete_todo(1)
+    def fail(body):
+        raise RuntimeError('書き込みに失敗')
+    monkeypatch.setattr(spreadsheet, 'batch_update', fail)
+    
+    assert api.flush_writes() == 0
+    assert [entry['id'] for entry in read_journal(api)] == ['1']
+    
+    # 書き込めないまま終了しても、次の起動で読み込める
+    restarted = make_api(write_behind=True)
+    assert list(restarted._pending_ops) == ['1']
+
+@pytest.mark.parametrize('count', [1, 30])
+def test_shutdown_flushes_everything(make_api, spreadsheet, count):
+    api = make_api(write_behind=True)
+    added = [api.add_todo(f'終了前 {i}', '', TODAY) for i in range(count)]
+    api.shutdown()
+    rows = sheet_rows(spreadsheet)
+    assert all(str(todo_id) in rows for todo_id in added)
+    assert not os.path.exists(api.write_behind_journal)
+    assert spreadsheet.calls['batch_update'] == 1
+
+def test_flush_retries_quota_errors(make_api, spreadsheet):
+    api = make_api(write_behind=True)
+    added = [api.add_todo(f'クォータ超過 {i}', '', TODAY) for i in range(5)]
+    api.complete_todo(1)
+    # 429が続くと再試行してから諦め、変更はキューに戻す
+    spreadsheet.quota_error_rate = 1.0
+    assert api.flush_writes() == 0
+    assert sum(spreadsheet.errors.values()) == api.retry_attempts
+    assert sum(stats['retries'] for stats in api.get_api_stats()['methods'].values()) == api.retry_attempts - 1
+    assert spreadsheet.calls['batch_update'] == 0
+    assert len(api._pending_ops) == 6
+    # 回復した後の書き込みでは、まとめた変更を1回だけ書き込む
+    spreadsheet.quota_error_rate = 0.0
+    assert api.flush_writes() == 6
+    ids = [row[0] for row in spreadsheet.sheet('Todos').rows]
+    assert all(ids.count(str(todo_id)) == 1 for todo_id in added)
+    assert sheet_rows(spreadsheet)['1'][7] == '完了'
+    assert spreadsheet.calls['batch_update'] == 1
+    assert not api._pending_ops
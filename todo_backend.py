@@ -0,0 +1,322 @@
+import os
+from datetime import datetime, timedelta
+from functools import lru_cache
+import pytz
+
+# 日本時間（JST）のタイムゾーン
+JST = pytz.timezone('Asia/Tokyo')
+
+# Todoの項目（スプレッドシートの列・SQLiteの列と同じ順序）
+TODO_FIELDS = ('id', 'title', 'content', 'day_of_week', 'due_date', 'created_at', 'completed_at', 'status', 'target_date')
+
+# Todo用ワークシートの列構成（エクスポート・インポートの列名にも使う）
+HEADERS = ['ID', 'タイトル', '内容', '曜日', '期日', '作成日時', '完了日時', '状態', '対象日']
+
+def get_jst_now():
+    """現在の日本時間を取得"""
+    return datetime.now(JST)
+
+def get_jst_today():
+    """今日の日付を日本時間で取得"""
+    return get_jst_now().date()
+
+class SheetsUnavailableError(Exception):
+    """Google Sheetsへの呼び出しを一時的に止めている（サーキットブレーカーが開いている）"""
+    def __init__(self, retry_after):
+        super().__init__(f"Google Sheetsに接続できないため、呼び出しを停止しています（約{max(1, round(retry_after))}秒後に再開）")
+        self.retry_after = retry_after
+
+@lru_cache(maxsize=4096)
+def parse_date(date_str):
+    """YYYY-MM-DD形式の文字列を日付に変換（形式が正しくなければNone）。同じ文字列は一度だけ変換する"""
+    try:
+        return datetime.strptime(date_str, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+class Todo:
+    """Todo 1件（行から一度だけ変換し、読み取り専用として使い回す）
+    
+    期日は表示用の文字列（due_date）に加えて日付（due、形式が正しくなければNone）も持ち、
+    状態は完了したかどうか（completed）で持つ。テンプレートからは属性で、
+    既存のコードからはdictと同じようにtodo['title']・todo.get('due_date')でも参照できる。
+    """
+    __slots__ = ('id', 'title', 'content', 'day_of_week', 'due_date', 'created_at', 'completed_at', 'completed',
+                 'target_date', 'due')
+    
+    def __init__(self, id, title='', content='', day_of_week='', due_date='', created_at='', completed_at='',
+                 status='未完了', target_date=''):
+        self.id = id
+        self.title = title
+        self.content = content
+        self.day_of_week = day_of_week
+        self.due_date = due_date
+        self.created_at = created_at
+        self.completed_at = completed_at
+        self.completed = status == '完了'
+        self.target_date = target_date  # 互換性のため保持
+        self.due = parse_date(due_date) if due_date else None
+    
+    @classmethod
+    def from_row(cls, row):
+        """シートの行（またはSQLiteの行）をTodoに変換（足りない列は既定値）"""
+        n = len(row)
+        return cls(
+            int(row[0]),
+            row[1] if n > 1 else '',
+            row[2] if n > 2 else '',
+            row[3] if n > 3 else '',
+            row[4].strip() if n > 4 else '',
+            row[5] if n > 5 else '',
+            row[6] if n > 6 else '',
+            row[7] if n > 7 else '未完了',
+            row[8] if n > 8 else ''
+        )
+    
+    @property
+    def status(self):
+        return '完了' if self.completed else '未完了'
+    
+    def __getitem__(self, key):
+        if key not in TODO_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+    
+    def get(self, key, default=None):
+        return getattr(self, key) if key in TODO_FIELDS else default
+    
+    def keys(self):
+        return TODO_FIELDS
+    
+    def to_dict(self):
+        """JSON用のdict（以前のTodoのdictと同じキー）"""
+        return {key: getattr(self, key) for key in TODO_FIELDS}
+    
+    def __eq__(self, other):
+        return isinstance(other, Todo) and self.to_dict() == other.to_dict()
+    
+    def __hash__(self):
+        # 等しいTodoはIDも等しいため、IDだけで求める（setやdictのキーに使えるように）
+        return hash(self.id)
+    
+    def __repr__(self):
+        return f"Todo({self.to_dict()!r})"
+
+def week_range(day):
+    """dayを含む週（月曜〜日曜）の最初と最後の日付"""
+    start = day - timedelta(days=day.weekday())
+    return start, start + timedelta(days=6)
+
+def month_range(year, month):
+    """year年month月の最初と最後の日付"""
+    start = datetime(year, month, 1).date()
+    next_month = datetime(year + month // 12, month % 12 + 1, 1).date()
+    return start, next_month - timedelta(days=1)
+
+def bucket_todos_by_date(todos, start_date, end_date, today):
+    """期日順のTodoを、start_date〜end_dateの日付ごとと期日超過（todayより前の未完了）に振り分ける
+    
+    戻り値: ([(日付, [Todo, ...]), ...]（範囲のすべての日付、Todoがない日は空のリスト）, 期日超過のTodoのリスト)
+    """
+    days = {start_date + timedelta(days=n): [] for n in range((end_date - start_date).days + 1)}
+    overdue = []
+    for todo in todos:
+        if todo.due is None:
+            continue
+        day_todos = days.get(todo.due)
+        if day_todos is not None:
+            day_todos.append(todo)
+        if todo.due < today and not todo.completed:
+            overdue.append(todo)
+    overdue.sort(key=lambda todo: todo.due)
+    return list(days.items()), overdue
+
+def chunked(iterable, size):
+    """iterableをsize件ずつのリストに分けて順に返す（全体をメモリに読み込まない）"""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+class TodoBackend:
+    """Todoの保存先（バックエンド）の共通インターフェース
+    
+    app.pyはこのメソッドだけを使う。Todoの読み取りはTodo（TODO_FIELDSの項目を持つ）で返す:
+      id, title, content, day_of_week, due_date, created_at, completed_at, status, target_date
+    期日・日時はYYYY-MM-DD（HH:MM:SS）形式の文字列、状態は「未完了」または「完了」。
+    返したTodoは他のリクエストと共有することがあるため、変更しないこと。
+    """
+    _change_listeners = ()  # add_change_listenerで登録した関数
+    
+    def get_all_todos(self, due_date_filter=None):
+        """すべてのTodoを取得（期日でフィルタリング可能、期日順）"""
+        raise NotImplementedError
+    
+    def get_overdue_todos(self):
+        """期日が過ぎている未完了のTodoを取得（期日の古い順）"""
+        raise NotImplementedError
+    
+    def get_todos_in_range(self, start_date, end_date):
+        """期日がstart_date〜end_dateのTodoを日付ごとに、期日が過ぎている未完了のTodoと一緒に取得
+        
+        1回の読み取りでまとめて求める。戻り値はbucket_todos_by_dateと同じ
+        （[(日付, [Todo, ...]), ...]（範囲のすべての日付）, 期日超過のTodoのリスト（期日の古い順））。
+        """
+        raise NotImplementedError
+    
+    def get_todo_by_id(self, todo_id):
+        """IDでTodoを取得（なければNone）"""
+        raise NotImplementedError
+    
+    def search(self, query):
+        """タイトル・内容に検索語を含むTodoを取得（空白で区切った語はすべて含むもの、期日順）"""
+        raise NotImplementedError
+    
+    def add_todo(self, title, content, due_date):
+        """Todoを追加し、IDを返す"""
+        raise NotImplementedError
+    
+    def iter_todos(self):
+        """すべてのTodoを順に返す（エクスポート用、順序は保存先の並び）"""
+        return iter(self.get_all_todos())
+    
+    def import_todos(self, records, chunk_size=500):
+        """Todoをまとめて追加し、追加した件数を返す
+        
+        recordsはtitle・content・due_date（省略可能なstatus・created_at・completed_at）を持つdictのiterableで、
+        順に読み込みながらchunk_size件ずつ書き込む。IDは新しく払い出す。
+        """
+        raise NotImplementedError
+    
+    def update_todo(self, todo_id, title, content, due_date):
+        """Todoを更新（見つからなければFalse）"""
+        raise NotImplementedError
+    
+    def complete_todos(self, todo_ids):
+        """複数のTodoをまとめて完了にする。完了にした件数を返す"""
+        raise NotImplementedError
+    
+    def carryover_todos(self, todo_ids, new_due_date):
+        """複数のTodoの期日をまとめて更新する。更新した件数を返す"""
+        raise NotImplementedError
+    
+    def carryover_overdue_todos(self, new_due_date=None):
+        """期日が過ぎている未完了のTodoをすべて持越す。持越した件数を返す"""
+        raise NotImplementedError
+    
+    def delete_todos(self, todo_ids):
+        """複数のTodoをまとめて削除する。削除した件数を返す"""
+        raise NotImplementedError
+    
+    def get_data_version(self):
+        """データのバージョン文字列を取得（内容が変わるたびに変わる。ETag用）"""
+        raise NotImplementedError
+    
+    def complete_todo(self, todo_id):
+        """Todoを完了にする"""
+        return self.complete_todos([todo_id]) > 0
+    
+    def carryover_todo(self, todo_id, new_due_date):
+        """Todoを次の日に持越す（期日を更新）"""
+        return self.carryover_todos([todo_id], new_due_date) > 0
+    
+    def delete_todo(self, todo_id):
+        """Todoを削除"""
+        return self.delete_todos([todo_id]) > 0
+    
+    def add_change_listener(self, listener):
+        """Todoの変更を受け取る関数を登録する（listener([(変更前のTodoまたはNone, 変更後のTodoまたはNone), ...])）
+        
+        このプロセスでの書き込みのほか、保存先で検出できた外部からの変更（シートの直接編集など）も通知する。
+        listenerは書き込みの処理中に呼ばれるため、時間のかかる処理をしないこと。
+        """
+        self._change_listeners = self._change_listeners + (listener,)
+    
+    def _notify_changes(self, changes):
+        """登録された関数に変更を通知する（内容が変わっていないものは除く）"""
+        changes = [(before, after) for before, after in changes if before != after]
+        if not changes:
+            return
+        for listener in self._change_listeners:
+            try:
+                listener(changes)
+            except Exception as e:
+                print(f"変更の通知中にエラーが発生しました: {e}")
+    
+    def connect_in_background(self):
+        """保存先への接続をバックグラウンドで始める（必要なバックエンドのみ）"""
+        return None
+    
+    def start_poller(self):
+        """保存先を定期的に確認するバックグラウンドスレッドを開始（必要なバックエンドのみ）"""
+        return False
+    
+    def run_daily_maintenance(self):
+        """日付が変わって最初の呼び出しで日次の整理を始める（必要なバックエンドのみ）"""
+        return False
+    
+    def shutdown(self):
+        """バックグラウンド処理を止める"""
+        pass
+    
+    def get_cache_stats(self):
+        """読み取りキャッシュの統計情報"""
+        return {}
+    
+    def get_api_stats(self):
+        """外部API呼び出しの統計情報"""
+        return {}
+    
+    def _new_todo(self, record, now):
+        """追加するTodoの項目（ID以外）をdictで作る（作成日時が省略されていればnow）"""
+        due_date = record.get('due_date', '')
+        status = '完了' if record.get('status') == '完了' else '未完了'
+        return {
+            'title': record['title'],
+            'content': record.get('content', ''),
+            'day_of_week': self._get_day_of_week(due_date),
+            'due_date': due_date,
+            'created_at': record.get('created_at') or now,
+            'completed_at': (record.get('completed_at') or now) if status == '完了' else '',
+            'status': status,
+            'target_date': ''  # 互換性のため保持
+        }
+    
+    def _get_day_of_week(self, due_date):
+        """期日から曜日を計算"""
+        due_date_obj = parse_date(due_date) if due_date else None
+        if due_date_obj is not None:
+            weekday_names = ['月', '火', '水', '木', '金', '土', '日']
+            return weekday_names[due_date_obj.weekday()]
+        return ''
+
+def create_backend():
+    """環境変数TODO_BACKEND（sheets/sqlite、省略時はsheets）に応じてバックエンドを作成
+    
+    sqliteの場合、SQLITE_EXPORT_TO_SHEETSが1ならスプレッドシートへ非同期に書き出し、
+    SQLITE_SYNC_WITH_SHEETSが1ならスプレッドシートと双方向に同期する（SQLITE_SYNC_INTERVAL秒ごと）。
+    """
+    name = os.environ.get('TODO_BACKEND', 'sheets').strip().lower()
+    if name == 'sheets':
+        from sheets_api import SheetsAPI
+        return SheetsAPI()
+    if name == 'sqlite':
+        from sqlite_backend import SQLiteTodoBackend
+        export = os.environ.get('SQLITE_EXPORT_TO_SHEETS', '0') == '1'
+        sync = os.environ.get('SQLITE_SYNC_WITH_SHEETS', '0') == '1'
+        if export and sync:
+            raise ValueError("SQLITE_EXPORT_TO_SHEETSとSQLITE_SYNC_WITH_SHEETSは同時に指定できません")
+        exporter = None
+        if export:
+            from sheets_api import SheetsAPI
+            exporter = SheetsAPI(write_behind=True)
+        backend = SQLiteTodoBackend(os.environ.get('SQLITE_PATH', 'todos.db'), exporter=exporter)
+        if sync:
+            from sheets_api import SheetsAPI
+            backend.enable_sync(SheetsAPI(write_behind=False), float(os.environ.get('SQLITE_SYNC_INTERVAL', '15')))
+        return backend
+    raise ValueError(f"TODO_BACKENDの値が正しくありません: {name}（sheets または sqlite を指定してください）")
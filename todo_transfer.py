@@ -0,0 +1,198 @@
+"""Todoのエクスポート・インポート（CSV・NDJSON）
+
+エクスポートはTodoを順に読みながら書き出す文字列を返すジェネレーター、インポートはファイルを1行ずつ読みながら
+追加するTodoのdictを返すイテレーターで、どちらも全件をメモリに載せない。アプリの/export・/importと、
+このファイルを直接実行するコマンドの両方から使う。
+
+    python todo_transfer.py export todos.csv                 # 形式はファイルの拡張子から（.csv・.ndjson・.jsonl）
+    python todo_transfer.py export - --format ndjson > todos.ndjson
+    python todo_transfer.py import todos.csv
+    python todo_transfer.py import - --format ndjson < todos.ndjson
+
+保存先は環境変数（.env）のTODO_BACKENDなど、アプリと同じ設定を使う。
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from datetime import datetime
+from todo_backend import HEADERS, TODO_FIELDS
+
+# 形式ごとのContent-Type
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8'
+}
+
+# ファイルの拡張子ごとの形式
+EXTENSIONS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+
+# インポートでIDを払い出して書き込む1回あたりの件数
+IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', '500'))
+
+# エクスポートで1回に書き出す件数（1件ずつ送るとレスポンスの書き込み回数が増えるため）
+EXPORT_ROWS_PER_CHUNK = 200
+
+# インポートする項目（IDは新しく払い出すため読まない）。CSVの見出しはシートと同じ日本語でもよい
+IMPORT_FIELDS = ('title', 'content', 'due_date', 'status', 'created_at', 'completed_at')
+FIELD_ALIASES = dict(zip(HEADERS, TODO_FIELDS))
+
+# 読み飛ばした行の理由を記録する最大の件数
+MAX_REPORTED_ERRORS = 20
+
+def detect_format(filename, default=None):
+    """ファイル名の拡張子から形式を判定（判定できなければdefault）"""
+    return EXTENSIONS.get(os.path.splitext(filename or '')[1].lower(), default)
+
+def export_csv(todos):
+    """TodoをCSVとして順に書き出す（1行目は見出し。Excelで文字化けしないようBOMを付ける）"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\r\n')
+    buffer.write('\ufeff')
+    writer.writerow(TODO_FIELDS)
+    count = 0
+    for todo in todos:
+        writer.writerow([todo[field] for field in TODO_FIELDS])
+        count += 1
+        if count % EXPORT_ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def export_ndjson(todos):
+    """Todoを1行に1件のJSON（NDJSON、JSON APIと同じ項目）として順に書き出す"""
+    lines = []
+    for todo in todos:
+        lines.append(json.dumps(todo.to_dict(), ensure_ascii=False) + '\n')
+        if len(lines) >= EXPORT_ROWS_PER_CHUNK:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+def export_todos(todos, fmt):
+    """Todoを指定した形式で順に書き出すジェネレーター"""
+    return export_csv(todos) if fmt == 'csv' else export_ndjson(todos)
+
+def normalize_record(data):
+    """読み込んだ1件を追加するTodoのdictに変換（見出しは英語の項目名またはシートの日本語の見出し）
+    
+    タイトルが空、または期日の形式が正しくない場合はValueError。
+    期日はYYYY-MM-DDのほか、表計算ソフトで変換されやすいYYYY/M/Dも受け付ける。
+    """
+    record = {}
+    for key, value in data.items():
+        if key is None:
+            continue
+        key = key.strip().lstrip('\ufeff')
+        field = FIELD_ALIASES.get(key, key)
+        if field in IMPORT_FIELDS:
+            record[field] = '' if value is None else str(value).strip()
+    if not record.get('title'):
+        raise ValueError('タイトルがありません')
+    due_date = record.get('due_date', '').replace('/', '-')
+    if due_date:
+        try:
+            due_date = datetime.strptime(due_date, '%Y-%m-%d').strftime('%Y-%m-%d')
+        except ValueError:
+            raise ValueError(f"期日の形式が正しくありません: {record['due_date']}")
+    record['due_date'] = due_date
+    record['status'] = '完了' if record.get('status', '').lower() in ('完了', 'completed', 'done', 'true', '1') else '未完了'
+    return record
+
+class ImportReader:
+    """テキストのストリームを1行ずつ読み、追加するTodoのdictを順に返す
+    
+    タイトルが空の行・期日の形式が正しくない行・JSONとして読めない行は読み飛ばし、
+    件数をskippedに、最初のMAX_REPORTED_ERRORS件の（行番号, 理由）をerrorsに記録する。
+    """
+    def __init__(self, stream, fmt):
+        if fmt not in FORMATS:
+            raise ValueError(f"形式が正しくありません: {fmt}（csv または ndjson を指定してください）")
+        self.stream = stream
+        self.fmt = fmt
+        self.skipped = 0
+        self.errors = []
+    
+    def _skip(self, line_number, reason):
+        self.skipped += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line_number, reason))
+    
+    def _rows(self):
+        """(行番号, 項目のdict)を順に返す"""
+        if self.fmt == 'csv':
+            reader = csv.DictReader(self.stream)
+            for data in reader:
+                yield reader.line_num, data
+            return
+        for line_number, line in enumerate(self.stream, start=1):
+            line = line.strip().lstrip('\ufeff')
+            if not line:
+                continue
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError as e:
+                self._skip(line_number, f"JSONとして読めません: {e.msg}")
+                continue
+            if not isinstance(data, dict):
+                self._skip(line_number, "JSONのオブジェクトではありません")
+                continue
+            yield line_number, data
+    
+    def __iter__(self):
+        for line_number, data in self._rows():
+            try:
+                yield normalize_record(data)
+            except ValueError as e:
+                self._skip(line_number, str(e))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Todoのエクスポートとインポート（CSV・NDJSON）')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export_parser = subparsers.add_parser('export', help='すべてのTodoをファイルに書き出す')
+    export_parser.add_argument('file', help='書き出すファイル（-なら標準出力）')
+    export_parser.add_argument('--format', choices=sorted(FORMATS), help='形式（省略時は拡張子から、判定できなければcsv）')
+    import_parser = subparsers.add_parser('import', help='ファイルのTodoを新しいIDで追加する')
+    import_parser.add_argument('file', help='読み込むファイル（-なら標準入力）')
+    import_parser.add_argument('--format', choices=sorted(FORMATS), help='形式（省略時は拡張子から、判定できなければcsv）')
+    import_parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE,
+                               help=f'1回に書き込む件数（省略時は{IMPORT_CHUNK_SIZE}）')
+    args = parser.parse_args(argv)
+    fmt = args.format or detect_format(args.file, 'csv')
+    
+    from dotenv import load_dotenv
+    from todo_backend import create_backend
+    load_dotenv()
+    backend = create_backend()
+    try:
+        if args.command == 'export':
+            output = sys.stdout if args.file == '-' else open(args.file, 'w', encoding='utf-8', newline='')
+            try:
+                for chunk in export_todos(backend.iter_todos(), fmt):
+                    output.write(chunk)
+            finally:
+                if output is not sys.stdout:
+                    output.close()
+            print(f"Todoを{'標準出力' if args.file == '-' else args.file}に書き出しました", file=sys.stderr)
+        else:
+            source = sys.stdin if args.file == '-' else open(args.file, encoding='utf-8-sig', newline='')
+            try:
+                reader = ImportReader(source, fmt)
+                imported = backend.import_todos(reader, chunk_size=args.chunk_size)
+            finally:
+                if source is not sys.stdin:
+                    source.close()
+            print(f"{imported}件のTodoを追加しました（読み飛ばした行: {reader.skipped}件）", file=sys.stderr)
+            for line_number, reason in reader.errors:
+                print(f"  {line_number}行目: {reason}", file=sys.stderr)
+    finally:
+        # 書き込み待ちの変更があればここで書き込む
+        backend.shutdown()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())